@@ -2,6 +2,10 @@
 alter table public.chat_sessions
   add column user_id uuid references auth.users(id) on delete cascade;
 
+-- The session list (GET /api/chats) filters by user_id and orders by created_at
+create index if not exists idx_chat_sessions_user_id_created_at
+  on public.chat_sessions(user_id, created_at desc);
+
 -- Enable RLS for the tables
 alter table public.chat_sessions enable row level security;
 alter table public.chat_messages enable row level security;
@@ -19,5 +19,22 @@ create table chat_messages (
 );
 
 -- Create indexes
-create index idx_chat_messages_session_id on chat_messages(session_id);
+-- Keyset pagination of a chat's messages (GET /api/chats/{session_id}?limit=...&before=...)
+-- reads the latest page of a session straight from this index, newest first; it also
+-- serves plain lookups by session_id.
+create index idx_chat_messages_session_created_at_id on chat_messages(session_id, created_at desc, id desc);
 create index idx_chat_sessions_created_at on chat_sessions(created_at);
+
+-- Keep chat_sessions.updated_at current on every update (e.g. a title change)
+create or replace function set_updated_at()
+returns trigger as $$
+begin
+  new.updated_at = now();
+  return new;
+end;
+$$ language plpgsql;
+
+drop trigger if exists chat_sessions_set_updated_at on chat_sessions;
+create trigger chat_sessions_set_updated_at
+  before update on chat_sessions
+  for each row execute function set_updated_at();
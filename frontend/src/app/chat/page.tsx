@@ -3,6 +3,7 @@
 import { useState, useRef, useEffect, Suspense } from 'react';
 import ReactMarkdown from 'react-markdown';
 import { supabase } from '../../utils/supabaseClient';
+import { preferredAudioFormats } from '../../utils/audioFormat';
 import { useRouter, useSearchParams } from 'next/navigation';
 import Sidebar from './Sidebar';
 import CallButton from '../components/CallButton';
@@ -33,6 +34,8 @@ function ChatPageContent() {
   const [imagePreview, setImagePreview] = useState<string | null>(null);
   const [chatHistory, setChatHistory] = useState<Array<{id: string, role: string, parts: Array<{text?: string; function_call?: any; function_response?: any}>, imageUrl?: string, audioUrl?: string, isAudioInput?: boolean}>>([]);
   const [activeChatId, setActiveChatId] = useState<string | null>(null);
+  // Cursor of the next older page of the open chat's messages (null when everything is loaded)
+  const [olderMessagesCursor, setOlderMessagesCursor] = useState<string | null>(null);
   const [playingMessageId, setPlayingMessageId] = useState<string | null>(null);
   const [audioCache, setAudioCache] = useState<Record<string, string>>({});
   const [isDarkMode, setIsDarkMode] = useState(false);
@@ -54,6 +57,7 @@ function ChatPageContent() {
       const data = await response.json();
       setActiveChatId(data.id);
       setChatHistory([]);
+      setOlderMessagesCursor(null);
       return data.id;
     } catch (error) {
       console.error("Failed to create new chat:", error);
@@ -159,7 +163,6 @@ function ChatPageContent() {
      const formData = new FormData();
      formData.append('image', file);
      formData.append('prompt', prompt);
-     formData.append('history', JSON.stringify([]));
      formData.append('chat_id', newChatId);
      
      setIsLoading(true);
@@ -185,30 +188,55 @@ function ChatPageContent() {
     router.push('/');
   };
 
+  // Messages are loaded a page at a time, newest first, so long chats open quickly
+  const MESSAGE_PAGE_SIZE = 50;
+
+  const fetchMessagePage = async (chatId: string, before: string | null) => {
+    const { data: { session } } = await supabase.auth.getSession();
+    if (!session) return null;
+    const params = new URLSearchParams({ limit: String(MESSAGE_PAGE_SIZE), fields: 'compact' });
+    if (before) params.set('before', before);
+    const response = await fetch(`http://localhost:8000/api/chats/${chatId}?${params}`, {
+      headers: { 'Authorization': `Bearer ${session.access_token}` },
+    });
+    const data = await response.json();
+    const messages = Array.isArray(data.messages) ? data.messages.map((msg: { id: string; role: string; content: string }) => ({
+      id: `history-${msg.id}`,
+      role: msg.role,
+      parts: [{ text: msg.content }],
+    })) : [];
+    return { data, messages, nextCursor: data.next_cursor ?? null };
+  };
+
   const loadChatSession = async (chatId: string) => {
     if (!chatId) {
       setActiveChatId(null);
       setChatHistory([]);
+      setOlderMessagesCursor(null);
       return;
     }
     try {
-      const { data: { session } } = await supabase.auth.getSession();
-      if (!session) return;
-
-      const response = await fetch(`http://localhost:8000/api/chats/${chatId}`, {
-        headers: { 'Authorization': `Bearer ${session.access_token}` },
-      });
-      const data = await response.json();
-      setActiveChatId(data.session?.id ?? data.id);
-      const formattedHistory = Array.isArray(data.messages) ? data.messages.map((msg: { role: string; content: string }, index: number) => ({
-       id: `history-${index}`,
-        role: msg.role,
-        parts: [{ text: msg.content }],
-      })) : [];
-      setChatHistory(formattedHistory);
+      const page = await fetchMessagePage(chatId, null);
+      if (!page) return;
+      setActiveChatId(page.data.session?.id ?? page.data.id);
+      setChatHistory(page.messages);
+      setOlderMessagesCursor(page.nextCursor);
     } catch (error) {
       console.error("Failed to load chat session:", error);
       setChatHistory([]);
+      setOlderMessagesCursor(null);
+    }
+  };
+
+  const loadOlderMessages = async () => {
+    if (!activeChatId || !olderMessagesCursor) return;
+    try {
+      const page = await fetchMessagePage(activeChatId, olderMessagesCursor);
+      if (!page) return;
+      setChatHistory(prev => [...page.messages, ...prev]);
+      setOlderMessagesCursor(page.nextCursor);
+    } catch (error) {
+      console.error("Failed to load older messages:", error);
     }
   };
 
@@ -230,27 +258,62 @@ function ChatPageContent() {
        const audioBlob = new Blob(chunksRef.current, { type: 'audio/wav' });
        const formData = new FormData();
        formData.append('audio', audioBlob, `recording.wav`);
-       formData.append('history', JSON.stringify(chatHistory));
        if (activeChatId) formData.append('chat_id', activeChatId);
        formData.append('enable_tts', 'true');
+       formData.append('audio_format', preferredAudioFormats());
+
+       const userMessageId = `user-${Date.now()}`;
+       const aiMessageId = `model-${Date.now()}`;
+       let answer = '';
+       const showAnswer = (text: string) => {
+         setChatHistory(prev => prev.some(m => m.id === aiMessageId)
+           ? prev.map(m => m.id === aiMessageId ? { ...m, parts: [{ text }] } : m)
+           : [...prev, { id: aiMessageId, role: 'model', parts: [{ text }], isAudioInput: true }]);
+       };
 
        try {
-         const response = await fetch('http://localhost:8000/api/full-conversation', {
+         // Server-Sent Events: the transcript arrives first, then the answer's tokens, then its audio
+         const response = await fetch('http://localhost:8000/api/full-conversation/stream', {
            method: 'POST',
            body: formData,
          });
-         const data = await response.json();
-         
-         const userMessage = { id: `user-${Date.now()}`, role: 'user', parts: [{ text: data.user_transcript }] };
-         const aiMessage = { id: `model-${Date.now()}`, role: 'model', parts: [{ text: data.ai_response }], isAudioInput: true };
-         setChatHistory(prev => [...prev, userMessage, aiMessage]);
-         setTranscription('');
-
-         if (data.audio_base64) {
-           const audioBlob = new Blob([base64ToArrayBuffer(data.audio_base64)], { type: 'audio/wav' });
-           const audioUrl = URL.createObjectURL(audioBlob);
-           setAudioCache(prev => ({ ...prev, [aiMessage.id]: audioUrl }));
-           // Autoplay is now handled by the new useEffect
+         if (!response.ok || !response.body) throw new Error(`Stream request failed: ${response.status}`);
+
+         const reader = response.body.getReader();
+         const decoder = new TextDecoder();
+         let buffer = '';
+         while (true) {
+           const { value, done } = await reader.read();
+           if (done) break;
+           buffer += decoder.decode(value, { stream: true });
+           let boundary;
+           while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+             const rawEvent = buffer.slice(0, boundary);
+             buffer = buffer.slice(boundary + 2);
+             const eventName = rawEvent.match(/^event: (.*)$/m)?.[1];
+             const dataLine = rawEvent.match(/^data: (.*)$/m)?.[1];
+             if (!eventName || !dataLine) continue;
+             const data = JSON.parse(dataLine);
+
+             if (eventName === 'transcript') {
+               setChatHistory(prev => [...prev, { id: userMessageId, role: 'user', parts: [{ text: data.text }] }]);
+               setTranscription('');
+             } else if (eventName === 'token') {
+               answer += data.text;
+               showAnswer(answer);
+             } else if (eventName === 'tool_call') {
+               if (!answer) showAnswer(`Using ${data.name}...`);
+             } else if (eventName === 'text') {
+               if (data.text !== answer) showAnswer(data.text);
+             } else if (eventName === 'audio' && data.audio_base64) {
+               const audioBlob = new Blob([base64ToArrayBuffer(data.audio_base64)], { type: data.mime_type || 'audio/wav' });
+               const audioUrl = URL.createObjectURL(audioBlob);
+               setAudioCache(prev => ({ ...prev, [aiMessageId]: audioUrl }));
+               // Autoplay is now handled by the new useEffect
+             } else if (eventName === 'error') {
+               console.error('API Error:', data.detail);
+             }
+           }
          }
        } catch (error) {
          console.error('API Error:', error);
@@ -333,24 +396,57 @@ function ChatPageContent() {
     setImage(null);
     setImagePreview(null);
 
+    const aiMessageId = `model-${Date.now()}`;
+    let answer = '';
+    const showAnswer = (text: string) => {
+      setChatHistory(prev => prev.some(m => m.id === aiMessageId)
+        ? prev.map(m => m.id === aiMessageId ? { ...m, parts: [{ text }] } : m)
+        : [...prev, { id: aiMessageId, role: 'model', parts: [{ text }] }]);
+    };
+
     try {
-      const response = await fetch('http://localhost:8000/api/generateText', {
+      // Server-Sent Events: tokens are shown as they stream, audio (if any) arrives last
+      const response = await fetch('http://localhost:8000/api/generateText/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ text, history: currentHistory, chat_id: chatId, enable_tts: false }),
+        // The server keeps the chat's history, so only the new message is sent
+        body: JSON.stringify({ text, chat_id: chatId, enable_tts: false, audio_format: preferredAudioFormats() }),
       });
-      const data = await response.json();
-      
-      if (data.text) {
-        const aiMessage = { id: `model-${Date.now()}`, role: 'model', parts: [{ text: data.text }] };
-        setChatHistory(prev => [...prev, aiMessage]);
-        if (data.audio_base64) {
-          const audioUrl = URL.createObjectURL(new Blob([base64ToArrayBuffer(data.audio_base64)], { type: 'audio/wav' }));
-          setAudioCache(prev => ({ ...prev, [aiMessage.id]: audioUrl }));
-          const audio = new Audio(audioUrl);
-          setPlayingMessageId(aiMessage.id);
-          audio.play();
-          audio.onended = () => setPlayingMessageId(null);
+      if (!response.ok || !response.body) throw new Error(`Stream request failed: ${response.status}`);
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const rawEvent = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+          const eventName = rawEvent.match(/^event: (.*)$/m)?.[1];
+          const dataLine = rawEvent.match(/^data: (.*)$/m)?.[1];
+          if (!eventName || !dataLine) continue;
+          const data = JSON.parse(dataLine);
+
+          if (eventName === 'token') {
+            answer += data.text;
+            showAnswer(answer);
+          } else if (eventName === 'tool_call') {
+            if (!answer) showAnswer(`Using ${data.name}...`);
+          } else if (eventName === 'text') {
+            if (data.text !== answer) showAnswer(data.text);
+          } else if (eventName === 'audio' && data.audio_base64) {
+            const audioUrl = URL.createObjectURL(new Blob([base64ToArrayBuffer(data.audio_base64)], { type: data.mime_type || 'audio/wav' }));
+            setAudioCache(prev => ({ ...prev, [aiMessageId]: audioUrl }));
+            const audio = new Audio(audioUrl);
+            setPlayingMessageId(aiMessageId);
+            audio.play();
+            audio.onended = () => setPlayingMessageId(null);
+          } else if (eventName === 'error') {
+            console.error('API Error:', data.detail);
+          }
         }
       }
     } catch (error) {
@@ -385,7 +481,6 @@ function ChatPageContent() {
       const formData = new FormData();
       formData.append('image', image);
       formData.append('prompt', textToSend); // Use textToSend
-      formData.append('history', JSON.stringify(chatHistory));
       formData.append('chat_id', activeChatId);
       
       setIsLoading(true);
@@ -436,12 +531,12 @@ function ChatPageContent() {
       const response = await fetch('http://localhost:8000/api/text-to-speech', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ text }),
+        body: JSON.stringify({ text, audio_format: preferredAudioFormats() }),
       });
       if (!response.ok) throw new Error('Failed to fetch audio');
       const data = await response.json();
       
-      const audioUrl = URL.createObjectURL(new Blob([base64ToArrayBuffer(data.audio_base64)], { type: 'audio/wav' }));
+      const audioUrl = URL.createObjectURL(new Blob([base64ToArrayBuffer(data.audio_base64)], { type: data.audio_mime_type || 'audio/wav' }));
       setAudioCache(prev => ({ ...prev, [messageId]: audioUrl }));
       
       const audio = new Audio(audioUrl);
@@ -481,6 +576,13 @@ function ChatPageContent() {
             <h2 className="text-xl font-bold">Aria</h2>
           </div>
           <div className="flex-grow p-4 overflow-y-auto">
+            {olderMessagesCursor && (
+              <div className="flex justify-center mb-4">
+                <button onClick={loadOlderMessages} className="text-sm text-gray-500 hover:text-gray-700">
+                  Muat pesan sebelumnya
+                </button>
+              </div>
+            )}
             {chatHistory.map((msg, index) => (
               <div key={msg.id} className={`flex mb-4 ${msg.role === 'user' ? 'justify-end' : 'justify-start'}`}>
                 <div className={`chat-bubble ${msg.role === 'user' ? 'chat-bubble-user' : 'chat-bubble-model'} flex items-start gap-3 ${msg.role === 'user' ? 'ml-8' : ''}`}>
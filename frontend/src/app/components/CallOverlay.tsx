@@ -1,6 +1,7 @@
 'use client';
 
 import { useEffect, useState, useRef, useCallback } from 'react';
+import { preferredAudioFormats } from '../../utils/audioFormat';
 
 interface CallOverlayProps {
   onClose: () => void;
@@ -8,7 +9,8 @@ interface CallOverlayProps {
 
 // Hook to manage the audio queue.
 const useAudioQueue = (onAudioStart: (transcript: string) => void, onAudioEnd: () => void) => {
-  const [audioQueue, setAudioQueue] = useState<{ audio: string; transcript: string }[]>([]);
+  // Each entry holds a playable URL: a data: URL for base64 audio or a blob: URL for binary frames
+  const [audioQueue, setAudioQueue] = useState<{ src: string; transcript: string }[]>([]);
   const [isPlaying, setIsPlaying] = useState(false);
   const audioRef = useRef<HTMLAudioElement | null>(null);
 
@@ -38,11 +40,14 @@ const useAudioQueue = (onAudioStart: (transcript: string) => void, onAudioEnd: (
   useEffect(() => {
     if (audioQueue.length > 0 && !isPlaying) {
       setIsPlaying(true);
-      const { audio, transcript } = audioQueue[0];
+      const { src, transcript } = audioQueue[0];
       onAudioStart(transcript);
-      const nextAudioSrc = `data:audio/wav;base64,${audio}`;
       if (audioRef.current) {
-        audioRef.current.src = nextAudioSrc;
+        // Release the previous blob before loading the next chunk
+        if (audioRef.current.src.startsWith('blob:')) {
+          URL.revokeObjectURL(audioRef.current.src);
+        }
+        audioRef.current.src = src;
         audioRef.current.play().catch(e => {
           console.error("Audio play failed:", e);
           setIsPlaying(false);
@@ -55,8 +60,8 @@ const useAudioQueue = (onAudioStart: (transcript: string) => void, onAudioEnd: (
     }
   }, [audioQueue, isPlaying, onAudioStart, onAudioEnd]);
 
-  const addAudioToQueue = useCallback((audioBase64: string, transcript: string) => {
-    setAudioQueue(prev => [...prev, { audio: audioBase64, transcript }]);
+  const addAudioToQueue = useCallback((src: string, transcript: string) => {
+    setAudioQueue(prev => [...prev, { src, transcript }]);
   }, []);
 
   const isIdle = audioQueue.length === 0 && !isPlaying;
@@ -146,14 +151,31 @@ const CallOverlay = ({ onClose }: CallOverlayProps) => {
   // WebSocket and SpeechRecognition Setup Effect
   useEffect(() => {
     const ws = new WebSocket(process.env.NEXT_PUBLIC_WEBSOCKET_URL || 'ws://localhost:8000/ws/conversation');
+    ws.binaryType = 'arraybuffer';
     socketRef.current = ws;
 
-    ws.onopen = () => console.log('WebSocket Connected');
+    // In binary mode the server sends a JSON header for each chunk, followed by the raw audio frame.
+    let pendingChunkHeader: { transcript: string; mimeType: string } | null = null;
+
+    ws.onopen = () => {
+      console.log('WebSocket Connected');
+      ws.send(JSON.stringify({ type: 'session_config', audio_transport: 'binary', audio_format: preferredAudioFormats() }));
+    };
     ws.onmessage = (event) => {
+      if (event.data instanceof ArrayBuffer) {
+        if (pendingChunkHeader) {
+          const blob = new Blob([event.data], { type: pendingChunkHeader.mimeType });
+          addAudioToQueue(URL.createObjectURL(blob), pendingChunkHeader.transcript);
+          pendingChunkHeader = null;
+        }
+        return;
+      }
       try {
         const data = JSON.parse(event.data);
         if (data.type === 'ai_audio_chunk' && data.audio_base64 && data.transcript) {
-          addAudioToQueue(data.audio_base64, data.transcript);
+          addAudioToQueue(`data:${data.mime_type || `audio/${data.format || 'wav'}`};base64,${data.audio_base64}`, data.transcript);
+        } else if (data.type === 'ai_audio_chunk' && data.byte_length !== undefined) {
+          pendingChunkHeader = { transcript: data.transcript, mimeType: data.mime_type || `audio/${data.format || 'wav'}` };
         } else if (data.type === 'ai_turn_end') {
           setAiTurnEnded(true);
           setCurrentAiTranscript('');
@@ -0,0 +1,11 @@
+// Audio formats the server may answer in, most compact first, limited to what this browser can play.
+// The server picks the first one it can encode and reports the MIME type it used.
+export function preferredAudioFormats(): string {
+  if (typeof window === 'undefined') return 'wav';
+  const probe = new Audio();
+  const formats: string[] = [];
+  if (probe.canPlayType('audio/ogg; codecs=opus')) formats.push('ogg');
+  if (probe.canPlayType('audio/mpeg')) formats.push('mp3');
+  formats.push('wav');
+  return formats.join(',');
+}
@@ -1,12 +1,21 @@
 
+import base64
+import hashlib
 import json
-from fastapi import APIRouter, HTTPException, Depends, Header
+import uuid
+from datetime import datetime, timezone
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from supabase import Client
 from postgrest import APIError
 from database import get_db_connection
-from google.genai import types as genai_types
+from services.auth import AuthUser, get_current_user
+from services.session_store import session_store
+from services.message_writer import message_writer
+from config import MESSAGE_WRITE_BEHIND, CHAT_HISTORY_MAX_PAGE_SIZE, SESSION_LIST_CACHE_MAX_USERS, SESSION_LIST_CACHE_TTL
+from tools.tool_cache import TTLCache
 import logging
 
 router = APIRouter()
@@ -14,24 +23,34 @@ logger = logging.getLogger(__name__)
 
 def insert_message(session_id: str, role: str, content: str, db: Client):
     """
-    Insert a single chat message to Supabase for a given session.
+    Persists a single chat message for a given session.
+
+    With MESSAGE_WRITE_BEHIND (the default) the message is queued for the background
+    writer and this returns immediately; otherwise it is inserted synchronously.
     """
     if not session_id:
         logger.warning("No session_id provided. Message will not be saved.")
         return
+    logger.debug(f"Saving {role} message for session {session_id} ({len(content)} chars)")
+    if MESSAGE_WRITE_BEHIND:
+        created_at = message_writer.submit(session_id, role, content)
+    else:
+        created_at = datetime.now(timezone.utc)
+    # Keep the server-side history in step with what is persisted; the timestamp lets other
+    # workers' copies of the chat notice this message
+    session_store.append_text(session_id, role, content, persisted_at=created_at)
+    if MESSAGE_WRITE_BEHIND:
+        return
     try:
-        logger.info(f"Insert params: session_id={session_id}, role={role}, content={content}")
         response = db.table('chat_messages').insert({
             "session_id": session_id,
             "role": role,
-            "content": content
+            "content": content,
+            "created_at": created_at.isoformat(),
         }).execute()
-        logger.info(f"Supabase insert response: {response}")
         if hasattr(response, 'error') and response.error:
             logger.error(f"Supabase error: {response.error}")
-        if hasattr(response, 'data') and response.data:
-            logger.info(f"Inserted data: {response.data}")
-        else:
+        if not (hasattr(response, 'data') and response.data):
             logger.warning(f"No data returned from Supabase insert for session {session_id}")
     except Exception as e:
         logger.error(f"Error inserting message for session {session_id}: {e}", exc_info=True)
@@ -47,7 +66,7 @@ class ChatSession(BaseModel):
 
 class ChatMessage(BaseModel):
     id: str
-    session_id: str
+    session_id: Optional[str] = None  # Omitted with fields=compact
     role: str
     content: str
     created_at: str
@@ -55,27 +74,52 @@ class ChatMessage(BaseModel):
 class ChatHistory(BaseModel):
     session: ChatSession
     messages: List[ChatMessage]
+    # Pass as `before` to get the next older page; null when there are no older messages
+    next_cursor: Optional[str] = None
+
+# Columns selected per projection mode of GET /api/chats/{session_id}. The response is sent
+# without going through ChatHistory, so these must name exactly the fields it declares
+SESSION_FIELDS = {"full": "id, title, created_at, updated_at", "compact": "id, title, created_at, updated_at"}
+MESSAGE_FIELDS = {"full": "id, session_id, role, content, created_at", "compact": "id, role, content, created_at"}
+
+def encode_cursor(message: Dict[str, Any]) -> str:
+    """Opaque keyset cursor pointing at a message, by its (created_at, id)."""
+    return base64.urlsafe_b64encode(json.dumps([message["created_at"], message["id"]]).encode()).decode()
+
+def decode_cursor(cursor: str) -> tuple:
+    try:
+        created_at, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        # Both end up in a PostgREST filter, so only accept well-formed values
+        datetime.fromisoformat(created_at)
+        return created_at, str(uuid.UUID(message_id))
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# user_id -> (etag, sessions) of GET /api/chats; dropped whenever this worker changes the user's sessions
+session_list_cache = TTLCache(SESSION_LIST_CACHE_MAX_USERS)
+
+def invalidate_session_list(user_id: Optional[str]) -> None:
+    if user_id:
+        session_list_cache.delete((user_id,))
+
+def session_list_etag(sessions: List[Dict[str, Any]]) -> str:
+    return '"' + hashlib.sha256(json.dumps(sessions, sort_keys=True, default=str).encode()).hexdigest()[:32] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
 
 @router.post("/api/chats", response_model=ChatSession, status_code=201)
 async def create_chat_session(
-    authorization: Optional[str] = Header(None),
+    user: AuthUser = Depends(get_current_user),
     db: Client = Depends(get_db_connection)
 ):
     """
     Creates a new chat session, associating it with the authenticated user.
     """
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Unauthorized")
-
-    jwt_token = authorization.split("Bearer ")[1]
-
     try:
-        # Get user from token
-        user_response = db.auth.get_user(jwt_token)
-        user = user_response.user
-        if not user:
-            raise HTTPException(status_code=401, detail="Invalid token or user not found")
-
         # A default title is created, the user can change it later
         response = db.table('chat_sessions').insert({
             "title": "New Chat",
@@ -83,6 +127,7 @@ async def create_chat_session(
         }).execute()
         
         new_session = response.data[0]
+        invalidate_session_list(user.id)
         return new_session
     except APIError as e:
         logger.error(f"Supabase API Error in create_chat_session: {e}", exc_info=True)
@@ -98,25 +143,28 @@ class ChatSessionInfo(BaseModel):
 
 @router.get("/api/chats", response_model=List[ChatSessionInfo])
 async def get_all_chat_sessions(
-    authorization: Optional[str] = Header(None),
+    user: AuthUser = Depends(get_current_user),
+    if_none_match: Optional[str] = Header(None),
     db: Client = Depends(get_db_connection)
 ):
     """
     Returns a list of all chat sessions for the authenticated user.
-    """
-    if not authorization or not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Unauthorized")
 
-    jwt_token = authorization.split("Bearer ")[1]
-    
+    The list is cached per user and sent with an ETag; a request whose If-None-Match
+    still matches gets 304 Not Modified, without touching the database if it is cached.
+    """
     try:
-        user_response = db.auth.get_user(jwt_token)
-        user = user_response.user
-        if not user:
-            raise HTTPException(status_code=401, detail="Invalid token or user not found")
-
-        response = db.table('chat_sessions').select("id, created_at, title").eq("user_id", user.id).order("created_at", desc=True).execute()
-        return response.data
+        cached = session_list_cache.get((user.id,))
+        if cached is None:
+            response = db.table('chat_sessions').select("id, created_at, title").eq("user_id", user.id).order("created_at", desc=True).execute()
+            cached = (session_list_etag(response.data), response.data)
+            session_list_cache.set((user.id,), cached, SESSION_LIST_CACHE_TTL)
+        etag, sessions = cached
+        # no-cache: browsers keep the list but revalidate it with If-None-Match every time
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        return JSONResponse(sessions, headers=headers)
     except APIError as e:
         logger.error(f"Supabase API Error in get_all_chat_sessions: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=e.message)
@@ -125,24 +173,49 @@ async def get_all_chat_sessions(
         raise HTTPException(status_code=500, detail="An unexpected error occurred.")
 
 @router.get("/api/chats/{session_id}", response_model=ChatHistory)
-async def get_chat_history(session_id: str, db: Client = Depends(get_db_connection)):
+async def get_chat_history(
+    session_id: str,
+    limit: Optional[int] = Query(None, ge=1, le=CHAT_HISTORY_MAX_PAGE_SIZE),
+    before: Optional[str] = None,
+    fields: str = Query("full", pattern="^(full|compact)$"),
+    db: Client = Depends(get_db_connection)
+):
     """
-    Retrieves a specific chat session and all its messages.
+    Retrieves a specific chat session and its messages, oldest first.
+
+    With `limit`, only the latest `limit` messages are returned (keyset pagination on
+    (created_at, id), served by an index); `next_cursor` is then passed as `before` to
+    get the page of messages before them. Without `limit`, every message is returned.
+    `fields=compact` leaves out columns the chat view does not use.
     """
     try:
         # Get session details
-        session_res = db.table('chat_sessions').select("*").eq('id', session_id).single().execute()
+        session_res = db.table('chat_sessions').select(SESSION_FIELDS[fields]).eq('id', session_id).single().execute()
         session_data = session_res.data
 
-        # Get all messages for the session
-        messages_res = db.table('chat_messages').select("*").eq('session_id', session_id).order("created_at", desc=False).execute()
-        messages_data = messages_res.data
+        query = db.table('chat_messages').select(MESSAGE_FIELDS[fields]).eq('session_id', session_id)
+        next_cursor = None
+        if limit is None:
+            messages_data = query.order("created_at", desc=False).order("id", desc=False).execute().data
+        else:
+            if before:
+                created_at, message_id = decode_cursor(before)
+                query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{message_id})')
+            # Newest first, one extra row to know whether an older page exists
+            rows = query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1).execute().data
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_cursor(rows[-1])
+            messages_data = rows[::-1]
 
-        return ChatHistory(session=session_data, messages=messages_data)
+        # The rows are already plain JSON; skip re-validating every message through the response model
+        return JSONResponse({"session": session_data, "messages": messages_data, "next_cursor": next_cursor})
     except APIError as e:
         if "PGRST116" in e.message: # "PGRST116" is the code for "Not Found"
             raise HTTPException(status_code=404, detail="Chat session not found")
         raise HTTPException(status_code=500, detail=e.message)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -153,6 +226,9 @@ async def delete_chat_session(session_id: str, db: Client = Depends(get_db_conne
     """
     try:
         response = db.table('chat_sessions').delete().eq('id', session_id).execute()
+        session_store.invalidate(session_id)
+        for deleted in response.data or []:
+            invalidate_session_list(deleted.get("user_id"))
         
         # Check if any row was actually deleted
         if not response.data:
@@ -170,30 +246,21 @@ class UpdateChatSession(BaseModel):
 async def update_chat_session(
    session_id: str,
    session_data: UpdateChatSession,
-   authorization: Optional[str] = Header(None),
+   user: AuthUser = Depends(get_current_user),
    db: Client = Depends(get_db_connection)
 ):
    """
    Updates the title of a specific chat session.
    """
-   if not authorization or not authorization.startswith("Bearer "):
-       raise HTTPException(status_code=401, detail="Unauthorized")
-
-   jwt_token = authorization.split("Bearer ")[1]
-   
    try:
-       user_response = db.auth.get_user(jwt_token)
-       user = user_response.user
-       if not user:
-           raise HTTPException(status_code=401, detail="Invalid token or user not found")
-
        response = db.table('chat_sessions').update({
            "title": session_data.title
        }).eq('id', session_id).eq('user_id', user.id).execute()
        
        if not response.data:
            raise HTTPException(status_code=404, detail="Chat session not found or you don't have permission to edit it.")
-           
+
+       invalidate_session_list(user.id)
        return response.data[0]
    except APIError as e:
        raise HTTPException(status_code=500, detail=e.message)
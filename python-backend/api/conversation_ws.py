@@ -3,88 +3,51 @@
 import base64
 import asyncio
 import re
-import requests
+import httpx
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from google.genai import types as genai_types
-from TTS.utils.synthesizer import Synthesizer
-import numpy as np
-import io
 import os
-import wave
-from g2p_id import G2P
-from utils.model_utils import client as genai_client, load_system_prompt
-from piper import PiperVoice
-import soundfile as sf
+import time
+from utils.model_utils import stream_content_async
+from utils.stream_utils import StreamTimeoutError
+from utils.text_segmenter import SentenceSegmenter
+from services.tts_pipeline import TTSPipeline, StreamingTTSPipeline, get_tts_executor
+from services.tts_engines import (
+    tts_engines,
+    PIPER_MODEL_EN_ONNX,
+    COQUI_SPEAKER_ID,
+    text_to_audio_coqui,
+    text_to_audio_piper,
+    stream_audio_piper,
+    local_sample_rate,
+    LOCAL_ENGINE_FUNCTIONS,
+)
+from services.tts_remote import tts_remote
+from services.tts_protocol import PRIORITY_LIVE
+from services.tts_cache import tts_cache
+from services.session_store import session_store
+from services.message_writer import message_writer
+from services.context_manager import context_manager
+from services.prompt_registry import prompt_registry
+from services.prompt_cache import prompt_cache
+from database import get_db_connection
+from services.voicevox_client import voicevox_client
+from services.tts_metrics import tts_first_audio_latency
+from utils.audio_utils import pcm_to_wav, wav_to_pcm
+from utils.audio_encoding import AudioEncoder, encode_wav, negotiate_audio_format
+from utils.audio_postprocess import tts_postprocessor
+from typing import Iterator, Optional
 
 
 # --- TTS Engine Configurations ---
-VOICEVOX_BASE_URL = "http://127.0.0.1:50021"
-script_dir = os.path.dirname(os.path.abspath(__file__))
-backend_dir = os.path.abspath(os.path.join(script_dir, '..'))
-
-# --- Piper TTS Initialization for English ---
-PIPER_MODEL_EN_ONNX = os.path.join(backend_dir, "datasetsANDmodels/piper-en/en_US-lessac-high.onnx")
-PIPER_MODEL_EN_JSON = os.path.join(backend_dir, "datasetsANDmodels/piper-en/en_US-lessac-high.onnx.json")
-piper_voice_en = None
-
-# --- Detailed Debugging for Piper Model Loading ---
-print("\n--- Piper TTS Debug Information ---")
-abs_model_path = os.path.abspath(PIPER_MODEL_EN_ONNX)
-abs_config_path = os.path.abspath(PIPER_MODEL_EN_JSON)
-print(f"Attempting to load model from: {abs_model_path}")
-print(f"Attempting to load config from: {abs_config_path}")
-
-model_exists = os.path.exists(abs_model_path)
-config_exists = os.path.exists(abs_config_path)
-print(f"Model file exists? {'YES' if model_exists else 'NO'}")
-print(f"Config file exists? {'YES' if config_exists else 'NO'}")
-
-if model_exists and config_exists:
-    print("Both files found. Proceeding to load...")
-    try:
-        # According to the documentation (API_PYTHON.md), the correct method is PiperVoice.load()
-        piper_voice_en = PiperVoice.load(abs_model_path, config_path=abs_config_path)
-        print("Piper TTS model for English loaded successfully.")
-    except Exception as e:
-        print(f"CRITICAL ERROR during Piper model loading: {e}")
-else:
-    print("One or both Piper files are missing. English TTS will not work.")
-print("--- End of Piper TTS Debug ---\n")
-
-
-# --- G2P and Coqui TTS Initialization for Indonesian ---
-print("Initializing G2P for Indonesian...")
-g2p = G2P()
-print("G2P Initialized.")
-
-MODEL_DIR_ID = os.path.join(backend_dir, "datasetsANDmodels/indonesian-tts")
-
-# --- Restore Global Coqui TTS Initialization with chdir ---
-print("Loading Coqui TTS model for Indonesian...")
-synthesizer_id = None
-if os.path.exists(MODEL_DIR_ID):
-    original_cwd = os.getcwd()
-    try:
-        # Temporarily change to the model directory for robust initialization
-        os.chdir(MODEL_DIR_ID)
-        print(f"Temporarily changed CWD to: {os.getcwd()} for Coqui TTS loading")
-        
-        synthesizer_id = Synthesizer(
-            tts_checkpoint="checkpoint_1260000-inference.pth",
-            tts_config_path="config.json",
-            # The 'speakers_file_path' argument is removed as it's not supported by the user's TTS lib version
-            use_cuda=False,
-        )
-        print("Coqui TTS model for Indonesian loaded successfully.")
-    except Exception as e:
-        print(f"Failed to load Coqui TTS model: {e}")
-    finally:
-        # Always change back to the original directory
-        os.chdir(original_cwd)
-        print(f"Restored CWD to: {os.getcwd()}")
-else:
-    print(f"Indonesian model directory not found at {MODEL_DIR_ID}. Indonesian TTS will not work.")
+VOICEVOX_SPEAKER_ID = 47
+VOICEVOX_SAMPLE_RATE = 24000
 
+# Piper (en) and Coqui (id) synthesis lives next to their loaders in services/tts_engines.py;
+# the models are loaded there in a background warm-up or on first use, so importing this
+# module stays cheap. With TTS_SERVER_ADDRESSES set they run in the dedicated TTS server
+# process instead (services/tts_server.py) and this worker never loads them.
 
 def clean_ruby_tags(text: str) -> str:
     """Removes <ruby> tags and their furigana annotations."""
@@ -94,202 +57,339 @@ def clean_ruby_tags(text: str) -> str:
     text = re.sub(r'（[^）]+）', '', text)
     return text
 
-def sanitize_text_for_tts(text: str) -> str:
-    text = text.lower()
-    allowed_chars = "abcdefghijklmnopqrstuvwxyz0123456789 .,?!"
-    return ''.join(filter(lambda char: char in allowed_chars, text))
-
 def clean_asterisks(text: str) -> str:
     """Removes asterisks from the text."""
     return text.replace('*', '')
 
-def text_to_audio_coqui(text: str) -> str:
-    """Uses the globally initialized Coqui TTS model for Indonesian text-to-speech."""
-    if not synthesizer_id:
-        print("Indonesian synthesizer not initialized, skipping TTS.")
-        return ""
-    
-    sanitized_text = sanitize_text_for_tts(text)
-    if not sanitized_text.strip():
-        return ""
-
-    try:
-        phonemes = g2p(sanitized_text)
-        print(f"Coqui TTS (ID) - Sanitized: '{sanitized_text}' -> Phonemes: '{phonemes}'")
-        
-        # Use the global synthesizer instance
-        wav = synthesizer_id.tts(phonemes, speaker_name="wibowo", language="id")
-        
-        if wav is None:
-            raise RuntimeError("Coqui TTS synthesis failed to produce audio.")
-
-        buffer = io.BytesIO()
-        wav_norm = np.int16(np.array(wav) * 32767)
-        
-        with wave.open(buffer, 'wb') as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)
-            wf.setframerate(synthesizer_id.tts_config.audio['sample_rate'])
-            wf.writeframes(wav_norm.tobytes())
-            
-        return base64.b64encode(buffer.getvalue()).decode('utf-8')
-    except Exception as e:
-        print(f"CRITICAL ERROR in Coqui TTS for text '{text}': {e}")
-        # Return a silent audio chunk to prevent the frontend from getting stuck
-        return "UklGRiQAAABXQVZFZm10IBAAAAABAAEARKwAAIhYAQACABgAAABkYXRhAAAAA"
-
-def text_to_audio_voicevox(text: str, speaker_id: int = 47) -> str:
-    """Uses VOICEVOX engine for Japanese text-to-speech."""
+def text_to_audio_voicevox(text: str, speaker_id: int = VOICEVOX_SPEAKER_ID) -> bytes:
+    """Uses VOICEVOX engine for Japanese text-to-speech. Blocking; runs on the TTS pool."""
+    if not tts_engines.get("voicevox"):
+        print("VOICEVOX engine disabled, skipping TTS.")
+        return b""
     try:
-        # Step 1: Get audio query
-        query_params = {"text": text, "speaker": speaker_id}
-        response_query = requests.post(f"{VOICEVOX_BASE_URL}/audio_query", params=query_params)
-        response_query.raise_for_status()
-        audio_query = response_query.json()
-        
-        # Step 2: Synthesize audio
-        synth_params = {"speaker": speaker_id}
-        response_synth = requests.post(f"{VOICEVOX_BASE_URL}/synthesis", params=synth_params, json=audio_query)
-        response_synth.raise_for_status()
-        
-        audio_data = response_synth.content
+        # The shared async client reuses connections and batches sentences queued behind each other
+        audio_data = tts_postprocessor.process_wav(voicevox_client.synthesize_from_thread(text, speaker_id))
         print(f"VOICEVOX TTS (JA) - Generated audio for text: '{text}'.")
-        return base64.b64encode(audio_data).decode('utf-8')
-    except requests.exceptions.RequestException as e:
+        return audio_data
+    except httpx.HTTPError as e:
         print(f"CRITICAL ERROR communicating with VOICEVOX engine: {e}")
-        return ""
+        return b""
     except Exception as e:
         print(f"CRITICAL ERROR in VOICEVOX TTS for text '{text}': {e}")
-        return ""
+        return b""
 
-def text_to_audio_piper(text: str) -> str:
-    """Uses Piper TTS for English text-to-speech using the correct WAV synthesis method."""
-    if not piper_voice_en:
-        print("Piper (EN) synthesizer not initialized, skipping TTS.")
-        return ""
-    try:
-        print(f"Piper TTS (EN) - Synthesizing to WAV: '{text}'")
-        
-        wav_buffer = io.BytesIO()
-        # The synthesize_wav method requires a wave file object, not a raw BytesIO object.
-        # We need to wrap the BytesIO buffer with wave.open().
-        with wave.open(wav_buffer, 'wb') as wav_file:
-            piper_voice_en.synthesize_wav(text, wav_file)
-        
-        wav_buffer.seek(0)
-        audio_data = wav_buffer.getvalue()
-        
-        print(f"Piper TTS (EN) - Successfully synthesized WAV, {len(audio_data)} bytes.")
-        return base64.b64encode(audio_data).decode('utf-8')
-        
-    except Exception as e:
-        print(f"CRITICAL ERROR in Piper TTS for text '{text}': {e}")
-        import traceback
-        traceback.print_exc()
-        return ""
+ENGINE_NAMES = {'ja': 'voicevox', 'id': 'coqui', 'en': 'piper'}
+ENGINE_FUNCTIONS = {'ja': text_to_audio_voicevox, 'id': text_to_audio_coqui, 'en': text_to_audio_piper}
+
+def uses_tts_server(lang: str) -> bool:
+    """Whether the model engine for this language runs in a dedicated TTS server process."""
+    return tts_remote is not None and ENGINE_NAMES.get(lang) in LOCAL_ENGINE_FUNCTIONS
+
+def run_engine(lang: str, text: str) -> bytes:
+    """Synthesizes one sentence to WAV with the engine for its language, in-process or on the TTS server."""
+    if uses_tts_server(lang):
+        return tts_remote.synthesize(ENGINE_NAMES[lang], text, priority=PRIORITY_LIVE)
+    return ENGINE_FUNCTIONS[lang](text)
+
+def model_sample_rate(lang: str) -> Optional[int]:
+    """Sample rate of the Piper/Coqui engine for a language, or None if it is unavailable. May load the engine."""
+    name = ENGINE_NAMES.get(lang)
+    if name not in LOCAL_ENGINE_FUNCTIONS:
+        return None
+    return tts_remote.sample_rate(name) if uses_tts_server(lang) else local_sample_rate(name)
+
+def engine_sample_rate(lang: str) -> int:
+    """Returns the output sample rate of the TTS engine used for a language. May load the engine."""
+    return model_sample_rate(lang) or tts_postprocessor.output_rate(VOICEVOX_SAMPLE_RATE)
+
+def tts_cache_key(lang: str, text: str) -> Optional[str]:
+    """
+    Builds the audio cache key for a sentence from the engine, voice and output sample rate used
+    for its language, and the post-processing settings the audio was produced with.
+    """
+    processing = tts_postprocessor.signature
+    if lang == 'ja':
+        return tts_cache.make_key("voicevox", f"{VOICEVOX_SPEAKER_ID}{processing}", engine_sample_rate(lang), text)
+    sample_rate = model_sample_rate(lang)
+    if lang == 'id' and sample_rate:
+        return tts_cache.make_key("coqui", f"{COQUI_SPEAKER_ID}{processing}", sample_rate, text)
+    elif lang == 'en' and sample_rate:
+        return tts_cache.make_key("piper", f"{os.path.basename(PIPER_MODEL_EN_ONNX)}{processing}", sample_rate, text)
+    return None
+
+def synthesize_sentence(lang: str, text: str) -> bytes:
+    """Dispatches a sentence to the TTS engine for its language. Blocking; runs on the TTS pool."""
+    if lang not in ENGINE_FUNCTIONS:
+        return b""
+
+    started = time.perf_counter()
+    key = tts_cache_key(lang, text)
+    if key is None:
+        audio = run_engine(lang, text)
+    else:
+        audio = tts_cache.get_or_compute(key, lambda: run_engine(lang, text))
+    if audio:
+        tts_first_audio_latency.record(f"{ENGINE_NAMES[lang]}:wav", time.perf_counter() - started)
+    return audio
+
+def synthesize_sentence_stream(lang: str, text: str) -> Iterator[bytes]:
+    """
+    Streaming counterpart of synthesize_sentence: yields raw 16-bit mono PCM frames as soon
+    as the engine produces them. Piper streams natively; Coqui and VOICEVOX yield the whole
+    sentence as one frame. Blocking; runs on the TTS pool.
+    """
+    if lang not in ENGINE_FUNCTIONS:
+        return
+
+    started = time.perf_counter()
+    key = tts_cache_key(lang, text)
+    cached = tts_cache.get(key) if key else None
+    if cached is not None:
+        frames = iter([wav_to_pcm(cached)[0]])
+    elif lang == 'en':
+        frames = tts_remote.stream("piper", text, priority=PRIORITY_LIVE) if uses_tts_server(lang) else stream_audio_piper(text)
+    else:
+        audio = run_engine(lang, text)
+        frames = iter([wav_to_pcm(audio)[0]] if audio else [])
+
+    collected = []
+    for frame in frames:
+        if not frame:
+            continue
+        if not collected:
+            tts_first_audio_latency.record(f"{ENGINE_NAMES[lang]}:stream", time.perf_counter() - started)
+        collected.append(frame)
+        yield frame
+
+    # Only a fully delivered sentence is stored: a cancelled stream stops at the yield and a
+    # failed one raises out of the loop, so partial audio is never cached
+    if cached is None and key and collected:
+        tts_cache.put(key, pcm_to_wav(b"".join(collected), engine_sample_rate(lang)))
 
 # --- WebSocket Endpoint ---
 router = APIRouter()
 
+# Audio transports a client can negotiate for ai_audio_chunk messages:
+#   "json"   - the audio is base64-encoded inside the JSON message (default, legacy clients)
+#   "binary" - a JSON control message (transcript, seq, format, byte_length) is immediately
+#              followed by one binary frame carrying the raw audio bytes
+AUDIO_TRANSPORTS = ("json", "binary")
+
+# Audio modes:
+#   "chunk"  - one complete WAV per sentence (default)
+#   "stream" - one ai_audio_stream_start header per turn describing raw PCM, then binary PCM
+#              frames as soon as the engine produces them, each sentence preceded by an
+#              ai_transcript_segment message; ends with ai_audio_stream_end. Implies binary transport.
+AUDIO_MODES = ("chunk", "stream")
+
+# Audio formats are negotiated with ?audio_format=ogg,mp3 or a session_config message (see
+# utils.audio_encoding); the default is AUDIO_OUTPUT_FORMAT. In "chunk" mode every sentence is
+# a complete file in that format. In "stream" mode Ogg/Opus and MP3 are sent as one continuous
+# encoded stream per turn; other formats stream raw PCM.
+
 @router.websocket("/ws/conversation")
 async def conversation_ws(websocket: WebSocket):
     await websocket.accept() 
+    await voicevox_client.start()
     
-    aria_prompt = load_system_prompt("aria")
     chat_history = []
 
+    async def attach_chat(chat_id: str):
+        # Continue the stored history of an existing chat, e.g. after a reconnect; the call's turns are saved to it
+        session["chat_id"] = chat_id
+        chat_history[:] = await run_in_threadpool(session_store.get, chat_id, get_db_connection())
+
+    # The transport can be chosen with ?audio_transport=binary or a session_config message
+    requested_transport = websocket.query_params.get("audio_transport", "json")
+    session = {
+        "audio_transport": requested_transport if requested_transport in AUDIO_TRANSPORTS else "json",
+        "audio_mode": "chunk",
+        "audio_format": negotiate_audio_format(websocket.query_params.get("audio_format")),
+        # Encoder of the current turn's audio stream, when the stream is compressed
+        "stream_encoder": None,
+        "seq": 0,
+        "chat_id": None,
+    }
+    if websocket.query_params.get("chat_id"):
+        await attach_chat(websocket.query_params["chat_id"])
+
+    # Explicit prompt caches are per connection: a call's language and compaction state are its own
+    prompt_cache_key = f"ws:{id(websocket)}"
+    # Cache refreshes still running; awaited before the cache is discarded, or a cache they
+    # create after the discard would be left on the server until its TTL
+    pending_refreshes = set()
+
+    # Keeps a binary control message and its audio frame adjacent on the wire
+    send_lock = asyncio.Lock()
+
+    async def send_json(message: dict):
+        async with send_lock:
+            await websocket.send_json(message)
+
+    async def send_audio_chunk(audio: bytes, transcript: str):
+        audio_format = session["audio_format"]
+        if audio_format.name != "wav":
+            audio = await asyncio.get_running_loop().run_in_executor(get_tts_executor(), encode_wav, audio, audio_format)
+        seq = session["seq"]
+        session["seq"] += 1
+        async with send_lock:
+            if session["audio_transport"] == "binary":
+                await websocket.send_json({
+                    "type": "ai_audio_chunk",
+                    "transcript": transcript,
+                    "seq": seq,
+                    "format": audio_format.name,
+                    "mime_type": audio_format.mime_type,
+                    "byte_length": len(audio)
+                })
+                await websocket.send_bytes(audio)
+            else:
+                await websocket.send_json({
+                    "type": "ai_audio_chunk",
+                    "audio_base64": base64.b64encode(audio).decode('utf-8'),
+                    "transcript": transcript,
+                    "seq": seq,
+                    "format": audio_format.name,
+                    "mime_type": audio_format.mime_type
+                })
+
+    async def send_transcript_segment(transcript: str):
+        seq = session["seq"]
+        session["seq"] += 1
+        await send_json({"type": "ai_transcript_segment", "transcript": transcript, "seq": seq})
+
+    async def send_stream_frame(frame: bytes):
+        encoder = session["stream_encoder"]
+        if encoder is not None:
+            frame = await asyncio.get_running_loop().run_in_executor(get_tts_executor(), encoder.feed, frame)
+            if not frame:
+                return
+        async with send_lock:
+            await websocket.send_bytes(frame)
+
+    # Sentences are synthesized off the event loop and delivered in order by the pipelines
+    tts_pipeline = TTSPipeline(synthesize_sentence, send_audio_chunk)
+    stream_pipeline = StreamingTTSPipeline(synthesize_sentence_stream, send_transcript_segment, send_stream_frame)
+    tts_pipeline.start()
+    stream_pipeline.start()
+
     try:
         while True:
             data = await websocket.receive_json()
-            if data.get('type') == 'user_transcript':
+            if data.get('type') == 'session_config':
+                transport = data.get('audio_transport', session["audio_transport"])
+                if transport in AUDIO_TRANSPORTS:
+                    session["audio_transport"] = transport
+                mode = data.get('audio_mode', session["audio_mode"])
+                if mode in AUDIO_MODES:
+                    session["audio_mode"] = mode
+                if data.get('audio_format'):
+                    session["audio_format"] = negotiate_audio_format(data['audio_format'])
+                if session["audio_mode"] == "stream":
+                    session["audio_transport"] = "binary"
+                if data.get('chat_id') and data['chat_id'] != session["chat_id"]:
+                    await attach_chat(data['chat_id'])
+                await send_json({
+                    "type": "session_config_ack",
+                    "audio_transport": session["audio_transport"],
+                    "audio_mode": session["audio_mode"],
+                    "audio_format": session["audio_format"].name
+                })
+            elif data.get('type') == 'user_transcript':
                 user_text = data['text']
                 user_lang = data.get('lang', 'id')
                 if not user_text.strip():
                     continue
 
-                chat_history.append(genai_types.Content(role="user", parts=[genai_types.Part.from_text(user_text)]))
+                user_content = genai_types.Content(role="user", parts=[genai_types.Part.from_text(user_text)])
+                chat_history.append(user_content)
+                if session["chat_id"]:
+                    # Persisted through the write-behind queue, never waiting on the database mid-call
+                    created_at = message_writer.submit(session["chat_id"], "user", user_text)
+                    session_store.append(session["chat_id"], user_content, persisted_at=created_at)
 
-                # Dynamically create model_config with language instruction for each turn
-                lang_map = {'id': 'Indonesian', 'en': 'English', 'ja': 'Japanese'}
-                lang_name = lang_map.get(user_lang, 'Indonesian')
-                
-                # Add a clear, forceful instruction in the persona's primary language.
-                lang_instruction = f"\n\nSANGAT PENTING: Pengguna berbicara dalam Bahasa {lang_name}. Balas HANYA dalam Bahasa {lang_name}."
-                
-                # Combine with the base prompt
-                dynamic_prompt = aria_prompt + lang_instruction
-                
-                model_config = genai_types.GenerateContentConfig(system_instruction=dynamic_prompt)
+                # Keep the call's context within the token budget (may summarize, so off the event loop)
+                fitted_history = await run_in_threadpool(context_manager.fit, chat_history)
+                if len(fitted_history) != len(chat_history):
+                    chat_history[:] = fitted_history
+                    if session["chat_id"]:
+                        session_store.set_history(session["chat_id"], list(chat_history))
 
-                llm_stream = genai_client.models.generate_content_stream(
-                    model="gemini-2.5-flash",
-                    contents=chat_history,
-                    config=model_config
-                )
+                # The persona with the reply-language instruction is precompiled per language
+                model_config = prompt_registry.chat_config("aria", user_lang)
+                # Reuse the explicit cache of this call's persona + earlier history, if there is one
+                request_contents, request_config = prompt_cache.request(prompt_cache_key, chat_history, model_config)
+
+                llm_stream = stream_content_async(request_contents, config=request_config)
                 
-                text_buffer = ""
                 full_response_text = ""
                 detected_lang = user_lang
-                sentence_end_pattern = re.compile(r'(?<=[.?!,。？！、])\s*')
+                segmenter = SentenceSegmenter(detected_lang)
+
+                streaming = session["audio_mode"] == "stream"
+                pipeline = stream_pipeline if streaming else tts_pipeline
+                if streaming:
+                    # Resolved on the TTS pool: it may have to wait for the engine to finish loading
+                    sample_rate = await asyncio.get_running_loop().run_in_executor(
+                        get_tts_executor(), engine_sample_rate, detected_lang
+                    )
+                    audio_format = session["audio_format"]
+                    if audio_format.sf_format is not None and audio_format.streaming:
+                        encoder = AudioEncoder(audio_format, sample_rate)
+                        session["stream_encoder"] = encoder
+                        stream_format = {"format": audio_format.name, "mime_type": audio_format.mime_type,
+                                         "sample_rate": encoder.output_rate}
+                    else:
+                        session["stream_encoder"] = None
+                        stream_format = {"format": "pcm_s16le", "sample_rate": sample_rate}
+                    await send_json({"type": "ai_audio_stream_start", **stream_format, "channels": 1})
                 
-                for chunk in llm_stream:
-                    if chunk.text:
-                        text_buffer += chunk.text
-                        full_response_text += chunk.text
-                        
-                        # Process sentences as they are formed
-                        sentences = sentence_end_pattern.split(text_buffer)
-                        
-                        # The last part might be an incomplete sentence, so we keep it in the buffer
-                        text_buffer = sentences[-1]
-                        sentences_to_process = sentences[:-1]
-                        
-                        for sentence in sentences_to_process:
-                            if sentence:
-                                
+                try:
+                    async for chunk in llm_stream:
+                        if chunk.text:
+                            full_response_text += chunk.text
+
+                            # Process segments as they are formed; the segmenter keeps incomplete text buffered
+                            for sentence in segmenter.feed(chunk.text):
                                 text_for_tts = clean_asterisks(clean_ruby_tags(sentence))
-                                audio_b64 = None
-                                
-                                if detected_lang == 'ja':
-                                    audio_b64 = text_to_audio_voicevox(text_for_tts)
-                                elif detected_lang == 'id':
-                                    audio_b64 = text_to_audio_coqui(text_for_tts)
-                                elif detected_lang == 'en':
-                                    audio_b64 = text_to_audio_piper(text_for_tts)
-                                
-                                if audio_b64:
-                                    await websocket.send_json({
-                                        "type": "ai_audio_chunk",
-                                        "audio_base64": audio_b64,
-                                        "transcript": text_for_tts
-                                    })
+                                if text_for_tts.strip():
+                                    await pipeline.submit(detected_lang, text_for_tts)
+                except StreamTimeoutError as e:
+                    # Keep the call alive: speak what we have so far and tell the client the turn was cut short
+                    print(f"Model stream timed out: {e}")
+                    await send_json({"type": "error", "message": str(e)})
 
                 # After the loop, process any remaining text in the buffer
-                remaining_text = text_buffer.strip()
-                if remaining_text:
-                    # Use the last detected language, or default to 'id'
-
-                    text_for_tts = clean_asterisks(clean_ruby_tags(remaining_text))
-                    audio_b64 = None
-                    
-                    if detected_lang == 'ja':
-                        audio_b64 = text_to_audio_voicevox(text_for_tts)
-                    elif detected_lang == 'id':
-                        audio_b64 = text_to_audio_coqui(text_for_tts)
-                    elif detected_lang == 'en':
-                        audio_b64 = text_to_audio_piper(text_for_tts)
-
-                    if audio_b64:
-                        await websocket.send_json({
-                            "type": "ai_audio_chunk",
-                            "audio_base64": audio_b64,
-                            "transcript": text_for_tts
-                        })
-                
-                await websocket.send_json({"type": "ai_turn_end"})
+                for sentence in segmenter.flush():
+                    text_for_tts = clean_asterisks(clean_ruby_tags(sentence))
+                    if text_for_tts.strip():
+                        await pipeline.submit(detected_lang, text_for_tts)
+
+                # Every audio chunk of this turn must reach the client before the turn ends
+                await pipeline.drain()
+                if streaming:
+                    encoder, session["stream_encoder"] = session["stream_encoder"], None
+                    if encoder is not None:
+                        tail = await asyncio.get_running_loop().run_in_executor(get_tts_executor(), encoder.close)
+                        if tail:
+                            async with send_lock:
+                                await websocket.send_bytes(tail)
+                    await send_json({"type": "ai_audio_stream_end"})
+                await send_json({"type": "ai_turn_end"})
 
                 if full_response_text.strip():
-                    chat_history.append(genai_types.Content(role="model", parts=[genai_types.Part.from_text(full_response_text)]))
+                    model_content = genai_types.Content(role="model", parts=[genai_types.Part.from_text(full_response_text)])
+                    chat_history.append(model_content)
+                    if session["chat_id"]:
+                        created_at = message_writer.submit(session["chat_id"], "model", full_response_text)
+                        session_store.append(session["chat_id"], model_content, persisted_at=created_at)
+                    if prompt_cache.enabled:
+                        # Cache the grown prefix for the next turn, off the request path
+                        refresh = asyncio.get_running_loop().run_in_executor(
+                            None, prompt_cache.refresh, prompt_cache_key, list(chat_history), model_config.system_instruction
+                        )
+                        pending_refreshes.add(refresh)
+                        refresh.add_done_callback(pending_refreshes.discard)
 
     except WebSocketDisconnect:
         print("Client disconnected")
@@ -301,3 +401,10 @@ async def conversation_ws(websocket: WebSocket):
             await websocket.send_json({"type": "error", "message": str(e)})
         except Exception as send_e:
             print(f"Failed to send error to client: {send_e}")
+    finally:
+        await tts_pipeline.close()
+        await stream_pipeline.close()
+        if prompt_cache.enabled:
+            if pending_refreshes:
+                await asyncio.wait(pending_refreshes)
+            await run_in_threadpool(prompt_cache.discard, prompt_cache_key)
@@ -1,22 +1,27 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends
 from supabase import Client
 from database import get_db_connection
-from fastapi.responses import JSONResponse
-from google import genai
+from fastapi.responses import JSONResponse, StreamingResponse
 from google.genai import types
 import os
 import tempfile
 import base64
-from utils.audio_utils import convert_to_wav
-import io
-import wave
+from utils.audio_utils import speech_wav
+from fastapi.concurrency import run_in_threadpool
+from config import AUDIO_INLINE_MAX_BYTES
 import logging
 import json
-from typing import Optional, List, Dict
+import time
+import asyncio
+from typing import Optional
 from pydantic import BaseModel
 
 from .chat_history import insert_message
-from utils.model_utils import process_content_with_tools, client as genai_client
+from services.session_store import session_store
+from utils.model_utils import process_content_with_tools, stream_content_with_tools, client as genai_client
+from utils.stream_utils import sse_event
+from services.gemini_tts import gemini_tts
+from utils.audio_encoding import negotiate_audio_format
 from google.genai import types as genai_types # Import types for history reconstruction
 
 # Configure detailed logging
@@ -32,68 +37,67 @@ class ConversationResponse(BaseModel):
     user_transcript: str
     ai_response: str
     audio_base64: str
+    audio_mime_type: str = "audio/wav"
+
+# Voice of the spoken answers of the audio-to-audio pipeline
+FULL_CONVERSATION_TTS_VOICE = "Zephyr"
+
+def transcribe_speech(wav_data: bytes) -> str:
+    """
+    Transcribes a WAV recording with Gemini. Recordings up to AUDIO_INLINE_MAX_BYTES are sent
+    inline with the request; larger ones are uploaded through the Files API and deleted after.
+    """
+    uploaded_file = None
+    temp_wav_path = None
+    try:
+        if len(wav_data) <= AUDIO_INLINE_MAX_BYTES:
+            audio_part = types.Part.from_bytes(wav_data, "audio/wav")
+        else:
+            # The SDK uploads from a path only
+            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
+                tmp_file.write(wav_data)
+                temp_wav_path = tmp_file.name
+            uploaded_file = genai_client.files.upload(path=temp_wav_path)
+            audio_part = types.Part(file_data=types.FileData(mime_type=uploaded_file.mime_type, file_uri=uploaded_file.uri))
+        stt_result = genai_client.models.generate_content(
+            model="gemini-2.5-flash",
+            contents=["Transcribe this audio.", audio_part]
+        )
+        return (stt_result.text or "").strip()
+    finally:
+        if uploaded_file:
+            logger.info(f"Deleting uploaded file: {uploaded_file.name}")
+            genai_client.files.delete(name=uploaded_file.name)
+        if temp_wav_path and os.path.exists(temp_wav_path):
+            os.unlink(temp_wav_path)
 
 @router.post("/api/full-conversation", response_model=ConversationResponse)
 async def full_conversation(
     audio: UploadFile = File(...),
-    history: str = Form('[]'), # Default to an empty JSON array string
+    history: Optional[str] = Form(None), # JSON array; omit to use the server-side history for chat_id
     chat_id: Optional[str] = Form(None),
     enable_tts: bool = Form(True), # Default to True for audio inputs
+    audio_format: Optional[str] = Form(None), # Preferred audio formats, e.g. "ogg,mp3"
     db: Client = Depends(get_db_connection)
 ):
     """
     Refactored audio-to-audio pipeline with proper history management and tool-calling.
     """
-    temp_input_path = None
-    temp_wav_path = None
-    audio_file_obj = None
-    
     try:
-        # Save and convert audio
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(audio.filename)[1]) as tmp_file:
-            tmp_file.write(await audio.read())
-            temp_input_path = tmp_file.name
-        
-        temp_wav_path = temp_input_path + ".wav"
-        convert_to_wav(temp_input_path, temp_wav_path)
-        
+        # Decode and resample the recording in memory to 16 kHz 16-bit mono WAV
+        wav_data = await run_in_threadpool(speech_wav, await audio.read())
+
         # 1. Transcribe Audio to Text (STT)
-        audio_file_obj = genai_client.files.upload(path=temp_wav_path)
-        stt_result = genai_client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[
-                "Transcribe this audio.",
-                types.Part(file_data=types.FileData(mime_type=audio_file_obj.mime_type, file_uri=audio_file_obj.uri))
-            ]
-        )
-        user_transcript = stt_result.text.strip()
+        user_transcript = await run_in_threadpool(transcribe_speech, wav_data)
         logger.info(f"User transcript: '{user_transcript}'")
 
         if not user_transcript:
             raise HTTPException(status_code=400, detail="Audio could not be transcribed or is empty.")
 
-        # 2. Build conversation history
-        conversation_history = []
-
-        # Reconstruct history from the rich JSON format
-        for message in json.loads(history):
-            # CRITICAL FIX: Map 'assistant' role to 'model' for the API
-            role = message.get("role")
-            if role == "assistant":
-                role = "model"
-
-            parts = []
-            for part_data in message.get("parts", []):
-                if 'text' in part_data:
-                    parts.append(genai_types.Part.from_text(part_data['text']))
-                elif 'function_call' in part_data:
-                    fc = part_data['function_call']
-                    parts.append(genai_types.Part.from_function_call(name=fc['name'], args=fc['args']))
-                elif 'function_response' in part_data:
-                    fr = part_data['function_response']
-                    parts.append(genai_types.Part.from_function_response(name=fr['name'], response=fr['response']))
-            if parts:
-                conversation_history.append(genai_types.Content(role=role, parts=parts))
+        # 2. Build conversation history: the client's history if it sent one, otherwise the server-side history for the chat
+        conversation_history = await run_in_threadpool(
+            session_store.history_for_turn, chat_id, json.loads(history) if history is not None else None, db
+        )
 
         # Add the new user transcript to the history
         conversation_history.append(
@@ -101,48 +105,27 @@ async def full_conversation(
         )
         # Insert user message to Supabase
         if chat_id:
-            insert_message(chat_id, "user", user_transcript, db)
+            await run_in_threadpool(insert_message, chat_id, "user", user_transcript, db)
 
         # 3. Generate AI response and get the updated history
         # Log the exact history being sent to the model for debugging
         logger.debug(f"Full conversation history sent to model: {conversation_history}")
-        ai_response_text, updated_history = process_content_with_tools(conversation_history)
+        ai_response_text, updated_history = await run_in_threadpool(process_content_with_tools, conversation_history)
         logger.info(f"AI response: '{ai_response_text}'")
         # Insert AI message to Supabase
         if chat_id and ai_response_text:
-            insert_message(chat_id, "model", ai_response_text, db)
+            await run_in_threadpool(insert_message, chat_id, "model", ai_response_text, db)
 
         # 4. Generate TTS for the final AI response (non-critical)
         audio_base64 = "" # Default to empty string
+        output_format = negotiate_audio_format(audio_format)
         if enable_tts:
             try:
                 if ai_response_text: # Only generate TTS if there is text
-                    tts_config = types.GenerateContentConfig(
-                        response_modalities=["audio"],
-                        speech_config=types.SpeechConfig(
-                            voice_config=types.VoiceConfig(
-                                prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name="Zephyr")
-                            )
-                        )
+                    audio_data = await run_in_threadpool(
+                        gemini_tts.synthesize_audio, ai_response_text, output_format, FULL_CONVERSATION_TTS_VOICE
                     )
-                    
-                    tts_result = genai_client.models.generate_content(
-                        model="gemini-2.5-flash-preview-tts",
-                        contents=ai_response_text,
-                        config=tts_config
-                    )
-                    
-                    if tts_result.candidates and tts_result.candidates[0].content.parts and tts_result.candidates[0].content.parts[0].inline_data:
-                        pcm_data = tts_result.candidates[0].content.parts[0].inline_data.data
-                        wav_buffer = io.BytesIO()
-                        with wave.open(wav_buffer, 'wb') as wf:
-                            wf.setnchannels(1)
-                            wf.setsampwidth(2)
-                            wf.setframerate(24000)
-                            wf.writeframes(pcm_data)
-                        audio_base64 = base64.b64encode(wav_buffer.getvalue()).decode('utf-8')
-                    else:
-                        logger.warning("TTS generation succeeded but returned no audio data.")
+                    audio_base64 = base64.b64encode(audio_data).decode('utf-8')
             except Exception as tts_error:
                 logger.error(f"TTS generation failed, but proceeding without audio. Error: {tts_error}")
 
@@ -150,20 +133,111 @@ async def full_conversation(
         return JSONResponse(content={
             "user_transcript": user_transcript,
             "ai_response": ai_response_text,
-            "audio_base64": audio_base64
+            "audio_base64": audio_base64,
+            "audio_mime_type": output_format.mime_type
         })
         
     except Exception as e:
         import traceback
         logger.error(f"Pipeline error details:\n{traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Error in pipeline: {str(e)}")
-    
-    finally:
-        # Cleanup
-        if audio_file_obj:
-            logger.info(f"Deleting uploaded file: {audio_file_obj.name}")
-            genai_client.files.delete(name=audio_file_obj.name)
-        if temp_input_path and os.path.exists(temp_input_path):
-            os.unlink(temp_input_path)
-        if temp_wav_path and os.path.exists(temp_wav_path):
-            os.unlink(temp_wav_path)
+
+
+@router.post("/api/full-conversation/stream")
+async def full_conversation_stream(
+    audio: UploadFile = File(...),
+    history: Optional[str] = Form(None), # JSON array; omit to use the server-side history for chat_id
+    chat_id: Optional[str] = Form(None),
+    enable_tts: bool = Form(True),
+    audio_format: Optional[str] = Form(None),
+    db: Client = Depends(get_db_connection)
+):
+    """
+    Streaming variant of /api/full-conversation, sent as Server-Sent Events.
+
+    The conversation history is loaded while the audio is decoded and transcribed, and
+    messages are persisted off the critical path, so the transcript arrives after STT alone.
+
+    Events, in order:
+        transcript                {"text": ...} what the user said, as soon as STT finishes
+        tool_call / tool_result   progress of any tools the model uses
+        token                     {"text": ...} deltas of the answer as the model streams it
+        text                      {"text": ...} the complete answer
+        audio                     {"audio_base64": ..., "mime_type": ...} the answer, only if enable_tts
+        done                      {"transcript_ms": ..., "first_token_ms": ..., "total_ms": ...}
+        error                     {"detail": ...} if the pipeline fails; the stream ends after it
+    """
+    audio_bytes = await audio.read()
+    try:
+        client_history = json.loads(history) if history is not None else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="history must be a JSON array")
+
+    async def events():
+        started = time.perf_counter()
+        elapsed_ms = lambda: round((time.perf_counter() - started) * 1000, 1)
+        # The history (possibly hydrated from the database) loads while the audio is transcribed
+        history_task = asyncio.ensure_future(run_in_threadpool(session_store.history_for_turn, chat_id, client_history, db))
+        try:
+            wav_data = await run_in_threadpool(speech_wav, audio_bytes)
+            user_transcript = await run_in_threadpool(transcribe_speech, wav_data)
+            if not user_transcript:
+                yield sse_event("error", {"detail": "Audio could not be transcribed or is empty."})
+                return
+            transcript_ms = elapsed_ms()
+            yield sse_event("transcript", {"text": user_transcript})
+
+            conversation_history = await history_task
+            conversation_history.append(
+                genai_types.Content(role="user", parts=[genai_types.Part.from_text(user_transcript)])
+            )
+            if chat_id:
+                await run_in_threadpool(insert_message, chat_id, "user", user_transcript, db)
+
+            first_token_ms = None
+            ai_response_text = ""
+            async for event in stream_content_with_tools(conversation_history):
+                if event["type"] == "token":
+                    if first_token_ms is None:
+                        first_token_ms = elapsed_ms()
+                    yield sse_event("token", {"text": event["text"]})
+                elif event["type"] == "final":
+                    ai_response_text = event["text"]
+                else:
+                    yield sse_event(event["type"], {k: v for k, v in event.items() if k != "type"})
+            yield sse_event("text", {"text": ai_response_text})
+
+            if chat_id and ai_response_text:
+                await run_in_threadpool(insert_message, chat_id, "model", ai_response_text, db)
+
+            # TTS for the answer is non-critical and sent after the text
+            if enable_tts and ai_response_text:
+                try:
+                    output_format = negotiate_audio_format(audio_format)
+                    audio_answer = await run_in_threadpool(
+                        gemini_tts.synthesize_audio, ai_response_text, output_format, FULL_CONVERSATION_TTS_VOICE
+                    )
+                    if audio_answer:
+                        yield sse_event("audio", {
+                            "audio_base64": base64.b64encode(audio_answer).decode('utf-8'),
+                            "mime_type": output_format.mime_type,
+                        })
+                except Exception as tts_error:
+                    logger.error(f"TTS generation failed, but proceeding without audio. Error: {tts_error}")
+
+            yield sse_event("done", {"transcript_ms": transcript_ms, "first_token_ms": first_token_ms, "total_ms": elapsed_ms()})
+        except Exception as e:
+            import traceback
+            logger.error(f"Pipeline error details:\n{traceback.format_exc()}")
+            yield sse_event("error", {"detail": f"Error in pipeline: {str(e)}"})
+        finally:
+            if not history_task.done():
+                history_task.cancel()
+            elif not history_task.cancelled():
+                history_task.exception()  # Retrieved, so an unused failure is not reported as unhandled
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,11 +1,9 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from google import genai
-import os
 import base64
-from google.genai import types
-import io
-import wave
+import time
 
 import logging
 from typing import List, Dict, Optional, Any
@@ -13,22 +11,44 @@ from typing import List, Dict, Optional, Any
 from database import get_db_connection
 from supabase import Client
 from fastapi import Depends
-from utils.model_utils import process_content_with_tools, load_system_prompt, client as genai_client
+from utils.model_utils import process_content_with_tools, stream_content_with_tools
 from google.genai import types as genai_types # Import types for history reconstruction
 from api.chat_history import insert_message
+from config import GEMINI_TTS_VOICE
+from services.gemini_tts import gemini_tts
+from utils.audio_encoding import negotiate_audio_format
+from services.session_store import session_store
+from services.prompt_registry import prompt_registry
+from services.tts_metrics import text_first_token_latency
+from utils.stream_utils import sse_event
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 class TextRequest(BaseModel):
     text: str
-    history: List[Dict[str, Any]] # History is now more complex
+    # Optional: when omitted, the server-side history stored for chat_id is used
+    history: Optional[List[Dict[str, Any]]] = None
     chat_id: Optional[str] = None
     enable_tts: bool = False
+    # Preferred audio formats, e.g. "ogg,mp3"; see utils.audio_encoding
+    audio_format: Optional[str] = None
 
 class TextResponse(BaseModel):
     text: str
     audio_base64: str
+    audio_mime_type: str = "audio/wav"
+
+def build_conversation_history(request: TextRequest, db: Client) -> list:
+    """
+    Returns the history for this turn with the new user message appended: the client's
+    history if it sent one, otherwise the server-side history stored for the chat.
+    """
+    conversation_history = session_store.history_for_turn(request.chat_id, request.history, db)
+    conversation_history.append(
+        genai_types.Content(role="user", parts=[genai_types.Part(text=request.text)])
+    )
+    return conversation_history
 
 @router.post("/api/generateText", response_model=TextResponse)
 async def generate_text(request: TextRequest, db: Client = Depends(get_db_connection)):
@@ -37,42 +57,20 @@ async def generate_text(request: TextRequest, db: Client = Depends(get_db_connec
     and tool-calling capabilities.
     """
     try:
-        # 1. Build conversation history from the client request
-        conversation_history = []
-
-        # Reconstruct history from the rich JSON format
-        for message in request.history:
-            # CRITICAL FIX: Map 'assistant' role to 'model' for the API
-            role = message.get("role")
-            if role == "assistant":
-                role = "model"
-            
-            parts = []
-            for part_data in message.get("parts", []):
-                if 'text' in part_data:
-                    parts.append(genai_types.Part(text=part_data['text']))
-                elif 'function_call' in part_data:
-                    fc = part_data['function_call']
-                    parts.append(genai_types.Part.from_function_call(name=fc['name'], args=fc['args']))
-                elif 'function_response' in part_data:
-                    fr = part_data['function_response']
-                    parts.append(genai_types.Part.from_function_response(name=fr['name'], response=fr['response']))
-            if parts:
-                conversation_history.append(genai_types.Content(role=role, parts=parts))
-
-        # 2. Add the new user message to the history
-        conversation_history.append(
-            genai_types.Content(role="user", parts=[genai_types.Part(text=request.text)])
-        )
-        # Insert user message to Supabase
+        # 1. Build conversation history from the client request, including the new user message
+        # History hydration can query the database, so it runs off the event loop
+        conversation_history = await run_in_threadpool(build_conversation_history, request, db)
+
+        # 2. Insert user message to Supabase
         if request.chat_id:
             insert_message(request.chat_id, "user", request.text, db)
 
-        # 3. Generate the response and get the updated history
-        logger.debug(f"Text chat history sent to model: {conversation_history}")
         # 3. Load persona and generate the response
-        aria_prompt = load_system_prompt("aria")
-        text_response, updated_history = process_content_with_tools(conversation_history, system_prompt=aria_prompt)
+        logger.debug(f"Text chat history sent to model: {conversation_history}")
+        aria_prompt = prompt_registry.system_prompt("aria")
+        text_response, updated_history = await run_in_threadpool(
+            process_content_with_tools, conversation_history, system_prompt=aria_prompt
+        )
         logger.info(f"AI Response for Text: '{text_response}'")
         # Insert AI message to Supabase
         if request.chat_id and text_response:
@@ -80,51 +78,84 @@ async def generate_text(request: TextRequest, db: Client = Depends(get_db_connec
 
         # 4. Generate TTS audio for the final response (non-critical)
         audio_base64 = ""
+        audio_format = negotiate_audio_format(request.audio_format)
         if request.enable_tts:
             try:
                 if text_response:
-                    tts_config = types.GenerateContentConfig(
-                        response_modalities=["audio"],
-                        speech_config=types.SpeechConfig(
-                            voice_config=types.VoiceConfig(
-                                prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name="Leda")
-                            )
-                        )
-                    )
-                    
-                    # Correctly format contents for the TTS model as per documentation
-                    tts_contents = [
-                        types.Content(
-                            role="user",
-                            parts=[
-                                types.Part(text=text_response),
-                            ],
-                        ),
-                    ]
-                    
-                    tts_result = genai_client.models.generate_content(
-                        model="gemini-2.5-flash-preview-tts",
-                        contents=tts_contents,
-                        generation_config=tts_config
-                    )
-                    
-                    if tts_result.candidates and tts_result.candidates[0].content.parts and tts_result.candidates[0].content.parts[0].inline_data:
-                        pcm_data = tts_result.candidates[0].content.parts[0].inline_data.data
-                        wav_buffer = io.BytesIO()
-                        with wave.open(wav_buffer, 'wb') as wf:
-                            wf.setnchannels(1)
-                            wf.setsampwidth(2)
-                            wf.setframerate(24000)
-                            wf.writeframes(pcm_data)
-                        audio_base64 = base64.b64encode(wav_buffer.getvalue()).decode('utf-8')
-                    else:
-                        logger.warning("TTS generation succeeded but returned no audio data.")
+                    audio_data = await run_in_threadpool(gemini_tts.synthesize_audio, text_response, audio_format, GEMINI_TTS_VOICE)
+                    audio_base64 = base64.b64encode(audio_data).decode('utf-8')
             except Exception as tts_error:
                 logger.error(f"TTS generation failed, but proceeding without audio. Error: {tts_error}")
         
-        return TextResponse(text=text_response, audio_base64=audio_base64)
+        return TextResponse(text=text_response, audio_base64=audio_base64, audio_mime_type=audio_format.mime_type)
         
     except Exception as e:
         import traceback
         logger.error(f"Error in generateText: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+@router.post("/api/generateText/stream")
+async def generate_text_stream(request: TextRequest, db: Client = Depends(get_db_connection)):
+    """
+    Streaming variant of /api/generateText, sent as Server-Sent Events.
+
+    Events, in order:
+        tool_call / tool_result   progress of any tools the model uses
+        token                     {"text": ...} deltas of the answer as the model streams it
+        text                      {"text": ...} the complete answer
+        audio                     {"audio_base64": ..., "mime_type": ...} the answer, only if enable_tts
+        done                      {"first_token_ms": ...} after the answer is persisted
+        error                     {"detail": ...} if generation fails; the stream ends after it
+    """
+    started = time.perf_counter()
+    conversation_history = await run_in_threadpool(build_conversation_history, request, db)
+
+    async def events():
+        try:
+            if request.chat_id:
+                await run_in_threadpool(insert_message, request.chat_id, "user", request.text, db)
+
+            aria_prompt = prompt_registry.system_prompt("aria")
+            first_token_ms = None
+            text_response = ""
+            async for event in stream_content_with_tools(conversation_history, system_prompt=aria_prompt):
+                if event["type"] == "token":
+                    if first_token_ms is None:
+                        first_token_s = time.perf_counter() - started
+                        first_token_ms = round(first_token_s * 1000, 1)
+                        text_first_token_latency.record("generateText:stream", first_token_s)
+                    yield sse_event("token", {"text": event["text"]})
+                elif event["type"] == "final":
+                    text_response = event["text"]
+                else:
+                    yield sse_event(event["type"], {k: v for k, v in event.items() if k != "type"})
+            logger.info(f"AI Response for streamed text: {len(text_response)} chars, first token after {first_token_ms} ms")
+            yield sse_event("text", {"text": text_response})
+
+            if request.chat_id and text_response:
+                await run_in_threadpool(insert_message, request.chat_id, "model", text_response, db)
+
+            # TTS for the complete answer is non-critical and sent after the text
+            if request.enable_tts and text_response:
+                try:
+                    audio_format = negotiate_audio_format(request.audio_format)
+                    audio_data = await run_in_threadpool(gemini_tts.synthesize_audio, text_response, audio_format, GEMINI_TTS_VOICE)
+                    if audio_data:
+                        yield sse_event("audio", {
+                            "audio_base64": base64.b64encode(audio_data).decode('utf-8'),
+                            "mime_type": audio_format.mime_type,
+                        })
+                except Exception as tts_error:
+                    logger.error(f"TTS generation failed, but proceeding without audio. Error: {tts_error}")
+
+            yield sse_event("done", {"first_token_ms": first_token_ms})
+        except Exception as e:
+            import traceback
+            logger.error(f"Error in generateText stream: {traceback.format_exc()}")
+            yield sse_event("error", {"detail": f"Error: {str(e)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,19 +1,18 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends
-from google import genai
+from fastapi.concurrency import run_in_threadpool
 from google.genai import types
-import os
-import tempfile
 import base64
-import io
-import wave
 import json
 import logging
-from typing import List, Dict, Optional, Any
+from typing import Optional
 from pydantic import BaseModel
 
 from .chat_history import insert_message
-from utils.model_utils import process_content_with_tools, client as genai_client
-from google.genai import types as genai_types
+from services.session_store import session_store
+from utils.model_utils import process_content_with_tools
+from services.gemini_tts import gemini_tts
+from utils.audio_encoding import negotiate_audio_format
+from config import GEMINI_TTS_VOICE
 from database import get_db_connection
 from supabase import Client
 
@@ -23,13 +22,15 @@ logger = logging.getLogger(__name__)
 class ImageResponse(BaseModel):
     text: str
     audio_base64: str
+    audio_mime_type: str = "audio/wav"
 
 @router.post("/api/processImage", response_model=ImageResponse)
 async def process_image(
     prompt: str = Form(...),
     image: UploadFile = File(...),
-    history: str = Form('[]'),
+    history: Optional[str] = Form(None), # JSON array; omit to use the server-side history for chat_id
     chat_id: Optional[str] = Form(None),
+    audio_format: Optional[str] = Form(None), # Preferred audio formats, e.g. "ogg,mp3"
     db: Client = Depends(get_db_connection)
 ):
     """
@@ -38,28 +39,10 @@ async def process_image(
     try:
         image_bytes = await image.read()
         
-        # Build the conversation history from the client request
-        conversation_history = []
-
-        # Reconstruct history from the rich JSON format
-        for message in json.loads(history):
-            # CRITICAL FIX: Map 'assistant' role to 'model' for the API
-            role = message.get("role")
-            if role == "assistant":
-                role = "model"
-            
-            parts = []
-            for part_data in message.get("parts", []):
-                if 'text' in part_data:
-                    parts.append(genai_types.Part.from_text(part_data['text']))
-                elif 'function_call' in part_data:
-                    fc = part_data['function_call']
-                    parts.append(genai_types.Part.from_function_call(name=fc['name'], args=fc['args']))
-                elif 'function_response' in part_data:
-                    fr = part_data['function_response']
-                    parts.append(genai_types.Part.from_function_response(name=fr['name'], response=fr['response']))
-            if parts:
-                conversation_history.append(genai_types.Content(role=role, parts=parts))
+        # Build the conversation history: the client's history if it sent one, otherwise the server-side history for the chat
+        conversation_history = await run_in_threadpool(
+            session_store.history_for_turn, chat_id, json.loads(history) if history is not None else None, db
+        )
 
         # Add the new user message (with image) to the history
         conversation_history.append(
@@ -74,7 +57,7 @@ async def process_image(
         
         # Generate the response and get the updated history
         logger.debug(f"Image chat history sent to model: {conversation_history}")
-        text_response, updated_history = process_content_with_tools(conversation_history)
+        text_response, updated_history = await run_in_threadpool(process_content_with_tools, conversation_history)
         logger.info(f"AI Response for Image: '{text_response}'")
 
         # Insert user and AI messages to Supabase
@@ -86,38 +69,15 @@ async def process_image(
 
         # Generate TTS audio for the final response (non-critical)
         audio_base64 = ""
+        output_format = negotiate_audio_format(audio_format)
         try:
             if text_response:
-                tts_config = types.GenerateContentConfig(
-                    response_modalities=["audio"],
-                    speech_config=types.SpeechConfig(
-                        voice_config=types.VoiceConfig(
-                            prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name="Leda")
-                        )
-                    )
-                )
-                
-                tts_result = genai_client.models.generate_content(
-                    model="gemini-2.5-flash-preview-tts",
-                    contents=text_response,
-                    config=tts_config
-                )
-                
-                if tts_result.candidates and tts_result.candidates[0].content.parts and tts_result.candidates[0].content.parts[0].inline_data:
-                    pcm_data = tts_result.candidates[0].content.parts[0].inline_data.data
-                    wav_buffer = io.BytesIO()
-                    with wave.open(wav_buffer, 'wb') as wf:
-                        wf.setnchannels(1)
-                        wf.setsampwidth(2)
-                        wf.setframerate(24000)
-                        wf.writeframes(pcm_data)
-                    audio_base64 = base64.b64encode(wav_buffer.getvalue()).decode('utf-8')
-                else:
-                    logger.warning("TTS generation succeeded but returned no audio data.")
+                audio_data = await run_in_threadpool(gemini_tts.synthesize_audio, text_response, output_format, GEMINI_TTS_VOICE)
+                audio_base64 = base64.b64encode(audio_data).decode('utf-8')
         except Exception as tts_error:
             logger.error(f"TTS generation failed, but proceeding without audio. Error: {tts_error}")
         
-        return ImageResponse(text=text_response, audio_base64=audio_base64)
+        return ImageResponse(text=text_response, audio_base64=audio_base64, audio_mime_type=output_format.mime_type)
         
     except Exception as e:
         import traceback
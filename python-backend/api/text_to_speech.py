@@ -1,20 +1,25 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Header
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from google.genai import types
+from typing import Optional
 import base64
-import io
-import wave
 import logging
-from utils.model_utils import client as genai_client
+from config import GEMINI_TTS_VOICE
+from services.gemini_tts import gemini_tts, GEMINI_TTS_SAMPLE_RATE
+from utils.audio_encoding import AudioEncoder, negotiate_audio_format
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
 class TTSRequest(BaseModel):
     text: str
+    # Preferred audio formats, e.g. "ogg,mp3"; see utils.audio_encoding
+    audio_format: Optional[str] = None
 
 class TTSResponse(BaseModel):
     audio_base64: str
+    audio_mime_type: str = "audio/wav"
 
 @router.post("/api/text-to-speech", response_model=TTSResponse)
 async def text_to_speech(request: TTSRequest):
@@ -23,40 +28,68 @@ async def text_to_speech(request: TTSRequest):
     """
     try:
         audio_base64 = ""
+        audio_format = negotiate_audio_format(request.audio_format)
         if request.text:
-            tts_config = types.GenerateContentConfig(
-                response_modalities=["audio"],
-                speech_config=types.SpeechConfig(
-                    voice_config=types.VoiceConfig(
-                        prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name="Leda")
-                    )
-                )
-            )
-            
-            tts_result = genai_client.models.generate_content(
-                model="gemini-2.5-flash-preview-tts",
-                contents=request.text,
-                config=tts_config
-            )
-            
-            if tts_result.candidates and tts_result.candidates[0].content.parts and tts_result.candidates[0].content.parts[0].inline_data:
-                pcm_data = tts_result.candidates[0].content.parts[0].inline_data.data
-                wav_buffer = io.BytesIO()
-                with wave.open(wav_buffer, 'wb') as wf:
-                    wf.setnchannels(1)
-                    wf.setsampwidth(2)
-                    wf.setframerate(24000)
-                    wf.writeframes(pcm_data)
-                audio_base64 = base64.b64encode(wav_buffer.getvalue()).decode('utf-8')
-            else:
-                logger.warning("TTS generation succeeded but returned no audio data.")
-        
+            # Long texts are synthesized in parallel chunks; the blocking calls run off the event loop
+            audio_data = await run_in_threadpool(gemini_tts.synthesize_audio, request.text, audio_format, GEMINI_TTS_VOICE)
+            audio_base64 = base64.b64encode(audio_data).decode('utf-8')
+
         if not audio_base64:
             raise HTTPException(status_code=500, detail="Failed to generate audio.")
 
-        return TTSResponse(audio_base64=audio_base64)
-        
+        return TTSResponse(audio_base64=audio_base64, audio_mime_type=audio_format.mime_type)
+
     except Exception as e:
         import traceback
         logger.error(f"Error in text_to_speech: {traceback.format_exc()}")
-        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+@router.post("/api/text-to-speech/stream")
+async def text_to_speech_stream(request: TTSRequest, accept: Optional[str] = Header(None)):
+    """
+    Generate TTS audio from text as one streamed response.
+
+    Audio of each chunk of sentences is sent as soon as it and every chunk before it are
+    synthesized, so playback can start long before a long text is done. Errors before the
+    first chunk are reported as a 500; a later failure ends the stream early.
+
+    The format is `audio_format` if given, else the first audio type in the Accept header the
+    server can encode, else AUDIO_OUTPUT_FORMAT. WAV streams with an open-ended header; "pcm"
+    is bare 16-bit little-endian mono samples.
+    """
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="text must not be empty")
+
+    chunks = gemini_tts.stream_pcm(request.text, GEMINI_TTS_VOICE)
+    try:
+        first_chunk = await chunks.__anext__()
+    except StopAsyncIteration:
+        first_chunk = b""
+    except Exception as e:
+        import traceback
+        logger.error(f"Error in text_to_speech_stream: {traceback.format_exc()}")
+        await chunks.aclose()
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
+    audio_format = negotiate_audio_format(request.audio_format, accept)
+    encoder = AudioEncoder(audio_format, GEMINI_TTS_SAMPLE_RATE)
+
+    async def audio():
+        try:
+            # Compressed formats take real CPU time per chunk, so encoding runs off the event loop
+            yield await run_in_threadpool(encoder.feed, first_chunk)
+            async for pcm_data in chunks:
+                encoded = await run_in_threadpool(encoder.feed, pcm_data)
+                if encoded:
+                    yield encoded
+            yield await run_in_threadpool(encoder.close)
+        except Exception as e:
+            logger.error(f"TTS stream ended early: {e}")
+        finally:
+            await chunks.aclose()
+
+    return StreamingResponse(
+        audio(),
+        media_type=audio_format.mime_type,
+        headers={"X-Audio-Sample-Rate": str(encoder.output_rate), "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,116 @@
+"""
+Benchmark for the audio ingest step of /api/full-conversation, per clip length.
+
+Compares the previous path (temp file, ffmpeg conversion to 32-bit float WAV, Files API
+upload + delete) with the in-memory path (`utils.audio_utils.speech_wav` to 16-bit PCM,
+sent inline below AUDIO_INLINE_MAX_BYTES). Conversion runs for real; the Files API and the
+request upload are modeled with a round-trip time and an upstream bandwidth, so no network
+or API key is needed. The previous conversion needs ffmpeg and is skipped without it.
+
+Usage (from python-backend/):
+    python -m benchmarks.audio_ingest --lengths 2 5 15 60 --bandwidth-mbps 20 --rtt 0.15
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import numpy as np
+import soundfile as sf
+
+from config import AUDIO_INLINE_MAX_BYTES
+from utils.audio_utils import speech_wav
+
+
+def make_clip(seconds: float, sample_rate: int = 48000, fmt: str = "OGG") -> bytes:
+    """A stereo speech-like test clip (harmonics with a syllable-rate envelope), encoded as `fmt`."""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    voice = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((180, 360, 720, 1440, 2880)))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)
+    noise = np.random.default_rng(0).normal(0, 0.01, len(t))
+    mono = (0.2 * voice * envelope + noise).astype(np.float32)
+    stereo = np.stack([mono, mono], axis=1)
+    buffer = io.BytesIO()
+    # libsndfile's Vorbis encoder overflows its stack on very large single writes
+    with sf.SoundFile(buffer, "w", sample_rate, 2, format=fmt) as f:
+        for start in range(0, len(stereo), sample_rate):
+            f.write(stereo[start:start + sample_rate])
+    return buffer.getvalue()
+
+
+def convert_to_wav(input_path: str, output_path: str) -> None:
+    """The previous conversion: ffmpeg (through pydub) to 16 kHz mono 32-bit float WAV."""
+    subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-i", input_path, "-ac", "1", "-ar", "16000", "-c:a", "pcm_f32le", output_path],
+        check=True,
+    )
+
+
+def transfer_s(size: int, args) -> float:
+    return size * 8 / (args.bandwidth_mbps * 1_000_000)
+
+
+def previous_path(clip: bytes, args) -> dict:
+    started = time.perf_counter()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".ogg") as tmp_file:
+        tmp_file.write(clip)
+        input_path = tmp_file.name
+    output_path = input_path + ".wav"
+    try:
+        convert_to_wav(input_path, output_path)
+        size = os.path.getsize(output_path)
+    finally:
+        for path in (input_path, output_path):
+            if os.path.exists(path):
+                os.unlink(path)
+    convert_s = time.perf_counter() - started
+    # Upload (one round-trip + transfer), then the request referencing the file, then the delete
+    network_s = args.rtt + transfer_s(size, args) + args.rtt + args.rtt
+    return {"convert_ms": round(convert_s * 1000, 1), "payload_bytes": size, "total_ms": round((convert_s + network_s) * 1000, 1)}
+
+
+def in_memory_path(clip: bytes, args) -> dict:
+    started = time.perf_counter()
+    wav = speech_wav(clip)
+    convert_s = time.perf_counter() - started
+    inline = len(wav) <= args.inline_max_bytes
+    if inline:
+        # Base64 inflates the inline payload by a third; one request round-trip
+        network_s = args.rtt + transfer_s(len(wav) * 4 // 3, args)
+    else:
+        network_s = args.rtt + transfer_s(len(wav), args) + args.rtt + args.rtt
+    return {
+        "convert_ms": round(convert_s * 1000, 1),
+        "payload_bytes": len(wav),
+        "inline": inline,
+        "total_ms": round((convert_s + network_s) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lengths", type=float, nargs="+", default=[2, 5, 15, 60, 300], help="Clip lengths in seconds")
+    parser.add_argument("--bandwidth-mbps", type=float, default=20.0, help="Modeled upstream bandwidth")
+    parser.add_argument("--rtt", type=float, default=0.15, help="Modeled seconds per API round-trip")
+    parser.add_argument("--inline-max-bytes", type=int, default=AUDIO_INLINE_MAX_BYTES)
+    args = parser.parse_args()
+
+    has_ffmpeg = shutil.which("ffmpeg") is not None
+    results = []
+    for seconds in args.lengths:
+        clip = make_clip(seconds)
+        results.append({
+            "clip_s": seconds,
+            "upload_bytes": len(clip),
+            "previous": previous_path(clip, args) if has_ffmpeg else "skipped (ffmpeg not found)",
+            "in_memory": in_memory_path(clip, args),
+        })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
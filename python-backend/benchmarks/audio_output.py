@@ -0,0 +1,81 @@
+"""
+Benchmark for the audio output formats of `utils.audio_encoding`.
+
+Encodes a speech-like test signal at the TTS engines' sample rates (24 kHz for Gemini and
+VOICEVOX, 22.05 kHz for Piper and Coqui) in every format this installation can produce, and
+reports per format the bytes per second of audio (and as base64 in JSON), the encode CPU time
+per second of audio, and, for streaming encoders fed sentence-sized frames, how many bytes
+are held back until the end of the stream.
+
+Usage (from python-backend/):
+    python -m benchmarks.audio_output --seconds 30 --rates 24000 22050
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from utils.audio_encoding import AUDIO_FORMATS, AudioEncoder, available_formats, encode_pcm
+
+
+def speech_pcm(seconds: float, sample_rate: int) -> bytes:
+    """16-bit mono speech-like test signal: harmonics with a syllable-rate envelope, plus pauses and noise."""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 180 + 30 * np.sin(2 * np.pi * 0.5 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 8))
+    envelope = np.clip(np.sin(2 * np.pi * 4 * t), 0, None) * (np.sin(2 * np.pi * 0.3 * t) > -0.6)
+    noise = np.random.default_rng(0).normal(0, 0.005, len(t))
+    samples = 0.25 * voice * envelope + noise
+    return (np.clip(samples, -1, 1) * 32767).astype("<i2").tobytes()
+
+
+def measure(name: str, pcm: bytes, sample_rate: int, seconds: float, frame_seconds: float, repeats: int) -> dict:
+    fmt = AUDIO_FORMATS[name]
+    cpu = []
+    for _ in range(repeats):
+        started = time.process_time()
+        encoded = encode_pcm(pcm, sample_rate, fmt)
+        cpu.append(time.process_time() - started)
+
+    # Feed the encoder frame by frame, as a streamed response would
+    frame_bytes = int(frame_seconds * sample_rate) * 2
+    encoder = AudioEncoder(fmt, sample_rate)
+    for start in range(0, len(pcm), frame_bytes):
+        encoder.feed(pcm[start:start + frame_bytes])
+    tail = len(encoder.close())
+
+    return {
+        "bytes_per_s": round(len(encoded) / seconds),
+        "base64_bytes_per_s": round(len(encoded) * 4 / 3 / seconds),
+        "kbps": round(len(encoded) * 8 / seconds / 1000, 1),
+        "vs_wav": round(len(encoded) / (len(pcm) + 44), 3),
+        "encode_cpu_ms_per_s": round(min(cpu) / seconds * 1000, 2),
+        "streaming": fmt.streaming,
+        "bytes_held_until_close": tail,
+        "output_rate": encoder.output_rate,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=30.0, help="Length of the test signal")
+    parser.add_argument("--rates", type=int, nargs="+", default=[24000, 22050])
+    parser.add_argument("--formats", nargs="+", default=None, help="Defaults to every available format")
+    parser.add_argument("--frame-seconds", type=float, default=0.5, help="Audio per streamed frame")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    formats = args.formats or available_formats()
+    results = {}
+    for rate in args.rates:
+        pcm = speech_pcm(args.seconds, rate)
+        results[str(rate)] = {
+            name: measure(name, pcm, rate, args.seconds, args.frame_seconds, args.repeats) for name in formats
+        }
+    print(json.dumps({"seconds": args.seconds, "formats": formats, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark for the context window manager: model latency vs. conversation length.
+
+Replays a long synthetic chat (with a bulky tool result every few turns) against a stub
+model whose latency grows with the prompt size, and compares:
+  - unbounded: the whole history is sent every turn (the previous behaviour)
+  - managed:   the history goes through `ContextManager.fit` first (no summaries, so no
+               extra model calls)
+
+Reports, at several turn counts, the estimated prompt tokens, the stub model latency and
+the time spent in `fit`.
+
+Usage (from python-backend/):
+    python -m benchmarks.context_window --turns 200 --budget 4000
+"""
+import argparse
+import json
+import time
+
+from google.genai import types
+
+from services.context_manager import ContextManager, estimate_history_tokens
+from utils.history_utils import text_content
+
+
+class StubModel:
+    """Pretends to be a model whose latency is a fixed cost plus a cost per prompt token."""
+
+    def __init__(self, base_latency: float, per_token_latency: float):
+        self.base_latency = base_latency
+        self.per_token_latency = per_token_latency
+
+    def generate(self, history: list) -> float:
+        started = time.perf_counter()
+        time.sleep(self.base_latency + self.per_token_latency * estimate_history_tokens(history))
+        return time.perf_counter() - started
+
+
+def turn_contents(turn: int, tool_every: int) -> list:
+    contents = [text_content("user", f"Turn {turn}: " + "tell me a bit more about that, please. " * 3)]
+    if tool_every and turn % tool_every == 0:
+        contents.append(types.Content(role="model", parts=[types.Part.from_function_call(name="get_news", args={"topic": f"topic {turn}"})]))
+        contents.append(types.Content(role="tool", parts=[types.Part.from_function_response(
+            name="get_news", response={"result": json.dumps([{"title": "Headline " * 8, "description": "Details " * 60}] * 5)}
+        )]))
+    contents.append(text_content("model", "Here is a detailed answer that goes on for a while. " * 12))
+    return contents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--budget", type=int, default=4000)
+    parser.add_argument("--keep-recent-turns", type=int, default=4)
+    parser.add_argument("--tool-every", type=int, default=5)
+    parser.add_argument("--base-latency", type=float, default=0.02)
+    parser.add_argument("--per-token-latency", type=float, default=0.000004, help="Seconds per prompt token")
+    args = parser.parse_args()
+
+    model = StubModel(args.base_latency, args.per_token_latency)
+    manager = ContextManager(budget_tokens=args.budget, keep_recent_turns=args.keep_recent_turns)
+    checkpoints = sorted({1, 10, 25, 50, 100, 200, args.turns} & set(range(1, args.turns + 1)))
+
+    unbounded, managed = [], []
+    results = []
+    for turn in range(1, args.turns + 1):
+        contents = turn_contents(turn, args.tool_every)
+        # The prompt of a turn is the history plus the new user message
+        unbounded_latency = model.generate(unbounded + contents[:1])
+
+        started = time.perf_counter()
+        managed = manager.fit(managed + contents[:1])
+        fit_ms = (time.perf_counter() - started) * 1000
+        managed_latency = model.generate(managed)
+        managed += contents[1:]
+        unbounded += contents
+
+        if turn in checkpoints:
+            results.append({
+                "turn": turn,
+                "unbounded_tokens": estimate_history_tokens(unbounded),
+                "managed_tokens": estimate_history_tokens(managed),
+                "unbounded_latency_ms": round(unbounded_latency * 1000, 1),
+                "managed_latency_ms": round(managed_latency * 1000, 1),
+                "fit_ms": round(fit_ms, 2),
+            })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+In-process stand-in for the parts of the `google.genai` client the backend calls:
+`client.models.generate_content` and `client.models.generate_content_stream`. For the SDK's
+own HTTP handling, use the socket-level `benchmarks.fake_gemini_server` instead.
+
+Answers are deterministic: a fixed Indonesian answer of `answer_tokens` words, streamed in
+chunks of `tokens_per_chunk` words after `first_chunk_delay`, at `tokens_per_second`. If
+`tool_calls` are configured, the first call of every turn (a call whose contents do not end
+with tool results) answers with those function calls instead, like a model asking for tools.
+Responses are real `types.GenerateContentResponse` objects, so the code under test parses
+them exactly as it parses the API's.
+
+Usage (in a benchmark):
+    fake = FakeGemini(first_chunk_delay=0.3, tokens_per_second=80, tool_calls=[("get_weather", {"location": "Jakarta"})])
+    with fake.installed():
+        text, history = process_content_with_tools(contents)
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from google.genai import types
+
+ANSWER_WORDS = (
+    "Cuaca di Jakarta hari ini cerah berawan, dengan suhu sekitar 31 derajat. "
+    "Kalau kamu mau keluar, jangan lupa bawa air minum dan tabir surya. "
+    "Nanti sore ada kemungkinan hujan ringan, jadi payung juga berguna. "
+    "Ada lagi yang ingin kamu ketahui?"
+).split()
+
+
+def answer_text(tokens: int) -> str:
+    """The deterministic answer of `tokens` words, ending with a full stop."""
+    words = [ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(tokens)]
+    text = " ".join(words)
+    return text if text.endswith((".", "?")) else text + "."
+
+
+def response(parts: List[types.Part]) -> types.GenerateContentResponse:
+    return types.GenerateContentResponse(candidates=[types.Candidate(content=types.Content(role="model", parts=parts))])
+
+
+class FakeGemini:
+    """
+    Args:
+        first_chunk_delay (float): Seconds until the first chunk; non-streamed calls wait for the whole answer.
+        tokens_per_second (float): Generation speed after the first chunk.
+        tokens_per_chunk (int): Words per streamed chunk.
+        answer_tokens (int): Words of every text answer.
+        tool_calls (list): (name, args) pairs requested by the first call of a turn.
+    """
+
+    def __init__(
+        self,
+        first_chunk_delay: float = 0.3,
+        tokens_per_second: float = 100.0,
+        tokens_per_chunk: int = 8,
+        answer_tokens: int = 60,
+        tool_calls: Optional[Sequence[Tuple[str, dict]]] = None,
+    ):
+        self.first_chunk_delay = first_chunk_delay
+        self.tokens_per_second = tokens_per_second
+        self.tokens_per_chunk = max(1, tokens_per_chunk)
+        self.answer_tokens = answer_tokens
+        self.tool_calls = list(tool_calls or [])
+        self.models = _Models(self)
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {"generate_content": 0, "generate_content_stream": 0, "prompt_contents": 0}
+
+    def chunks(self, contents) -> List[Tuple[float, List[types.Part]]]:
+        """The chunks answering `contents`, each with the seconds to wait before it."""
+        contents = contents if isinstance(contents, list) else [contents]
+        if self.tool_calls and not any(getattr(c, "role", None) == "tool" for c in contents[-2:]):
+            calls = [types.Part.from_function_call(name=name, args=args) for name, args in self.tool_calls]
+            return [(self.first_chunk_delay, calls)]
+        words = answer_text(self.answer_tokens).split(" ")
+        chunks = []
+        for start in range(0, len(words), self.tokens_per_chunk):
+            text = " ".join(words[start:start + self.tokens_per_chunk])
+            delay = self.first_chunk_delay if not chunks else self.tokens_per_chunk / self.tokens_per_second
+            chunks.append((delay, [types.Part(text=text if start + self.tokens_per_chunk >= len(words) else text + " ")]))
+        return chunks
+
+    def modeled_seconds(self, contents) -> float:
+        """Time the fake takes to answer `contents`, i.e. what a benchmark should not count as overhead."""
+        return sum(delay for delay, _ in self.chunks(contents))
+
+    @contextmanager
+    def installed(self) -> Iterator["FakeGemini"]:
+        """Replaces the shared clients of `utils.model_utils` with this fake for the duration."""
+        from utils import model_utils
+        original = model_utils.client, model_utils.stream_client
+        model_utils.client = model_utils.stream_client = self
+        try:
+            yield self
+        finally:
+            model_utils.client, model_utils.stream_client = original
+
+    def _count(self, name: str, contents) -> None:
+        with self._lock:
+            self.counts[name] += 1
+            self.counts["prompt_contents"] += len(contents) if isinstance(contents, list) else 1
+
+
+class _Models:
+    def __init__(self, fake: FakeGemini):
+        self._fake = fake
+
+    def generate_content(self, model: str, contents, config=None) -> types.GenerateContentResponse:
+        self._fake._count("generate_content", contents)
+        chunks = self._fake.chunks(contents)
+        time.sleep(sum(delay for delay, _ in chunks))
+        parts = [part for _, chunk in chunks for part in chunk]
+        if parts and parts[0].text is not None:
+            parts = [types.Part(text="".join(part.text for part in parts))]
+        return response(parts)
+
+    def generate_content_stream(self, model: str, contents, config=None) -> Iterator[types.GenerateContentResponse]:
+        self._fake._count("generate_content_stream", contents)
+        for delay, parts in self._fake.chunks(contents):
+            time.sleep(delay)
+            yield response(parts)
+
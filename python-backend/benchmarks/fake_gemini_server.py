@@ -0,0 +1,110 @@
+"""
+Local stand-in for the Gemini API's streaming endpoint (`models/<model>:streamGenerateContent`).
+
+Unlike `benchmarks.fake_gemini`, this fake sits behind a real socket, so the SDK's own HTTP
+and response parsing code runs: point a client at it with
+`genai.Client(api_key="x", http_options={"base_url": server.url})`. Every stream sends
+`chunks` Server-Sent Events after `first_chunk_delay`, `chunk_interval` apart. A stream can
+stall (send nothing for `stall` seconds) after `stall_after` chunks, to exercise timeouts.
+
+Usage (from python-backend/):
+    python -m benchmarks.fake_gemini_server --port 8765 --first-chunk-delay 0.3
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import urlparse
+
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    """
+    Args:
+        chunks (int): Text chunks per stream.
+        first_chunk_delay (float): Seconds before the first chunk.
+        chunk_interval (float): Seconds between chunks.
+        stall_after (int): Chunks sent before the stream stalls; None never stalls.
+        stall (float): Seconds a stalled stream stays silent before it continues.
+    """
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address, chunks=10, first_chunk_delay=0.3, chunk_interval=0.02, stall_after: Optional[int] = None, stall=60.0):
+        super().__init__(address, FakeGeminiHandler)
+        self.chunks = chunks
+        self.first_chunk_delay = first_chunk_delay
+        self.chunk_interval = chunk_interval
+        self.stall_after = stall_after
+        self.stall = stall
+        self.streams = 0
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/"
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    server: FakeGeminiServer
+    # Responses end by closing the connection, like a chunked stream without a length
+    protocol_version = "HTTP/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        server = self.server
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not urlparse(self.path).path.endswith(":streamGenerateContent"):
+            self.send_response(404)
+            self.end_headers()
+            return
+        with server._lock:
+            server.streams += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        try:
+            time.sleep(server.first_chunk_delay)
+            for i in range(server.chunks):
+                if i:
+                    time.sleep(server.chunk_interval)
+                if server.stall_after is not None and i == server.stall_after:
+                    time.sleep(server.stall)
+                chunk = {"candidates": [{"content": {"role": "model", "parts": [{"text": f"token{i} "}]}}]}
+                self.wfile.write(b"data: " + json.dumps(chunk).encode() + b"\r\n\r\n")
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client gave up on the stream
+
+
+def start_fake_gemini_server(port: int = 0, **kwargs) -> FakeGeminiServer:
+    """Starts the fake API on a background thread and returns the server (see `.url`)."""
+    server = FakeGeminiServer(("127.0.0.1", port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--chunks", type=int, default=10)
+    parser.add_argument("--first-chunk-delay", type=float, default=0.3)
+    parser.add_argument("--chunk-interval", type=float, default=0.02)
+    args = parser.parse_args()
+    server = FakeGeminiServer(
+        ("127.0.0.1", args.port),
+        chunks=args.chunks,
+        first_chunk_delay=args.first_chunk_delay,
+        chunk_interval=args.chunk_interval,
+    )
+    print(f"Fake Gemini API listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Local stand-in for the Supabase PostgREST API (`/rest/v1/<table>`).
+
+Accepts inserts of one row or a JSON array of rows with configurable, deterministic
+latencies (a fixed cost per request, like a network round-trip plus a transaction, and a
+small cost per row), keeps the rows in memory, and can fail a share of requests with 503 to
+exercise retries. Point a Supabase client at `.url` to use it.
+
+Usage (from python-backend/):
+    python -m benchmarks.fake_postgrest --port 54321
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+
+class FakePostgrestServer(ThreadingHTTPServer):
+    """
+    Args:
+        request_latency (float): Fixed seconds per insert request.
+        per_row_latency (float): Additional seconds per inserted row.
+        failure_rate (float): Share of insert requests answered with 503.
+    """
+
+    daemon_threads = True
+    # Many concurrent clients connect at once
+    request_queue_size = 128
+
+    def __init__(self, address, request_latency=0.03, per_row_latency=0.0002, failure_rate=0.0):
+        super().__init__(address, FakePostgrestHandler)
+        self.request_latency = request_latency
+        self.per_row_latency = per_row_latency
+        self.failure_rate = failure_rate
+        self.tables = {}
+        self.requests = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def rows(self, table: str) -> list:
+        with self._lock:
+            return list(self.tables.get(table, []))
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class FakePostgrestHandler(BaseHTTPRequestHandler):
+    server: FakePostgrestServer
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        path = urlparse(self.path).path
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"null")
+        if not path.startswith("/rest/v1/"):
+            self._send(404, {"message": "Not Found"})
+            return
+        rows = payload if isinstance(payload, list) else [payload]
+        time.sleep(server.request_latency + server.per_row_latency * len(rows))
+        with server._lock:
+            server.requests += 1
+            if random.random() < server.failure_rate:
+                server.failures += 1
+                failed = True
+            else:
+                failed = False
+                table = server.tables.setdefault(path[len("/rest/v1/"):], [])
+                rows = [{"id": str(uuid.uuid4()), **row} for row in rows]
+                table.extend(rows)
+        if failed:
+            self._send(503, {"message": "Service Unavailable", "code": "PGRST000"})
+        else:
+            self._send(201, rows)
+
+
+def start_fake_postgrest(port: int = 0, **kwargs) -> FakePostgrestServer:
+    """Starts the fake API on a background thread and returns the server (see `.url`)."""
+    server = FakePostgrestServer(("127.0.0.1", port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--request-latency", type=float, default=0.03)
+    parser.add_argument("--per-row-latency", type=float, default=0.0002)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    server = FakePostgrestServer(
+        ("127.0.0.1", args.port),
+        request_latency=args.request_latency,
+        per_row_latency=args.per_row_latency,
+        failure_rate=args.failure_rate,
+    )
+    print(f"Fake PostgREST listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Local stand-in for the VOICEVOX engine HTTP API.
+
+Implements `/audio_query`, `/synthesis`, `/multi_synthesis` and `/version` with configurable,
+deterministic latencies and returns short sine-tone WAVs whose length grows with the text.
+Useful for exercising `services.voicevox_client` and the voice call path without the real engine.
+
+Usage (from python-backend/):
+    python -m benchmarks.fake_voicevox --port 50021
+"""
+import argparse
+import io
+import json
+import math
+import struct
+import threading
+import time
+import wave
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SAMPLE_RATE = 24000
+
+
+def tone_wav(seconds: float, sample_rate: int = SAMPLE_RATE) -> bytes:
+    """Builds a 16-bit mono WAV containing a quiet 440 Hz tone."""
+    frames = int(seconds * sample_rate)
+    samples = (int(3000 * math.sin(2 * math.pi * 440 * n / sample_rate)) for n in range(frames))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(struct.pack(f"<{frames}h", *samples))
+    return buffer.getvalue()
+
+
+class FakeVoicevoxServer(ThreadingHTTPServer):
+    """
+    Args:
+        query_latency (float): Seconds spent in every /audio_query call.
+        request_latency (float): Fixed seconds per /synthesis or /multi_synthesis request.
+        per_char_latency (float): Additional seconds per synthesized character.
+        multi_synthesis (bool): Whether /multi_synthesis is available (older engines lack it).
+        serialize (bool): Process one synthesis at a time, like the real engine's single synthesizer.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, query_latency=0.01, request_latency=0.05, per_char_latency=0.002, multi_synthesis=True, serialize=True):
+        super().__init__(address, FakeVoicevoxHandler)
+        self.query_latency = query_latency
+        self.request_latency = request_latency
+        self.per_char_latency = per_char_latency
+        self.multi_synthesis = multi_synthesis
+        self.serialize = serialize
+        self._engine_lock = threading.Lock()
+        self.counts = {"audio_query": 0, "synthesis": 0, "multi_synthesis": 0}
+        self._lock = threading.Lock()
+
+    def count(self, endpoint: str) -> None:
+        with self._lock:
+            self.counts[endpoint] += 1
+
+    def work(self, seconds: float) -> None:
+        """Simulates synthesis time, one request at a time when serialized."""
+        if self.serialize:
+            with self._engine_lock:
+                time.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class FakeVoicevoxHandler(BaseHTTPRequestHandler):
+    server: FakeVoicevoxServer
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"null")
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _synthesize(self, query: dict) -> bytes:
+        text = query.get("kana", "")
+        return tone_wav(0.06 * max(1, len(text)), query.get("outputSamplingRate", SAMPLE_RATE))
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/version":
+            self._send(200, b'"0.0.0-fake"', "application/json")
+        else:
+            self._send(404, b"{}", "application/json")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        server = self.server
+        if url.path == "/audio_query":
+            server.count("audio_query")
+            time.sleep(server.query_latency)
+            text = params.get("text", [""])[0]
+            query = {"kana": text, "speedScale": 1.0, "outputSamplingRate": SAMPLE_RATE, "outputStereo": False}
+            self._send(200, json.dumps(query).encode(), "application/json")
+        elif url.path == "/synthesis":
+            server.count("synthesis")
+            query = self._read_json()
+            server.work(server.request_latency + server.per_char_latency * len(query.get("kana", "")))
+            self._send(200, self._synthesize(query), "audio/wav")
+        elif url.path == "/multi_synthesis" and server.multi_synthesis:
+            server.count("multi_synthesis")
+            queries = self._read_json()
+            chars = sum(len(q.get("kana", "")) for q in queries)
+            server.work(server.request_latency + server.per_char_latency * chars)
+            archive = io.BytesIO()
+            with zipfile.ZipFile(archive, "w") as zf:
+                for i, query in enumerate(queries, start=1):
+                    zf.writestr(f"{i:03}.wav", self._synthesize(query))
+            self._send(200, archive.getvalue(), "application/zip")
+        else:
+            self._send(404, b'{"detail": "Not Found"}', "application/json")
+
+
+def start_fake_voicevox(port: int = 0, **kwargs) -> FakeVoicevoxServer:
+    """Starts the fake engine on a background thread and returns the server (see `.url`)."""
+    server = FakeVoicevoxServer(("127.0.0.1", port), **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=50021)
+    parser.add_argument("--request-latency", type=float, default=0.05)
+    parser.add_argument("--no-multi-synthesis", action="store_true")
+    args = parser.parse_args()
+    server = FakeVoicevoxServer(
+        ("127.0.0.1", args.port),
+        request_latency=args.request_latency,
+        multi_synthesis=not args.no_multi_synthesis,
+    )
+    print(f"Fake VOICEVOX engine listening on {server.url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Micro-benchmark for conversation history reconstruction, per chat length.
+
+Builds a synthetic chat in the frontend's JSON history format (a weather tool call and its
+result every few turns) and measures the CPU time of:
+  - from_json:       `history_from_json`, what every request carrying its history pays
+  - to_json:         `history_to_json`, the inverse used when a session is saved
+  - client_history:  `SessionStore.history_for_turn` with the history sent by the client
+                     (reconstruction plus context fitting)
+  - server_history:  `SessionStore.history_for_turn` for a chat already held in memory
+
+Usage (from python-backend/):
+    python -m benchmarks.history --messages 10 100 1000 --repeat 50
+"""
+import argparse
+import json
+import time
+
+from services.session_store import SessionStore
+from utils.history_utils import history_from_json, history_to_json
+
+
+def chat_json(messages: int, tool_every: int) -> list:
+    """A synthetic JSON history of about `messages` entries."""
+    history = []
+    turn = 0
+    while len(history) < messages:
+        history.append({"role": "user", "parts": [{"text": f"Turn {turn}: bagaimana cuaca di Jakarta hari ini?"}]})
+        if tool_every and turn % tool_every == tool_every - 1:
+            history.append({"role": "model", "parts": [{"function_call": {"name": "get_weather", "args": {"location": "Jakarta"}}}]})
+            history.append({"role": "tool", "parts": [{"function_response": {
+                "name": "get_weather", "response": {"result": json.dumps({"location": "Jakarta", "temperature_celsius": 31})},
+            }}]})
+        history.append({"role": "assistant", "parts": [{"text": "Cuaca di Jakarta cerah berawan, sekitar 31 derajat. " * 3}]})
+        turn += 1
+    return history[:messages]
+
+
+def cpu_us(function, repeat: int) -> float:
+    started = time.process_time()
+    for _ in range(repeat):
+        function()
+    return (time.process_time() - started) / repeat * 1e6
+
+
+def measure(messages: int, tool_every: int, repeat: int) -> dict:
+    client_history = chat_json(messages, tool_every)
+    contents = history_from_json(client_history)
+    store = SessionStore()
+    store.set_history("benchmark", list(contents))
+    store.history_for_turn("benchmark")
+
+    timings = {
+        "from_json": cpu_us(lambda: history_from_json(client_history), repeat),
+        "to_json": cpu_us(lambda: history_to_json(contents), repeat),
+        "client_history": cpu_us(lambda: store.history_for_turn(None, client_history), repeat),
+        "server_history": cpu_us(lambda: store.history_for_turn("benchmark"), repeat),
+    }
+    result = {name: {"cpu_us": round(us, 1), "cpu_us_per_message": round(us / messages, 2)} for name, us in timings.items()}
+    result["fitted_messages"] = len(store.history_for_turn(None, client_history))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--tool-every", type=int, default=4, help="Turns between tool calls; 0 for none")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    results = {str(messages): measure(messages, args.tool_every, args.repeat) for messages in args.messages}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Benchmark for persisting chat messages: one synchronous insert per message vs. the
+write-behind `MessageWriter`.
+
+Runs against the local PostgREST stand-in (`benchmarks.fake_postgrest`) through a real
+Supabase client. Concurrent sessions each save `--turns` user/model message pairs; reported
+per mode are the time spent on the request path per message, the time until every message
+is in the table, throughput, the number of insert requests, and whether every session's
+messages are stored in order.
+
+Usage (from python-backend/):
+    python -m benchmarks.message_writer --sessions 20 --turns 10 --failure-rate 0.05
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import uuid
+
+from supabase import create_client
+
+from benchmarks.fake_postgrest import start_fake_postgrest
+from services.message_writer import MessageWriter
+
+
+def run_sessions(sessions: int, turns: int, save) -> list:
+    """Runs the sessions concurrently; returns the request-path seconds of every save."""
+    latencies = []
+    lock = threading.Lock()
+
+    def session(session_id: str):
+        own = []
+        for turn in range(turns):
+            for role in ("user", "model"):
+                started = time.perf_counter()
+                save(session_id, role, f"{turn}:{role}")
+                own.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=session, args=(str(uuid.uuid4()),)) for _ in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies
+
+
+def in_order(rows: list) -> bool:
+    """Every session's rows, sorted by created_at (insertion order when absent), follow turn order."""
+    by_session = {}
+    for index, row in enumerate(rows):
+        turn, role = row["content"].split(":")
+        by_session.setdefault(row["session_id"], []).append((row.get("created_at") or "", index, (int(turn), role == "model")))
+    for entries in by_session.values():
+        positions = [position for _, _, position in sorted(entries)]
+        if positions != sorted(positions):
+            return False
+    return True
+
+
+def measure(args, write_behind: bool) -> dict:
+    server = start_fake_postgrest(
+        request_latency=args.request_latency, per_row_latency=args.per_row_latency, failure_rate=args.failure_rate
+    )
+    db = create_client(server.url, "benchmark-key")
+
+    if write_behind:
+        writer = MessageWriter(
+            db_factory=lambda: db, batch_size=args.batch_size, flush_interval=args.flush_interval, retry_backoff=0.05
+        )
+        save = writer.submit
+    else:
+        def save(session_id, role, content):
+            try:
+                db.table('chat_messages').insert({"session_id": session_id, "role": role, "content": content}).execute()
+            except Exception:
+                pass  # The previous code path logged and lost the message
+
+    started = time.perf_counter()
+    latencies = run_sessions(args.sessions, args.turns, save)
+    if write_behind:
+        writer.flush()
+    total_s = time.perf_counter() - started
+    server.shutdown()
+
+    rows = server.rows("chat_messages")
+    latencies.sort()
+    return {
+        "request_path_ms_mean": round(statistics.mean(latencies) * 1000, 3),
+        "request_path_ms_p95": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 3),
+        "persisted_after_s": round(total_s, 3),
+        "messages_per_s": round(len(rows) / total_s, 1),
+        "insert_requests": server.requests,
+        "failed_requests": server.failures,
+        "rows_stored": len(rows),
+        "rows_expected": args.sessions * args.turns * 2,
+        "ordered": in_order(rows),
+        **({"writer": writer.stats()} if write_behind else {}),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--request-latency", type=float, default=0.03, help="Seconds per insert request")
+    parser.add_argument("--per-row-latency", type=float, default=0.0002)
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of insert requests failing with 503")
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--flush-interval", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = {
+        "synchronous": measure(args, write_behind=False),
+        "write_behind": measure(args, write_behind=True),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark for the TTS text segmentation used by `/ws/conversation`.
+
+Compares the previous approach (re-splitting the whole buffer with a regex on every model
+chunk and cutting at every comma) with the incremental `SentenceSegmenter`. Reports the
+number of synthesis calls each approach would trigger per turn and the CPU time spent
+segmenting.
+
+Usage (from python-backend/):
+    python -m benchmarks.segmentation --repeat 200
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+from utils.text_segmenter import SentenceSegmenter
+
+SAMPLE_RESPONSES = {
+    "id": (
+        "Halo! Tentu, saya bisa membantu. Cuaca di Jakarta hari ini cerah berawan, dengan suhu sekitar 31 derajat, "
+        "kelembapan 70 persen, dan angin bertiup pelan dari arah barat. Kalau kamu mau keluar, jangan lupa bawa air minum, "
+        "topi, dan tabir surya, ya. Oh iya, nanti sore ada kemungkinan hujan ringan, jadi payung juga berguna. "
+        "Ada lagi yang ingin kamu ketahui, misalnya berita terbaru, jadwal, atau rekomendasi tempat makan?"
+    ),
+    "en": (
+        "Sure, I can help with that. Today in London it's mostly cloudy, around 14 degrees, with light winds, "
+        "low humidity, and a small chance of rain later in the evening. If you're heading out, a light jacket, "
+        "comfortable shoes, and an umbrella should cover you. By the way, Dr. Smith's talk starts at 6.30 p.m., "
+        "so you still have plenty of time. Anything else, like news, reminders, or restaurant ideas?"
+    ),
+    "ja": (
+        "こんにちは！今日の東京は、晴れ時々曇りで、気温は二十三度くらいです。湿度は低めで、風も穏やかなので、"
+        "散歩には、ちょうどいい天気ですね。夕方から、少し雨が降るかもしれないので、折りたたみ傘を持っていくと、"
+        "安心ですよ。ほかに、ニュースや、予定の確認など、何かお手伝いできることはありますか？"
+    ),
+}
+
+
+def stream_chunks(text: str, rng: random.Random):
+    """Splits a response into chunks of irregular size, like a streamed model reply."""
+    i = 0
+    while i < len(text):
+        size = rng.randint(8, 40)
+        yield text[i:i + size]
+        i += size
+
+
+def legacy_segments(chunks) -> list:
+    """The segmentation loop previously inlined in conversation_ws."""
+    sentence_end_pattern = re.compile(r'(?<=[.?!,。？！、])\s*')
+    text_buffer = ""
+    segments = []
+    for chunk in chunks:
+        text_buffer += chunk
+        sentences = sentence_end_pattern.split(text_buffer)
+        text_buffer = sentences[-1]
+        segments.extend(s for s in sentences[:-1] if s)
+    if text_buffer.strip():
+        segments.append(text_buffer.strip())
+    return segments
+
+
+def incremental_segments(chunks, lang: str) -> list:
+    segmenter = SentenceSegmenter(lang)
+    segments = []
+    for chunk in chunks:
+        segments.extend(segmenter.feed(chunk))
+    segments.extend(segmenter.flush())
+    return segments
+
+
+def measure(lang: str, text: str, repeat: int) -> dict:
+    rng = random.Random(42)
+    turns = [list(stream_chunks(text, rng)) for _ in range(repeat)]
+    result = {}
+    for name, run in (("legacy_regex", legacy_segments), ("incremental", lambda c: incremental_segments(c, lang))):
+        started = time.process_time()
+        segments = [run(chunks) for chunks in turns]
+        cpu = time.process_time() - started
+        counts = [len(s) for s in segments]
+        lengths = [len(seg) for turn in segments for seg in turn]
+        result[name] = {
+            "synthesis_calls_per_turn": round(sum(counts) / len(counts), 1),
+            "mean_segment_chars": round(sum(lengths) / len(lengths), 1),
+            "min_segment_chars": min(lengths),
+            "cpu_us_per_turn": round(cpu / repeat * 1e6, 1),
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    results = {lang: measure(lang, text, args.repeat) for lang, text in SAMPLE_RESPONSES.items()}
+    print(json.dumps(results, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark for backend startup time and memory with the different TTS engine warm-up modes.
+
+Each mode runs in a fresh interpreter that imports `main` and runs the app's startup hooks:
+  - eager:      every enabled engine is loaded before the app is ready (the behaviour when the
+                models were loaded while importing api/conversation_ws.py)
+  - background: the app is ready right after import; engines load on the warm-up thread
+  - lazy:       nothing is loaded until the first sentence needs an engine
+
+Reports the time until the app can serve requests, the time until all enabled engines are
+ready (eager/background), peak RSS and the per-engine status. Requires the same environment
+variables as the backend (.env is loaded by config.py).
+
+Usage (from python-backend/):
+    python -m benchmarks.startup --engines piper,coqui,voicevox
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+PROBE = r"""
+import asyncio, json, resource, sys, time
+mode = sys.argv[1]
+started = time.perf_counter()
+import main
+from services.tts_engines import tts_engines
+if mode == "eager":
+    tts_engines.load_all()
+asyncio.run(main.startup_event())
+ready_s = time.perf_counter() - started
+engines_ready_s = None
+if mode != "lazy":
+    tts_engines.wait_for_warmup()
+    engines_ready_s = round(time.perf_counter() - started, 3)
+print(json.dumps({
+    "ready_s": round(ready_s, 3),
+    "engines_ready_s": engines_ready_s,
+    "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    "engines": {name: status["state"] for name, status in tts_engines.status().items()},
+}))
+"""
+
+
+def run_mode(mode: str, engines: str) -> dict:
+    env = dict(os.environ, TTS_ENABLED_ENGINES=engines, TTS_ENGINE_WARMUP="lazy" if mode == "eager" else mode)
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE, mode],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", default="piper,coqui,voicevox", help="Value for TTS_ENABLED_ENGINES")
+    parser.add_argument("--modes", default="eager,background,lazy")
+    args = parser.parse_args()
+    results = {mode: run_mode(mode, args.engines) for mode in args.modes.split(",")}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
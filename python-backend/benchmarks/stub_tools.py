@@ -0,0 +1,58 @@
+"""
+Local stand-ins for the model's tools (`tools.available_tools`) with injected, deterministic
+latencies, so tool-calling benchmarks need no network or API keys.
+
+Usage (in a benchmark):
+    tools = make_stub_tools(weather_latency=0.4, news_latency=0.8)
+    with installed_tools(tools):
+        text, history = process_content_with_tools(contents)
+"""
+import json
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+
+def make_stub_tools(weather_latency: float = 0.4, news_latency: float = 0.8, hang_latency: float = 3.0) -> Dict[str, Callable]:
+    def get_weather(location: str) -> str:
+        time.sleep(weather_latency)
+        return json.dumps({"location": location, "temperature_celsius": 30})
+
+    def get_news(topic: str) -> str:
+        time.sleep(news_latency)
+        return json.dumps([{"title": f"News about {topic}"}])
+
+    def get_current_date_and_time() -> str:
+        return "2025-01-01 12:00:00"
+
+    def hanging_tool() -> str:
+        time.sleep(hang_latency)
+        return "too late"
+
+    return {
+        "get_weather": get_weather,
+        "get_news": get_news,
+        "get_current_date_and_time": get_current_date_and_time,
+        "hanging_tool": hanging_tool,
+    }
+
+
+@contextmanager
+def installed_tools(tools: Dict[str, Callable], timeout: Optional[float] = None) -> Iterator[None]:
+    """
+    Puts `tools` in the tool table `execute_tool_calls` uses by default, for the duration.
+    The table is updated in place, as the function holds a reference to it.
+    """
+    from tools.available_tools import available_tools, tool_timeouts
+    saved_tools, saved_timeouts = dict(available_tools), dict(tool_timeouts)
+    available_tools.clear()
+    available_tools.update(tools)
+    if timeout is not None:
+        tool_timeouts.update({name: timeout for name in tools})
+    try:
+        yield
+    finally:
+        available_tools.clear()
+        available_tools.update(saved_tools)
+        tool_timeouts.clear()
+        tool_timeouts.update(saved_timeouts)
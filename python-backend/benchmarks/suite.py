@@ -0,0 +1,173 @@
+"""
+Runs the offline benchmarks as one suite and writes a single JSON document, so results can
+be kept per commit and compared.
+
+Every benchmark runs in its own interpreter (`python -m benchmarks.<name>`) with short
+settings and only local stand-ins: the fake Gemini client, the fake PostgREST and VOICEVOX
+servers and the stub tools. Nothing needs network access or API keys beyond dummy values
+for the variables config.py reads. `startup` loads the real TTS models and only runs when
+selected with --only.
+
+The output records the git commit (and whether the tree was dirty), the interpreter and
+machine, and per benchmark its arguments, wall time and results. With --compare, every
+numeric result is matched against a previous output by its path; time metrics (names with
+an _ms/_us/_s unit) that grew by more than --threshold are reported as regressions and make
+the exit status 1.
+
+Usage (from python-backend/):
+    python -m benchmarks.suite --output bench-$(git rev-parse --short HEAD).json
+    python -m benchmarks.suite --only history tool_loop --compare bench-abc1234.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Benchmark module -> arguments for a short run
+BENCHMARKS: Dict[str, List[str]] = {
+    "segmentation": ["--repeat", "500"],
+    "history": ["--messages", "10", "100", "1000", "--repeat", "20"],
+    "context_window": ["--turns", "100"],
+    "tool_calls": ["--weather-latency", "0.1", "--news-latency", "0.2", "--hang-latency", "1.0", "--timeout", "0.5"],
+    "tool_loop": ["--turns", "3"],
+    "ws_concurrency": ["--sessions", "20"],
+    "audio_ingest": ["--lengths", "2", "15"],
+    "audio_output": ["--seconds", "10"],
+    "voicevox_client": [],
+    "message_writer": ["--sessions", "10", "--turns", "5"],
+}
+OPT_IN = {"startup": ["--engines", "piper,coqui,voicevox"]}
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def git(*args: str) -> Optional[str]:
+    try:
+        return subprocess.run(["git", *args], cwd=BACKEND_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    status = git("status", "--porcelain", "--untracked-files=no")
+    return {
+        "commit": git("rev-parse", "HEAD"),
+        "dirty": bool(status) if status is not None else None,
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def parse_output(stdout: str):
+    """The JSON document a benchmark printed last; some code under test also prints to stdout."""
+    lines = stdout.splitlines()
+    for start in range(len(lines) - 1, -1, -1):
+        if lines[start] in ("{", "["):
+            return json.loads("\n".join(lines[start:]))
+    raise ValueError("no JSON output")
+
+
+def run_benchmark(name: str, args: List[str], timeout: float) -> dict:
+    started = time.perf_counter()
+    try:
+        result = subprocess.run(
+            [sys.executable, "-m", f"benchmarks.{name}", *args],
+            cwd=BACKEND_DIR, capture_output=True, text=True, timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return {"args": args, "error": f"timed out after {timeout:g}s"}
+    entry = {"args": args, "wall_s": round(time.perf_counter() - started, 2)}
+    if result.returncode != 0:
+        entry["error"] = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else f"exit status {result.returncode}"
+        return entry
+    try:
+        entry["results"] = parse_output(result.stdout)
+    except ValueError as e:
+        entry["error"] = f"unreadable output: {e}"
+    return entry
+
+
+def numeric_leaves(value, path: str = "") -> Iterator[Tuple[str, float]]:
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from numeric_leaves(item, f"{path}.{key}" if path else str(key))
+    elif isinstance(value, list):
+        for index, item in enumerate(value):
+            yield from numeric_leaves(item, f"{path}[{index}]")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield path, float(value)
+
+
+def is_time_metric(path: str) -> bool:
+    """Lower is better for metrics with a time unit, e.g. turn_p50_ms, cpu_us_per_turn or wall_s (not messages_per_s)."""
+    tokens = path.rsplit(".", 1)[-1].split("_")
+    return "ms" in tokens or "us" in tokens or (tokens[-1] == "s" and tokens[-2:-1] != ["per"])
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> dict:
+    """Relative change of every numeric result present in both runs, with time regressions listed."""
+    changes = {}
+    regressions = []
+    for name, entry in current["benchmarks"].items():
+        previous = baseline.get("benchmarks", {}).get(name, {})
+        if "results" not in entry or "results" not in previous:
+            continue
+        old = dict(numeric_leaves(previous["results"]))
+        for path, value in numeric_leaves(entry["results"]):
+            before = old.get(path)
+            if before is None or before == value:
+                continue
+            change = (value - before) / abs(before) if before else None
+            key = f"{name}:{path}"
+            changes[key] = {"before": before, "after": value, "change": round(change, 3) if change is not None else None}
+            if is_time_metric(path) and change is not None and change > threshold:
+                regressions.append(key)
+    return {
+        "baseline_commit": baseline.get("environment", {}).get("commit"),
+        "threshold": threshold,
+        "regressions": regressions,
+        "changes": changes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=sorted({**BENCHMARKS, **OPT_IN}), help="Benchmarks to run")
+    parser.add_argument("--output", help="Also write the results to this file")
+    parser.add_argument("--compare", help="A previous suite output to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative growth of a time metric reported as a regression")
+    parser.add_argument("--timeout", type=float, default=300, help="Seconds per benchmark")
+    args = parser.parse_args()
+
+    selected = {name: {**BENCHMARKS, **OPT_IN}[name] for name in args.only} if args.only else BENCHMARKS
+    started = time.perf_counter()
+    results = {"environment": environment(), "benchmarks": {}}
+    for name, bench_args in selected.items():
+        print(f"Running {name}...", file=sys.stderr)
+        results["benchmarks"][name] = run_benchmark(name, bench_args, args.timeout)
+    results["wall_s"] = round(time.perf_counter() - started, 2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            results["comparison"] = compare(results, json.load(f), args.threshold)
+
+    output = json.dumps(results, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+
+    failed = [name for name, entry in results["benchmarks"].items() if "error" in entry]
+    if failed or results.get("comparison", {}).get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
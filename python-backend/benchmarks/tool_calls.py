@@ -0,0 +1,76 @@
+"""
+Benchmark for tool execution within one model turn.
+
+Uses local stub tools with injected latencies (no network) to compare executing the
+model's function calls one after another with `execute_tool_calls`, which runs them
+concurrently with per-tool timeouts.
+
+Usage (from python-backend/):
+    python -m benchmarks.tool_calls --weather-latency 0.4 --news-latency 0.8
+"""
+import argparse
+import json
+import time
+
+from google.genai import types
+
+from benchmarks.stub_tools import make_stub_tools
+from utils.model_utils import execute_tool_calls
+
+
+def sequential(function_calls, tools) -> list:
+    """The previous behaviour: one blocking call after another, no timeout."""
+    results = []
+    for call in function_calls:
+        results.append(tools[call.name](**dict(call.args or {})))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weather-latency", type=float, default=0.4)
+    parser.add_argument("--news-latency", type=float, default=0.8)
+    parser.add_argument("--hang-latency", type=float, default=3.0)
+    parser.add_argument("--timeout", type=float, default=1.0, help="Per-tool timeout used for the concurrent run")
+    args = parser.parse_args()
+
+    tools = make_stub_tools(args.weather_latency, args.news_latency, args.hang_latency)
+    timeouts = {name: args.timeout for name in tools}
+    turns = {
+        "three_cities_plus_news": [
+            types.FunctionCall(name="get_weather", args={"location": "Jakarta"}),
+            types.FunctionCall(name="get_weather", args={"location": "Tokyo"}),
+            types.FunctionCall(name="get_weather", args={"location": "London"}),
+            types.FunctionCall(name="get_news", args={"topic": "AI"}),
+        ],
+        "with_hanging_tool": [
+            types.FunctionCall(name="get_current_date_and_time", args={}),
+            types.FunctionCall(name="hanging_tool", args={}),
+            types.FunctionCall(name="get_weather", args={"location": "Jakarta"}),
+        ],
+    }
+
+    results = {}
+    for name, calls in turns.items():
+        started = time.perf_counter()
+        sequential(calls, tools)
+        sequential_s = time.perf_counter() - started
+
+        started = time.perf_counter()
+        parts = execute_tool_calls(calls, tools=tools, timeouts=timeouts)
+        concurrent_s = time.perf_counter() - started
+
+        results[name] = {
+            "sequential_ms": round(sequential_s * 1000, 1),
+            "concurrent_ms": round(concurrent_s * 1000, 1),
+            "result_order": [part.function_response.name for part in parts],
+            "timed_out": [
+                part.function_response.name for part in parts
+                if "timed out" in str(part.function_response.response.get("result"))
+            ],
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Benchmark for the tool-calling loop: `process_content_with_tools` and its streaming
+counterpart `stream_content_with_tools`.
+
+Runs whole turns against the deterministic Gemini stand-in (`benchmarks.fake_gemini`) and
+the stub tools (`benchmarks.stub_tools`), so no network or API key is needed. For each
+scenario it reports the turn time, the time the fakes themselves account for (model delays
+and the slowest tool, as the tools run concurrently) and the difference, which is the
+overhead of the loop itself. The streaming variant also reports the time to the first
+token, and runs `--concurrency` turns at once on one event loop.
+
+Usage (from python-backend/):
+    python -m benchmarks.tool_loop --turns 5 --first-chunk-delay 0.2 --tokens-per-second 200
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from contextlib import redirect_stdout
+
+from benchmarks.fake_gemini import FakeGemini
+from benchmarks.stub_tools import installed_tools, make_stub_tools
+from utils.history_utils import text_content
+from utils.model_utils import process_content_with_tools, stream_content_with_tools
+
+SCENARIOS = {
+    "answer_only": [],
+    "one_tool": [("get_weather", {"location": "Jakarta"})],
+    "three_tools": [
+        ("get_weather", {"location": "Jakarta"}),
+        ("get_weather", {"location": "Tokyo"}),
+        ("get_news", {"topic": "AI"}),
+    ],
+}
+
+
+def modeled_seconds(args, calls: list) -> dict:
+    """Time the fakes account for in one turn: until the first token and until the end."""
+    answer = FakeGemini(args.first_chunk_delay, args.tokens_per_second, args.tokens_per_chunk, args.answer_tokens)
+    before_answer = 0.0
+    if calls:
+        latencies = {"get_weather": args.weather_latency, "get_news": args.news_latency}
+        before_answer = args.first_chunk_delay + max(latencies.get(name, 0.0) for name, _ in calls)
+    return {"first_token": before_answer + args.first_chunk_delay, "turn": before_answer + answer.modeled_seconds([])}
+
+
+def prompt() -> list:
+    return [text_content("user", "Bagaimana cuaca di Jakarta hari ini?")]
+
+
+def blocking_turns(fake: FakeGemini, turns: int) -> list:
+    durations = []
+    for _ in range(turns):
+        started = time.perf_counter()
+        process_content_with_tools(prompt())
+        durations.append(time.perf_counter() - started)
+    return durations
+
+
+async def streamed_turn() -> dict:
+    started = time.perf_counter()
+    first_token = None
+    async for event in stream_content_with_tools(prompt()):
+        if event["type"] == "token" and first_token is None:
+            first_token = time.perf_counter() - started
+    return {"first_token": first_token, "turn": time.perf_counter() - started}
+
+
+async def streamed_turns(turns: int, concurrency: int) -> list:
+    samples = []
+    for _ in range(turns):
+        samples.extend(await asyncio.gather(*(streamed_turn() for _ in range(concurrency))))
+    return samples
+
+
+def ms(seconds: float) -> float:
+    return round(seconds * 1000, 1)
+
+
+def measure(args, calls: list) -> dict:
+    fake = FakeGemini(args.first_chunk_delay, args.tokens_per_second, args.tokens_per_chunk, args.answer_tokens, calls)
+    modeled = modeled_seconds(args, calls)
+    tools = make_stub_tools(args.weather_latency, args.news_latency)
+    # execute_tool_calls prints every call; keep stdout for the results
+    with fake.installed(), installed_tools(tools), redirect_stdout(sys.stderr):
+        blocking = blocking_turns(fake, args.turns)
+        streamed = asyncio.run(streamed_turns(args.turns, args.concurrency))
+
+    blocking_p50 = statistics.median(blocking)
+    streamed_p50 = statistics.median(s["turn"] for s in streamed)
+    first_token_p50 = statistics.median(s["first_token"] for s in streamed)
+    return {
+        "modeled_turn_ms": ms(modeled["turn"]),
+        "blocking": {
+            "turn_p50_ms": ms(blocking_p50),
+            "overhead_p50_ms": ms(blocking_p50 - modeled["turn"]),
+        },
+        "streaming": {
+            "first_token_p50_ms": ms(first_token_p50),
+            "first_token_overhead_p50_ms": ms(first_token_p50 - modeled["first_token"]),
+            "turn_p50_ms": ms(streamed_p50),
+            "turn_max_ms": ms(max(s["turn"] for s in streamed)),
+            "overhead_p50_ms": ms(streamed_p50 - modeled["turn"]),
+        },
+        "model_calls": fake.counts,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=10, help="Streamed turns running at once")
+    parser.add_argument("--first-chunk-delay", type=float, default=0.2)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--tokens-per-chunk", type=int, default=8)
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--weather-latency", type=float, default=0.1)
+    parser.add_argument("--news-latency", type=float, default=0.2)
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    args = parser.parse_args()
+    results = {name: measure(args, SCENARIOS[name]) for name in args.scenarios}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
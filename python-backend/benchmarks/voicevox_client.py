@@ -0,0 +1,112 @@
+"""
+Benchmark for the VOICEVOX client against the local fake engine.
+
+Simulates concurrent Japanese voice-call turns whose sentences arrive a few tens of
+milliseconds apart, and compares:
+  - per_sentence_requests: a fresh `requests.post` pair (/audio_query + /synthesis) per sentence,
+    run on a thread pool (the behaviour before the async client)
+  - async_client: `VoicevoxClient` with pooled keep-alive connections, bounded concurrency
+    and /multi_synthesis batching of sentences queued behind each other
+
+Usage (from python-backend/):
+    python -m benchmarks.voicevox_client --sessions 4 --sentences 6
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from benchmarks.fake_voicevox import start_fake_voicevox
+from services.voicevox_client import VoicevoxClient
+
+SENTENCES = [
+    "こんにちは。",
+    "今日の東京は晴れ時々曇りです。",
+    "気温は二十三度くらいです。",
+    "夕方から少し雨が降るかもしれません。",
+    "折りたたみ傘を持っていくと安心ですよ。",
+    "ほかに何かお手伝いできることはありますか？",
+]
+SPEAKER = 47
+
+
+def legacy_synthesize(base_url: str, text: str) -> bytes:
+    query = requests.post(f"{base_url}/audio_query", params={"text": text, "speaker": SPEAKER})
+    query.raise_for_status()
+    synth = requests.post(f"{base_url}/synthesis", params={"speaker": SPEAKER}, json=query.json())
+    synth.raise_for_status()
+    return synth.content
+
+
+async def run_turn(synthesize, sentences, arrival_interval: float) -> dict:
+    started = time.perf_counter()
+    first_audio = None
+    jobs = []
+    for text in sentences:
+        jobs.append(asyncio.ensure_future(synthesize(text)))
+        await asyncio.sleep(arrival_interval)
+    for job in jobs:
+        await job
+        if first_audio is None:
+            first_audio = time.perf_counter() - started
+    return {"first_audio": first_audio, "turn": time.perf_counter() - started}
+
+
+async def measure(name, synthesize, args, server) -> dict:
+    for key in server.counts:
+        server.counts[key] = 0
+    sentences = (SENTENCES * ((args.sentences // len(SENTENCES)) + 1))[:args.sentences]
+    started = time.perf_counter()
+    samples = await asyncio.gather(*(run_turn(synthesize, sentences, args.arrival_interval) for _ in range(args.sessions)))
+    return {
+        "first_audio_p50_ms": round(statistics.median(s["first_audio"] for s in samples) * 1000, 1),
+        "turn_p50_ms": round(statistics.median(s["turn"] for s in samples) * 1000, 1),
+        "wall_s": round(time.perf_counter() - started, 2),
+        "http_requests": dict(server.counts),
+    }
+
+
+async def run(args) -> dict:
+    server = start_fake_voicevox(request_latency=args.request_latency)
+    results = {"sessions": args.sessions, "sentences_per_turn": args.sentences}
+
+    pool = ThreadPoolExecutor(max_workers=args.threads)
+    loop = asyncio.get_running_loop()
+
+    async def legacy(text):
+        return await loop.run_in_executor(pool, legacy_synthesize, server.url, text)
+
+    results["per_sentence_requests"] = await measure("legacy", legacy, args, server)
+
+    client = VoicevoxClient(base_url=server.url, max_concurrency=args.max_concurrency, max_batch=args.max_batch)
+    await client.start()
+
+    async def pooled(text):
+        return await client.synthesize(text, SPEAKER)
+
+    results["async_client"] = await measure("async", pooled, args, server)
+    await client.aclose()
+    pool.shutdown()
+    server.shutdown()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--sentences", type=int, default=6)
+    parser.add_argument("--arrival-interval", type=float, default=0.03)
+    parser.add_argument("--request-latency", type=float, default=0.08)
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--max-concurrency", type=int, default=2)
+    parser.add_argument("--max-batch", type=int, default=4)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Load measurement for concurrent voice-call sessions on a single event loop.
+
+Simulates N sessions that each stream a model response from a socket-level stand-in for the
+Gemini API (`benchmarks.fake_gemini_server`) through a real google-genai client, comparing:
+  - sdk_asyncio: `client.aio.models.generate_content_stream`, which in google-genai 0.4 reads
+                 the response with blocking calls on the event loop
+  - threaded:    `utils.stream_utils.iterate_in_thread`, the path used by `conversation_ws`,
+                 which reads the SDK's blocking stream on a worker thread
+
+Reports time to first chunk and per turn, plus the worst event-loop lag a 10 ms ticker saw
+(how long other connections would have been frozen). A second run stalls one stream and
+reports how long each path takes to raise its timeout.
+
+Usage (from python-backend/):
+    python -m benchmarks.ws_concurrency --sessions 50 --first-chunk-delay 0.3
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import statistics
+import time
+
+from google import genai
+
+from benchmarks.fake_gemini_server import start_fake_gemini_server
+from utils.stream_utils import StreamTimeoutError, iterate_in_thread, iterate_with_timeouts
+
+MODEL = "gemini-2.5-flash"
+
+
+async def sdk_asyncio_stream(client: genai.Client):
+    stream = client.aio.models.generate_content_stream(model=MODEL, contents="Hi")
+    if inspect.isawaitable(stream):
+        stream = await stream
+    return stream.__aiter__()
+
+
+async def threaded_stream(client: genai.Client):
+    return iterate_in_thread(lambda: client.models.generate_content_stream(model=MODEL, contents="Hi"))
+
+
+STREAMS = {"sdk_asyncio": sdk_asyncio_stream, "threaded": threaded_stream}
+
+
+async def session(open_stream, client, started: float, timeout: float) -> dict:
+    first_chunk_at = None
+    stream = await open_stream(client)
+    async for _ in iterate_with_timeouts(stream, first_chunk_timeout=timeout, chunk_timeout=timeout):
+        if first_chunk_at is None:
+            first_chunk_at = time.perf_counter()
+    return {"ttfc": first_chunk_at - started, "total": time.perf_counter() - started}
+
+
+async def loop_lag(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Worst delay of a periodic tick, i.e. the longest the event loop was blocked."""
+    worst = 0.0
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - expected)
+    return worst
+
+
+def summarize(samples: list) -> dict:
+    ttfc = sorted(s["ttfc"] for s in samples)
+    total = sorted(s["total"] for s in samples)
+    return {
+        "ttfc_p50_ms": round(statistics.median(ttfc) * 1000, 1),
+        "ttfc_p95_ms": round(ttfc[max(0, int(len(ttfc) * 0.95) - 1)] * 1000, 1),
+        "ttfc_max_ms": round(ttfc[-1] * 1000, 1),
+        "turn_p50_ms": round(statistics.median(total) * 1000, 1),
+    }
+
+
+async def load(args, client) -> dict:
+    results = {"sessions": args.sessions}
+    for name, open_stream in STREAMS.items():
+        stop = asyncio.Event()
+        ticker = asyncio.ensure_future(loop_lag(stop))
+        await asyncio.sleep(0.05)
+        # All sessions send their turn at the same instant; latency is measured from there
+        started = time.perf_counter()
+        samples = await asyncio.gather(*(session(open_stream, client, started, 30) for _ in range(args.sessions)))
+        wall_s = time.perf_counter() - started
+        stop.set()
+        results[name] = summarize(samples)
+        results[name]["wall_s"] = round(wall_s, 2)
+        results[name]["loop_lag_max_ms"] = round(await ticker * 1000, 1)
+    return results
+
+
+async def stalled(args, client) -> dict:
+    results = {"timeout_s": args.timeout, "stall_s": args.stall}
+    for name, open_stream in STREAMS.items():
+        stop = asyncio.Event()
+        ticker = asyncio.ensure_future(loop_lag(stop))
+        started = time.perf_counter()
+        try:
+            await session(open_stream, client, started, args.timeout)
+            outcome = "completed"
+        except StreamTimeoutError:
+            outcome = "timed_out"
+        stop.set()
+        results[name] = {
+            "outcome": outcome,
+            "gave_up_after_ms": round((time.perf_counter() - started) * 1000, 1),
+            "loop_lag_max_ms": round(await ticker * 1000, 1),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--chunks", type=int, default=10)
+    parser.add_argument("--first-chunk-delay", type=float, default=0.3)
+    parser.add_argument("--chunk-interval", type=float, default=0.02)
+    parser.add_argument("--timeout", type=float, default=1.0, help="Stream timeout of the stalled-stream run")
+    parser.add_argument("--stall", type=float, default=4.0, help="Seconds the stalled stream stays silent")
+    args = parser.parse_args()
+
+    server = start_fake_gemini_server(chunks=args.chunks, first_chunk_delay=args.first_chunk_delay, chunk_interval=args.chunk_interval)
+    client = genai.Client(api_key="benchmark", http_options={"base_url": server.url})
+    results = {"load": asyncio.run(load(args, client))}
+
+    # requests reads the stream in 512-byte blocks, so a stall before the first chunk is the reliable case
+    server.first_chunk_delay, server.stall_after, server.stall = 0.0, 0, args.stall
+    results["stalled_stream"] = asyncio.run(stalled(args, client))
+    server.shutdown()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,8 @@ NEWSAPI_API_KEY = os.getenv("NEWSAPI_API_KEY")
 # Supabase Credentials
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+# Legacy HS256 JWT secret of the project (optional; asymmetric keys are fetched from the JWKS endpoint)
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
 
 # Validate that the API keys are set
 if not GOOGLE_API_KEY:
@@ -25,4 +27,155 @@ if not NEWSAPI_API_KEY:
 if not SUPABASE_URL:
     raise ValueError("SUPABASE_URL environment variable is not set")
 if not SUPABASE_SERVICE_ROLE_KEY:
-    raise ValueError("SUPABASE_SERVICE_ROLE_KEY environment variable is not set")
\ No newline at end of file
+    raise ValueError("SUPABASE_SERVICE_ROLE_KEY environment variable is not set")
+
+# --- TTS Worker Pool ---
+# Number of threads shared by every connection of this worker for local TTS synthesis
+TTS_WORKER_THREADS = int(os.getenv("TTS_WORKER_THREADS", "4"))
+# Maximum number of sentences a single voice call may have queued for synthesis at once
+TTS_MAX_PENDING_SENTENCES = int(os.getenv("TTS_MAX_PENDING_SENTENCES", "8"))
+
+# --- Model Streaming Timeouts (seconds) ---
+# Applied per voice-call turn to the async Gemini stream
+GEMINI_STREAM_FIRST_CHUNK_TIMEOUT = float(os.getenv("GEMINI_STREAM_FIRST_CHUNK_TIMEOUT", "20"))
+GEMINI_STREAM_CHUNK_TIMEOUT = float(os.getenv("GEMINI_STREAM_CHUNK_TIMEOUT", "15"))
+GEMINI_STREAM_TURN_TIMEOUT = float(os.getenv("GEMINI_STREAM_TURN_TIMEOUT", "90"))
+
+# --- TTS Audio Cache ---
+# In-memory LRU size cap; the on-disk store is disabled when its cap is 0
+TTS_CACHE_MEMORY_MAX_BYTES = int(os.getenv("TTS_CACHE_MEMORY_MAX_BYTES", str(64 * 1024 * 1024)))
+TTS_CACHE_DISK_MAX_BYTES = int(os.getenv("TTS_CACHE_DISK_MAX_BYTES", str(512 * 1024 * 1024)))
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "tts"))
+
+# --- TTS Text Segmentation (characters; halved for Japanese) ---
+TTS_SEGMENT_MIN_CHARS = int(os.getenv("TTS_SEGMENT_MIN_CHARS", "24"))
+TTS_SEGMENT_SOFT_MIN_CHARS = int(os.getenv("TTS_SEGMENT_SOFT_MIN_CHARS", "80"))
+TTS_SEGMENT_MAX_CHARS = int(os.getenv("TTS_SEGMENT_MAX_CHARS", "240"))
+
+# --- TTS Post-processing (Coqui, Piper and VOICEVOX output) ---
+TTS_POSTPROCESS_ENABLED = os.getenv("TTS_POSTPROCESS_ENABLED", "true").lower() == "true"
+# Leading/trailing audio quieter than this is trimmed, keeping TTS_TRIM_KEEP_MS next to the speech
+TTS_TRIM_THRESHOLD_DBFS = float(os.getenv("TTS_TRIM_THRESHOLD_DBFS", "-45"))
+TTS_TRIM_KEEP_MS = int(os.getenv("TTS_TRIM_KEEP_MS", "40"))
+# RMS level of the speech (silent frames excluded) every engine is brought to, limited by the peak ceiling
+TTS_TARGET_LEVEL_DBFS = float(os.getenv("TTS_TARGET_LEVEL_DBFS", "-20"))
+TTS_PEAK_CEILING_DBFS = float(os.getenv("TTS_PEAK_CEILING_DBFS", "-1"))
+TTS_MAX_GAIN_DB = float(os.getenv("TTS_MAX_GAIN_DB", "20"))
+# Common output sample rate for all engines (e.g. 24000); 0 keeps each engine's own rate
+TTS_OUTPUT_SAMPLE_RATE = int(os.getenv("TTS_OUTPUT_SAMPLE_RATE", "0"))
+
+# --- Gemini TTS ---
+GEMINI_TTS_VOICE = os.getenv("GEMINI_TTS_VOICE", "Leda")
+# Long answers are synthesized in chunks of whole sentences; the first chunk is kept short so audio starts sooner
+GEMINI_TTS_CHUNK_MAX_CHARS = int(os.getenv("GEMINI_TTS_CHUNK_MAX_CHARS", "500"))
+GEMINI_TTS_FIRST_CHUNK_MAX_CHARS = int(os.getenv("GEMINI_TTS_FIRST_CHUNK_MAX_CHARS", "160"))
+# Chunks of one answer synthesized at once, and Gemini TTS calls in flight across the whole process
+GEMINI_TTS_PARALLELISM = int(os.getenv("GEMINI_TTS_PARALLELISM", "3"))
+GEMINI_TTS_WORKER_THREADS = int(os.getenv("GEMINI_TTS_WORKER_THREADS", "8"))
+
+# --- VOICEVOX Engine ---
+VOICEVOX_BASE_URL = os.getenv("VOICEVOX_BASE_URL", "http://127.0.0.1:50021")
+VOICEVOX_TIMEOUT = float(os.getenv("VOICEVOX_TIMEOUT", "15"))
+# Synthesis requests in flight at once; sentences queued beyond this are batched via /multi_synthesis
+VOICEVOX_MAX_CONCURRENCY = int(os.getenv("VOICEVOX_MAX_CONCURRENCY", "2"))
+VOICEVOX_MAX_BATCH = int(os.getenv("VOICEVOX_MAX_BATCH", "4"))
+
+# --- Tool Execution ---
+TOOL_WORKER_THREADS = int(os.getenv("TOOL_WORKER_THREADS", "8"))
+TOOL_DEFAULT_TIMEOUT = float(os.getenv("TOOL_DEFAULT_TIMEOUT", "10"))
+
+# --- Tool Result Cache ---
+TOOL_CACHE_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1024"))
+# Time-to-live (seconds) per tool; 0 disables caching for that tool
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+NEWS_CACHE_TTL = float(os.getenv("NEWS_CACHE_TTL", "900"))
+TOOL_HTTP_POOL_SIZE = int(os.getenv("TOOL_HTTP_POOL_SIZE", "16"))
+
+# --- TTS Engines ---
+# Engines this deployment uses (piper = English, coqui = Indonesian, voicevox = Japanese); others are never loaded
+TTS_ENABLED_ENGINES = [name.strip() for name in os.getenv("TTS_ENABLED_ENGINES", "piper,coqui,voicevox").split(",") if name.strip()]
+# "background" loads enabled engines on a thread at startup; "lazy" loads each on its first sentence
+TTS_ENGINE_WARMUP = os.getenv("TTS_ENGINE_WARMUP", "background")
+
+# --- Dedicated TTS Server ---
+# Comma-separated addresses ("unix:/path/to.sock" or "host:port") of TTS server processes
+# started with `python -m services.tts_server`. When set, web workers send Piper and Coqui
+# synthesis there instead of loading the models themselves. Empty keeps synthesis in-process.
+TTS_SERVER_ADDRESSES = [addr.strip() for addr in os.getenv("TTS_SERVER_ADDRESSES", "").split(",") if addr.strip()]
+TTS_SERVER_TIMEOUT = float(os.getenv("TTS_SERVER_TIMEOUT", "30"))
+# Idle connections kept per server address by each web worker
+TTS_SERVER_CONNECTIONS = int(os.getenv("TTS_SERVER_CONNECTIONS", "8"))
+# Synthesis threads inside each TTS server process
+TTS_SERVER_WORKERS = int(os.getenv("TTS_SERVER_WORKERS", "2"))
+
+# --- Session History Store ---
+# Chats whose history is kept in memory per worker (least recently used are dropped and reloaded from chat_messages)
+SESSION_STORE_MAX_SESSIONS = int(os.getenv("SESSION_STORE_MAX_SESSIONS", "1000"))
+
+# --- Context Window ---
+# Estimated token budget for the history sent to the model on each turn
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "8000"))
+# Most recent turns that are always kept verbatim
+CONTEXT_KEEP_RECENT_TURNS = int(os.getenv("CONTEXT_KEEP_RECENT_TURNS", "4"))
+# Tool results of older turns are truncated to this many characters
+CONTEXT_TOOL_RESULT_MAX_CHARS = int(os.getenv("CONTEXT_TOOL_RESULT_MAX_CHARS", "1000"))
+# Replace removed turns with a model-written rolling summary (one extra model call per compaction)
+CONTEXT_SUMMARY_ENABLED = os.getenv("CONTEXT_SUMMARY_ENABLED", "false").lower() == "true"
+CONTEXT_SUMMARY_MODEL = os.getenv("CONTEXT_SUMMARY_MODEL", "gemini-2.5-flash")
+
+# --- Prompts ---
+# Persona files are checked for changes at most this often (seconds); 0 checks on every request
+PERSONA_RELOAD_INTERVAL = float(os.getenv("PERSONA_RELOAD_INTERVAL", "5"))
+# Gemini explicit context caching of the persona + older history of long voice calls (billed per cached token-hour)
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "false").lower() == "true"
+# Smallest prefix worth caching; Gemini rejects caches below the model's minimum (1024 tokens for 2.5 Flash)
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "2048"))
+# A cache is rebuilt once this many tokens of history have accumulated after its prefix
+PROMPT_CACHE_REFRESH_TOKENS = int(os.getenv("PROMPT_CACHE_REFRESH_TOKENS", "2048"))
+PROMPT_CACHE_TTL = int(os.getenv("PROMPT_CACHE_TTL", "600"))
+PROMPT_CACHE_MAX_ENTRIES = int(os.getenv("PROMPT_CACHE_MAX_ENTRIES", "200"))
+
+# --- Chat Message Persistence ---
+# Write chat_messages through a background write-behind queue; "false" inserts synchronously per message
+MESSAGE_WRITE_BEHIND = os.getenv("MESSAGE_WRITE_BEHIND", "true").lower() == "true"
+# A batch is written once it has this many messages or its oldest message waited this long (seconds)
+MESSAGE_BATCH_SIZE = int(os.getenv("MESSAGE_BATCH_SIZE", "50"))
+MESSAGE_FLUSH_INTERVAL = float(os.getenv("MESSAGE_FLUSH_INTERVAL", "0.2"))
+# Retries of a failed batch, with exponential backoff starting at MESSAGE_RETRY_BACKOFF seconds
+MESSAGE_MAX_RETRIES = int(os.getenv("MESSAGE_MAX_RETRIES", "5"))
+MESSAGE_RETRY_BACKOFF = float(os.getenv("MESSAGE_RETRY_BACKOFF", "0.5"))
+# Queued messages before new ones are dropped (only reached while the database is unavailable)
+MESSAGE_QUEUE_MAX = int(os.getenv("MESSAGE_QUEUE_MAX", "10000"))
+# Seconds the shutdown hook waits for queued messages to be written
+MESSAGE_SHUTDOWN_TIMEOUT = float(os.getenv("MESSAGE_SHUTDOWN_TIMEOUT", "10"))
+
+# --- Chat History API ---
+# Largest page of messages GET /api/chats/{session_id}?limit=... returns
+CHAT_HISTORY_MAX_PAGE_SIZE = int(os.getenv("CHAT_HISTORY_MAX_PAGE_SIZE", "200"))
+# Users whose session list (GET /api/chats) is cached per worker, and for how long (seconds).
+# Changes made through this worker invalidate it at once; other workers see them after the TTL.
+SESSION_LIST_CACHE_MAX_USERS = int(os.getenv("SESSION_LIST_CACHE_MAX_USERS", "5000"))
+SESSION_LIST_CACHE_TTL = float(os.getenv("SESSION_LIST_CACHE_TTL", "30"))
+
+# --- Authentication ---
+# Verify Supabase access tokens locally (signature, expiry, audience, issuer) instead of asking the auth server
+AUTH_LOCAL_VERIFY = os.getenv("AUTH_LOCAL_VERIFY", "true").lower() == "true"
+AUTH_JWT_AUDIENCE = os.getenv("AUTH_JWT_AUDIENCE", "authenticated")
+# Seconds the project's signing keys (JWKS) are cached
+AUTH_JWKS_CACHE_TTL = float(os.getenv("AUTH_JWKS_CACHE_TTL", "600"))
+# Seconds a verified token's user is cached (never beyond the token's expiry)
+AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "60"))
+AUTH_USER_CACHE_MAX_ENTRIES = int(os.getenv("AUTH_USER_CACHE_MAX_ENTRIES", "10000"))
+
+# --- Audio Input ---
+# Converted recordings up to this size (bytes) are sent inline with the transcription request;
+# larger ones go through the Files API (upload, then delete). Gemini caps inline requests at 20 MB.
+AUDIO_INLINE_MAX_BYTES = int(os.getenv("AUDIO_INLINE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+# --- Audio Output ---
+# Format of synthesized audio for clients that do not ask for one: wav, pcm, ogg (Opus), mp3 or webm (Opus, needs ffmpeg)
+AUDIO_OUTPUT_FORMAT = os.getenv("AUDIO_OUTPUT_FORMAT", "wav")
+# libsndfile compression levels from 0.0 (highest bitrate) to just below 1.0 (smallest); empty uses the encoder default.
+# Opus defaults to about 37 kbps for 24 kHz speech; MP3 is constant-bitrate, 0.8 being about 40 kbps.
+AUDIO_OPUS_COMPRESSION_LEVEL = float(os.getenv("AUDIO_OPUS_COMPRESSION_LEVEL")) if os.getenv("AUDIO_OPUS_COMPRESSION_LEVEL") else None
+AUDIO_MP3_COMPRESSION_LEVEL = float(os.getenv("AUDIO_MP3_COMPRESSION_LEVEL", "0.8")) if os.getenv("AUDIO_MP3_COMPRESSION_LEVEL", "0.8") else None
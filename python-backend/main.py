@@ -1,10 +1,23 @@
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from api.generate_text import router as generate_text_router
 from api.process_audio import router as process_image_router # Corrected router name
 from api.full_conversation import router as full_conversation_router
 from api.chat_history import router as chat_history_router
 from api.conversation_ws import router as conversation_ws_router
+from services.tts_pipeline import shutdown_tts_executor
+from services.tts_cache import tts_cache
+from services.gemini_tts import gemini_tts
+from services.tts_engines import tts_engines
+from services.tts_remote import tts_remote
+from services.session_store import session_store
+from services.prompt_cache import prompt_cache
+from services.message_writer import message_writer
+from services.auth import token_verifier
+from services.tts_metrics import tts_first_audio_latency, text_first_token_latency
+from services.voicevox_client import voicevox_client
+from tools.available_tools import tool_cache
 import os
 
 # Import config to ensure environment variables are loaded
@@ -30,13 +43,39 @@ app.include_router(chat_history_router)
 app.include_router(text_to_speech.router)
 app.include_router(conversation_ws_router)
 
+@app.on_event("startup")
+async def startup_event():
+    await voicevox_client.start()
+    # With a dedicated TTS server the models live there; only VOICEVOX is used directly
+    if config.TTS_ENGINE_WARMUP == "background" and tts_remote is None:
+        tts_engines.start_warmup()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Write out chat messages still queued for the database
+    await run_in_threadpool(message_writer.stop, config.MESSAGE_SHUTDOWN_TIMEOUT)
+    shutdown_tts_executor()
+    gemini_tts.shutdown()
+    await voicevox_client.aclose()
+
 @app.get("/")
 async def root():
     return {"message": "Gemini Conversational AI Python Backend API"}
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    return {
+        "status": "healthy",
+        "tts_engines": tts_engines.status() if tts_remote is None else await run_in_threadpool(tts_remote.status),
+        "tts_cache": tts_cache.stats(),
+        "tts_time_to_first_audio": tts_first_audio_latency.summary(),
+        "text_time_to_first_token": text_first_token_latency.summary(),
+        "tool_cache": tool_cache.stats(),
+        "session_store": session_store.stats(),
+        "prompt_cache": prompt_cache.stats(),
+        "message_writer": message_writer.stats(),
+        "auth_user_cache": token_verifier.stats(),
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,173 @@
+import hashlib
+import logging
+import time
+from typing import Optional, Tuple
+
+import jwt
+from fastapi import Depends, Header, HTTPException
+from pydantic import BaseModel
+from supabase import Client
+
+from config import (
+    SUPABASE_URL,
+    SUPABASE_JWT_SECRET,
+    AUTH_LOCAL_VERIFY,
+    AUTH_JWT_AUDIENCE,
+    AUTH_JWKS_CACHE_TTL,
+    AUTH_USER_CACHE_TTL,
+    AUTH_USER_CACHE_MAX_ENTRIES,
+)
+from database import get_db_connection
+from tools.tool_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Signature algorithms Supabase issues access tokens with
+ASYMMETRIC_ALGORITHMS = ("RS256", "ES256")
+
+
+class AuthUser(BaseModel):
+    id: str
+    email: Optional[str] = None
+    role: Optional[str] = None
+
+
+class InvalidTokenError(Exception):
+    """The access token is malformed, forged, expired or meant for someone else."""
+
+
+class TokenVerifier:
+    """
+    Resolves Supabase access tokens to users without a round-trip to the auth server.
+
+    Tokens are verified locally: the signature (HS256 with the project's JWT secret, or
+    RS256/ES256 with keys from the project's JWKS endpoint, cached), expiry, audience and
+    issuer. Resolved users are cached per token for `user_ttl` seconds, never past the
+    token's expiry. A token that cannot be verified locally (no secret configured for an
+    HS256 token, a key id the JWKS does not list, or the JWKS endpoint is unreachable)
+    falls back to `db.auth.get_user`.
+
+    Like any stateless check, a locally verified token stays valid until it expires even if
+    its session is revoked earlier.
+
+    Args:
+        jwt_secret (str): The project's legacy HS256 JWT secret, if it uses one.
+        supabase_url (str): Project URL; gives the JWKS endpoint and the expected issuer.
+        audience (str): Expected `aud` claim.
+        local (bool): When False, every token is resolved by the auth server (still cached).
+        user_ttl (float): Seconds a resolved user is cached.
+    """
+
+    def __init__(
+        self,
+        jwt_secret: Optional[str] = SUPABASE_JWT_SECRET,
+        supabase_url: str = SUPABASE_URL,
+        audience: str = AUTH_JWT_AUDIENCE,
+        local: bool = AUTH_LOCAL_VERIFY,
+        user_ttl: float = AUTH_USER_CACHE_TTL,
+        max_entries: int = AUTH_USER_CACHE_MAX_ENTRIES,
+        jwks_cache_ttl: float = AUTH_JWKS_CACHE_TTL,
+    ):
+        self.jwt_secret = jwt_secret
+        self.issuer = f"{supabase_url.rstrip('/')}/auth/v1"
+        self.audience = audience
+        self.local = local
+        self.user_ttl = user_ttl
+        self.users = TTLCache(max_entries)
+        self._jwks = jwt.PyJWKClient(
+            f"{self.issuer}/.well-known/jwks.json", cache_keys=True, lifespan=jwks_cache_ttl, timeout=5
+        )
+        self.local_verifications = 0
+        self.remote_verifications = 0
+
+    def verify(self, token: str, db: Client) -> AuthUser:
+        """
+        Returns the user a token belongs to.
+
+        Raises:
+            InvalidTokenError: If the token is not valid.
+        """
+        key = (hashlib.sha256(token.encode("utf-8")).hexdigest(),)
+        user = self.users.get(key)
+        if user is not None:
+            return user
+
+        resolved = self._verify_locally(token) if self.local else None
+        if resolved is None:
+            resolved = self._verify_remotely(token, db)
+        user, expires_at = resolved
+
+        ttl = self.user_ttl if expires_at is None else min(self.user_ttl, expires_at - time.time())
+        if ttl > 0:
+            self.users.set(key, user, ttl)
+        return user
+
+    def stats(self) -> dict:
+        return {
+            **self.users.stats(),
+            "local_verifications": self.local_verifications,
+            "remote_verifications": self.remote_verifications,
+        }
+
+    def _verify_locally(self, token: str) -> Optional[Tuple[AuthUser, Optional[float]]]:
+        """The user and token expiry, or None if this token cannot be checked locally."""
+        try:
+            algorithm = jwt.get_unverified_header(token).get("alg")
+            if algorithm == "HS256":
+                if not self.jwt_secret:
+                    return None
+                key = self.jwt_secret
+            elif algorithm in ASYMMETRIC_ALGORITHMS:
+                try:
+                    key = self._jwks.get_signing_key_from_jwt(token).key
+                except jwt.PyJWKClientConnectionError as e:
+                    logger.warning(f"JWKS endpoint unavailable, verifying token with the auth server: {e}")
+                    return None
+                except jwt.PyJWKClientError as e:
+                    # E.g. a key id the JWKS does not list (yet); let the auth server decide
+                    logger.info(f"No JWKS key for token, verifying it with the auth server: {e}")
+                    return None
+            else:
+                raise InvalidTokenError(f"Unsupported token algorithm: {algorithm}")
+
+            claims = jwt.decode(
+                token,
+                key,
+                algorithms=[algorithm],
+                audience=self.audience,
+                issuer=self.issuer,
+                options={"require": ["exp", "sub"]},
+            )
+        except jwt.PyJWTError as e:
+            raise InvalidTokenError(str(e))
+        self.local_verifications += 1
+        return AuthUser(id=claims["sub"], email=claims.get("email"), role=claims.get("role")), float(claims["exp"])
+
+    def _verify_remotely(self, token: str, db: Client) -> Tuple[AuthUser, Optional[float]]:
+        self.remote_verifications += 1
+        try:
+            user = db.auth.get_user(token).user
+        except Exception as e:
+            raise InvalidTokenError(str(e))
+        if not user:
+            raise InvalidTokenError("User not found")
+        return AuthUser(id=user.id, email=user.email, role=user.role), None
+
+
+token_verifier = TokenVerifier()
+
+
+def get_current_user(
+    authorization: Optional[str] = Header(None),
+    db: Client = Depends(get_db_connection)
+) -> AuthUser:
+    """
+    FastAPI dependency for endpoints that require a signed-in user ("Authorization: Bearer <token>").
+    """
+    if not authorization or not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    try:
+        return token_verifier.verify(authorization.split("Bearer ")[1], db)
+    except InvalidTokenError as e:
+        logger.info(f"Rejected access token: {e}")
+        raise HTTPException(status_code=401, detail="Invalid token or user not found")
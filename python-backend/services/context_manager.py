@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import threading
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+from google.genai import types as genai_types
+
+from config import (
+    CONTEXT_TOKEN_BUDGET,
+    CONTEXT_KEEP_RECENT_TURNS,
+    CONTEXT_TOOL_RESULT_MAX_CHARS,
+    CONTEXT_SUMMARY_ENABLED,
+)
+from utils.history_utils import history_to_json
+from utils.model_utils import summarize_conversation
+
+logger = logging.getLogger(__name__)
+
+# Marks the history entry that stands in for older, summarized turns
+SUMMARY_PREFIX = "[Summary of the earlier conversation]\n"
+# Gemini bills an inline image as a fixed number of tokens
+IMAGE_TOKENS = 258
+# Summaries kept for histories that are re-sent in full every turn (legacy clients)
+SUMMARY_CACHE_SIZE = 256
+
+
+def estimate_tokens(content: genai_types.Content) -> int:
+    """
+    Cheap local token estimate for one history entry: about 4 UTF-8 bytes per token, which
+    holds for English/Indonesian and errs high for Japanese. Good enough for budgeting.
+    """
+    size = 0
+    for part in content.parts or []:
+        if part.text:
+            size += len(part.text.encode("utf-8"))
+        elif part.function_call:
+            size += len(json.dumps(dict(part.function_call.args or {}), ensure_ascii=False).encode("utf-8")) + 16
+        elif part.function_response:
+            size += len(json.dumps(part.function_response.response, ensure_ascii=False, default=str).encode("utf-8")) + 16
+        elif part.inline_data or part.file_data:
+            size += IMAGE_TOKENS * 4
+    return size // 4 + 4  # + per-message overhead
+
+
+def estimate_history_tokens(history: List[genai_types.Content]) -> int:
+    return sum(estimate_tokens(content) for content in history)
+
+
+def is_summary(content: genai_types.Content) -> bool:
+    return bool(content.parts) and bool(content.parts[0].text) and content.parts[0].text.startswith(SUMMARY_PREFIX)
+
+
+def _starts_turn(history: List[genai_types.Content], index: int) -> bool:
+    """A turn starts at a plain user message that is not the follow-up to tool results."""
+    content = history[index]
+    if content.role != "user" or is_summary(content):
+        return False
+    if not content.parts or not all(part.text is not None for part in content.parts):
+        return False
+    return index == 0 or history[index - 1].role != "tool"
+
+
+def _compact_tool_results(content: genai_types.Content, max_chars: int) -> genai_types.Content:
+    """Shortens bulky function_response payloads of an older turn."""
+    if not any(part.function_response for part in content.parts or []):
+        return content
+    parts = []
+    for part in content.parts:
+        if part.function_response:
+            payload = json.dumps(part.function_response.response, ensure_ascii=False, default=str)
+            if len(payload) > max_chars:
+                part = genai_types.Part.from_function_response(
+                    name=part.function_response.name,
+                    response={"result": payload[:max_chars] + " ...[truncated]"},
+                )
+        parts.append(part)
+    return genai_types.Content(role=content.role, parts=parts)
+
+
+class ContextManager:
+    """
+    Keeps the history sent to the model within a token budget.
+
+    1. Tool results in all but the latest turn are truncated to `tool_result_max_chars`.
+    2. If the history is still over budget, the oldest whole turns are removed, always
+       keeping the last `keep_recent_turns` turns.
+    3. With a `summarize` function, the removed turns (together with any earlier summary)
+       are replaced by one summary entry at the head of the history. Because the summary is
+       kept in the stored history, it rolls forward: the next compaction summarizes the old
+       summary plus the newly removed turns. Summaries are also cached by the content they
+       cover, so clients that resend the full history do not trigger a new summary per turn.
+
+    Args:
+        budget_tokens (int): Estimated token budget for the history.
+        keep_recent_turns (int): Turns that are never removed.
+        tool_result_max_chars (int): Size cap for tool results of older turns.
+        summarize (Callable): Optional blocking `(previous_summary, removed_contents) -> str`.
+    """
+
+    def __init__(
+        self,
+        budget_tokens: int = CONTEXT_TOKEN_BUDGET,
+        keep_recent_turns: int = CONTEXT_KEEP_RECENT_TURNS,
+        tool_result_max_chars: int = CONTEXT_TOOL_RESULT_MAX_CHARS,
+        summarize: Optional[Callable[[str, List[genai_types.Content]], str]] = None,
+    ):
+        self.budget_tokens = budget_tokens
+        self.keep_recent_turns = keep_recent_turns
+        self.tool_result_max_chars = tool_result_max_chars
+        self.summarize = summarize
+        self._summaries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def fit(self, history: List[genai_types.Content]) -> List[genai_types.Content]:
+        """Returns a history within the budget. Blocking if a summary has to be generated."""
+        turn_starts = [i for i in range(len(history)) if _starts_turn(history, i)]
+        if turn_starts:
+            latest_turn = turn_starts[-1]
+            history = [
+                _compact_tool_results(content, self.tool_result_max_chars) if i < latest_turn else content
+                for i, content in enumerate(history)
+            ]
+
+        tokens = [estimate_tokens(content) for content in history]
+        remaining = sum(tokens)
+        if remaining <= self.budget_tokens:
+            return history
+
+        # Remove the oldest turns until the rest fits, keeping the most recent ones;
+        # `remaining` is the estimate of history[cut:], updated as the cut moves forward
+        removable = []
+        if len(turn_starts) > self.keep_recent_turns:
+            removable = [start for start in turn_starts[:len(turn_starts) - self.keep_recent_turns + 1] if start > 0]
+        cut = 0
+        for start in removable:
+            remaining -= sum(tokens[cut:start])
+            cut = start
+            if remaining <= self.budget_tokens:
+                break
+        if not cut:
+            return history
+
+        removed, kept = history[:cut], history[cut:]
+        if self.summarize is None:
+            return kept
+        summary = self._summary_for(removed)
+        if not summary:
+            return kept
+        return [genai_types.Content(role="user", parts=[genai_types.Part(text=SUMMARY_PREFIX + summary)])] + kept
+
+    def _summary_for(self, removed: List[genai_types.Content]) -> Optional[str]:
+        previous = ""
+        if removed and is_summary(removed[0]):
+            previous = removed[0].parts[0].text[len(SUMMARY_PREFIX):]
+            removed = removed[1:]
+
+        key = hashlib.sha256(
+            json.dumps([previous, history_to_json(removed)], ensure_ascii=False, default=str).encode("utf-8")
+        ).hexdigest()
+        with self._lock:
+            if key in self._summaries:
+                self._summaries.move_to_end(key)
+                return self._summaries[key]
+        try:
+            summary = self.summarize(previous, removed)
+        except Exception as e:
+            logger.error(f"Conversation summary failed, dropping old turns instead: {e}")
+            return None
+        with self._lock:
+            self._summaries[key] = summary
+            if len(self._summaries) > SUMMARY_CACHE_SIZE:
+                self._summaries.popitem(last=False)
+        return summary
+
+
+context_manager = ContextManager(summarize=summarize_conversation if CONTEXT_SUMMARY_ENABLED else None)
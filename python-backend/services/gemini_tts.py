@@ -0,0 +1,152 @@
+import asyncio
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterator, List, Optional
+
+from google.genai import types
+
+from config import (
+    GEMINI_TTS_VOICE,
+    GEMINI_TTS_CHUNK_MAX_CHARS,
+    GEMINI_TTS_FIRST_CHUNK_MAX_CHARS,
+    GEMINI_TTS_PARALLELISM,
+    GEMINI_TTS_WORKER_THREADS,
+)
+from services.tts_cache import tts_cache
+from utils.audio_encoding import AudioFormat, encode_wav
+from utils.audio_utils import pcm_to_wav, wav_to_pcm
+from utils.model_utils import client as genai_client
+from utils.text_segmenter import SentenceSegmenter
+
+logger = logging.getLogger(__name__)
+
+GEMINI_TTS_MODEL = "gemini-2.5-flash-preview-tts"
+# The model returns 16-bit little-endian mono PCM at this rate
+GEMINI_TTS_SAMPLE_RATE = 24000
+
+
+class GeminiTTS:
+    """
+    Gemini text-to-speech for whole answers.
+
+    Text is split at sentence boundaries into chunks of up to `chunk_chars` characters (the
+    first one up to `first_chunk_chars`, so playback can start early). Up to `parallelism`
+    chunks of one text are synthesized at once on a process-wide pool, and their audio is
+    delivered strictly in text order as soon as each chunk and everything before it is done.
+    Every chunk is cached in `tts_cache` on its own.
+
+    Args:
+        chunk_chars (int): Maximum characters per chunk; longer single sentences are split.
+        first_chunk_chars (int): Maximum characters of the first chunk.
+        parallelism (int): Chunks of one text synthesized concurrently.
+        worker_threads (int): Gemini TTS calls in flight across all requests.
+    """
+
+    def __init__(
+        self,
+        chunk_chars: int = GEMINI_TTS_CHUNK_MAX_CHARS,
+        first_chunk_chars: int = GEMINI_TTS_FIRST_CHUNK_MAX_CHARS,
+        parallelism: int = GEMINI_TTS_PARALLELISM,
+        worker_threads: int = GEMINI_TTS_WORKER_THREADS,
+    ):
+        self.chunk_chars = chunk_chars
+        self.first_chunk_chars = min(first_chunk_chars, chunk_chars)
+        self.parallelism = max(1, parallelism)
+        self.worker_threads = worker_threads
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def split_text(self, text: str, lang: str = "id") -> List[str]:
+        """Splits text into synthesis chunks of whole sentences."""
+        segmenter = SentenceSegmenter(lang, max_chars=self.chunk_chars)
+        sentences = segmenter.feed(text) + segmenter.flush()
+        chunks = []
+        current = ""
+        for sentence in sentences:
+            limit = self.chunk_chars if chunks else self.first_chunk_chars
+            if current and len(current) + 1 + len(sentence) > limit:
+                chunks.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            chunks.append(current)
+        return chunks
+
+    def synthesize_pcm(self, text: str, voice: str = GEMINI_TTS_VOICE) -> bytes:
+        """Synthesizes one chunk (cached). Returns empty bytes if the model returned no audio."""
+        key = tts_cache.make_key("gemini", voice, GEMINI_TTS_SAMPLE_RATE, text)
+        wav_data = tts_cache.get_or_compute(key, lambda: pcm_to_wav(self._generate(text, voice), GEMINI_TTS_SAMPLE_RATE))
+        return wav_to_pcm(wav_data)[0]
+
+    def iter_pcm(self, text: str, voice: str = GEMINI_TTS_VOICE, lang: str = "id") -> Iterator[bytes]:
+        """Blocking generator of the PCM of every chunk, in order."""
+        pending = deque()
+        try:
+            for chunk in self.split_text(text, lang):
+                pending.append(self._get_executor().submit(self.synthesize_pcm, chunk, voice))
+                if len(pending) >= self.parallelism:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for job in pending:
+                job.cancel()
+
+    async def stream_pcm(self, text: str, voice: str = GEMINI_TTS_VOICE, lang: str = "id") -> AsyncIterator[bytes]:
+        """Async generator of the PCM of every chunk, in order."""
+        pending = deque()
+
+        def start(chunk: str) -> asyncio.Future:
+            return asyncio.wrap_future(self._get_executor().submit(self.synthesize_pcm, chunk, voice))
+
+        try:
+            for chunk in self.split_text(text, lang):
+                pending.append(start(chunk))
+                if len(pending) >= self.parallelism:
+                    yield await pending.popleft()
+            while pending:
+                yield await pending.popleft()
+        finally:
+            for job in pending:
+                job.cancel()
+
+    def synthesize_wav(self, text: str, voice: str = GEMINI_TTS_VOICE, lang: str = "id") -> bytes:
+        """Synthesizes the whole text into one WAV. Returns empty bytes if there was no audio."""
+        pcm_data = b"".join(self.iter_pcm(text, voice, lang))
+        if not pcm_data:
+            logger.warning("TTS generation succeeded but returned no audio data.")
+            return b""
+        return pcm_to_wav(pcm_data, GEMINI_TTS_SAMPLE_RATE)
+
+    def synthesize_audio(self, text: str, audio_format: AudioFormat, voice: str = GEMINI_TTS_VOICE, lang: str = "id") -> bytes:
+        """Like synthesize_wav, encoded in the client's output format."""
+        return encode_wav(self.synthesize_wav(text, voice, lang), audio_format)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.worker_threads, thread_name_prefix="gemini-tts")
+        return self._executor
+
+    def _generate(self, text: str, voice: str) -> bytes:
+        tts_config = types.GenerateContentConfig(
+            response_modalities=["audio"],
+            speech_config=types.SpeechConfig(
+                voice_config=types.VoiceConfig(
+                    prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=voice)
+                )
+            )
+        )
+        tts_result = genai_client.models.generate_content(model=GEMINI_TTS_MODEL, contents=text, config=tts_config)
+        if tts_result.candidates and tts_result.candidates[0].content.parts and tts_result.candidates[0].content.parts[0].inline_data:
+            return tts_result.candidates[0].content.parts[0].inline_data.data
+        logger.warning(f"Gemini TTS returned no audio for a chunk of {len(text)} chars")
+        return b""
+
+
+gemini_tts = GeminiTTS()
@@ -0,0 +1,208 @@
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from postgrest import APIError
+
+from config import (
+    MESSAGE_BATCH_SIZE,
+    MESSAGE_FLUSH_INTERVAL,
+    MESSAGE_MAX_RETRIES,
+    MESSAGE_RETRY_BACKOFF,
+    MESSAGE_QUEUE_MAX,
+)
+from database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+
+def _is_rejection(error: APIError) -> bool:
+    """Data and integrity errors (SQLSTATE classes 22/23, e.g. a deleted session) fail again on retry."""
+    return str(getattr(error, "code", "") or "")[:2] in ("22", "23")
+
+
+class MessageWriter:
+    """
+    Write-behind queue for `chat_messages`, so persisting a message never waits for Supabase
+    on the request path.
+
+    Messages are written by one background thread in bulk inserts of up to `batch_size` rows,
+    once a batch is full or its oldest message has waited `flush_interval` seconds. A batch
+    that fails is retried with exponential backoff before anything queued after it is
+    written, so messages reach the database in the order they were submitted. Rows the
+    database rejects are retried one by one, so one bad row does not take its batch down.
+
+    `created_at` is stamped when a message is submitted (strictly increasing per process),
+    because every row of a bulk insert would otherwise get the same default timestamp.
+
+    Args:
+        db_factory (Callable): Returns the Supabase client to write with.
+        batch_size (int): Maximum rows per insert.
+        flush_interval (float): Maximum seconds a message waits for its batch to fill.
+        max_retries (int): Retries of a failed batch before it is dropped.
+        retry_backoff (float): Delay before the first retry; doubled for each further one.
+        max_queue (int): Queued messages before `submit` starts dropping new ones.
+    """
+
+    def __init__(
+        self,
+        db_factory: Callable[[], Any] = get_db_connection,
+        batch_size: int = MESSAGE_BATCH_SIZE,
+        flush_interval: float = MESSAGE_FLUSH_INTERVAL,
+        max_retries: int = MESSAGE_MAX_RETRIES,
+        retry_backoff: float = MESSAGE_RETRY_BACKOFF,
+        max_queue: int = MESSAGE_QUEUE_MAX,
+    ):
+        self.db_factory = db_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_queue = max_queue
+        self._queue: "deque[tuple]" = deque()
+        # The batch the writer thread is inserting right now
+        self._writing: List[dict] = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+        self._flushes = 0
+        self._submitted = 0
+        self._completed = 0
+        self._last_timestamp = 0.0
+        self.written = 0
+        self.batches = 0
+        self.retries = 0
+        self.dropped = 0
+
+    def submit(self, session_id: str, role: str, content: str) -> datetime:
+        """
+        Queues a message for insertion and returns its `created_at`. Never blocks, as it is
+        called from the event loop: while the queue is full the message is dropped instead.
+        """
+        with self._cond:
+            # Strictly increasing, so ordering by created_at matches submission order
+            timestamp = max(time.time(), self._last_timestamp + 1e-6)
+            self._last_timestamp = timestamp
+            created_at = datetime.fromtimestamp(timestamp, timezone.utc)
+            row = {
+                "session_id": session_id,
+                "role": role,
+                "content": content,
+                "created_at": created_at.isoformat(),
+            }
+            if not self._stopped and len(self._queue) >= self.max_queue:
+                self.dropped += 1
+                logger.warning(f"Chat message queue is full ({self.max_queue}); dropping a {role} message for session {session_id}")
+                return created_at
+            if not self._stopped:
+                self._queue.append((time.monotonic(), row))
+                self._submitted += 1
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="message-writer", daemon=True)
+                    self._thread.start()
+                self._cond.notify_all()
+                return created_at
+        # After shutdown there is no writer thread left; write inline
+        self._write([row])
+        return created_at
+
+    def pending(self, session_id: str) -> List[dict]:
+        """Rows of a session that are queued or being written, in submission order."""
+        with self._cond:
+            rows = self._writing + [row for _, row in self._queue]
+        return [row for row in rows if row["session_id"] == session_id]
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until every message submitted so far is written (or dropped). False on timeout."""
+        with self._cond:
+            target = self._submitted
+            self._flushes += 1
+            self._cond.notify_all()
+            try:
+                return self._cond.wait_for(lambda: self._completed >= target, timeout)
+            finally:
+                self._flushes -= 1
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """Writes out the queue and stops the writer thread. False if messages were left unwritten."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        with self._cond:
+            if self._queue:
+                logger.error(f"{len(self._queue)} chat messages were not written before shutdown")
+        return flushed
+
+    def stats(self) -> Dict[str, int]:
+        with self._cond:
+            return {
+                "queued": len(self._queue),
+                "written": self.written,
+                "batches": self.batches,
+                "retries": self.retries,
+                "dropped": self.dropped,
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._queue and not self._stopped:
+                    self._cond.wait()
+                if not self._queue:
+                    return
+                # Let the batch fill up until its oldest message is due
+                deadline = self._queue[0][0] + self.flush_interval
+                while len(self._queue) < self.batch_size and not self._flushes and not self._stopped:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = [self._queue.popleft()[1] for _ in range(min(self.batch_size, len(self._queue)))]
+                self._writing = batch
+            try:
+                self._write(batch)
+            finally:
+                with self._cond:
+                    self._writing = []
+                    self._completed += len(batch)
+                    self._cond.notify_all()
+
+    def _write(self, rows: List[dict]) -> None:
+        error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.retries += 1
+                time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            try:
+                self.db_factory().table('chat_messages').insert(rows).execute()
+                self.written += len(rows)
+                self.batches += 1
+                return
+            except APIError as e:
+                if not _is_rejection(e):
+                    error = e
+                    logger.warning(f"Writing {len(rows)} chat messages failed (attempt {attempt + 1}): {e.message}")
+                    continue
+                if len(rows) > 1:
+                    for row in rows:
+                        self._write([row])
+                    return
+                logger.error(f"Chat message for session {rows[0]['session_id']} was rejected: {e.message}")
+                self.dropped += 1
+                return
+            except Exception as e:
+                error = e
+                logger.warning(f"Writing {len(rows)} chat messages failed (attempt {attempt + 1}): {e}")
+        logger.error(f"Dropping {len(rows)} chat messages after {self.max_retries} retries: {error}")
+        self.dropped += len(rows)
+
+
+message_writer = MessageWriter()
@@ -0,0 +1,185 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from google.genai import types as genai_types
+
+from config import (
+    PROMPT_CACHE_ENABLED,
+    PROMPT_CACHE_MIN_TOKENS,
+    PROMPT_CACHE_REFRESH_TOKENS,
+    PROMPT_CACHE_TTL,
+    PROMPT_CACHE_MAX_ENTRIES,
+)
+from services.context_manager import estimate_history_tokens
+from utils.history_utils import history_to_json
+from utils.model_utils import CHAT_MODEL, client
+
+logger = logging.getLogger(__name__)
+
+# A cache is not used in the last minute of its lifetime, so it cannot expire mid-request
+EXPIRY_MARGIN = 60
+
+
+def _fingerprint(system_instruction: Optional[str], history: List[genai_types.Content]) -> str:
+    payload = json.dumps([system_instruction, history_to_json(history)], ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _CachedPrefix:
+    def __init__(self, name: str, length: int, fingerprint: str, tokens: int, expires_at: float):
+        self.name = name
+        self.length = length
+        self.fingerprint = fingerprint
+        self.tokens = tokens
+        self.expires_at = expires_at
+
+
+class PromptPrefixCache:
+    """
+    Gemini explicit context caches for the stable prefix of long conversations: the system
+    instruction plus the history up to the previous turn. A turn whose history still starts
+    with the cached prefix only sends the new messages and references the cache, so the model
+    does not re-process the persona and older history every turn.
+
+    Caches are created off the request path (`refresh`, after a turn) and only once the
+    prefix is large enough to be worth it; a changed prefix (e.g. after the context manager
+    compacted the history, or another reply language) simply falls back to a normal request.
+
+    Args:
+        enabled (bool): When False, `request` always returns the full history.
+        min_tokens (int): Smallest estimated prefix that is cached.
+        refresh_tokens (int): Uncached tokens after which the cache is rebuilt.
+        ttl (int): Cache lifetime in seconds.
+        max_entries (int): Conversations with a cache per worker.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = PROMPT_CACHE_ENABLED,
+        min_tokens: int = PROMPT_CACHE_MIN_TOKENS,
+        refresh_tokens: int = PROMPT_CACHE_REFRESH_TOKENS,
+        ttl: int = PROMPT_CACHE_TTL,
+        max_entries: int = PROMPT_CACHE_MAX_ENTRIES,
+        model: str = CHAT_MODEL,
+    ):
+        self.enabled = enabled
+        self.min_tokens = min_tokens
+        self.refresh_tokens = refresh_tokens
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.model = model
+        self._entries: "OrderedDict[str, _CachedPrefix]" = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.created = 0
+        self.failures = 0
+
+    def request(
+        self, key: str, history: List[genai_types.Content], config: genai_types.GenerateContentConfig
+    ) -> Tuple[List[genai_types.Content], genai_types.GenerateContentConfig]:
+        """
+        Returns the (contents, config) to send for a turn: either the uncached tail of the
+        history with a config referencing the cache, or `history` and `config` unchanged.
+        """
+        if not self.enabled:
+            return history, config
+        with self._lock:
+            entry = self._entries.get(key)
+        if (
+            entry is None
+            or entry.length >= len(history)
+            or time.time() > entry.expires_at - EXPIRY_MARGIN
+            or _fingerprint(config.system_instruction, history[:entry.length]) != entry.fingerprint
+        ):
+            self.misses += 1
+            return history, config
+        self.hits += 1
+        return history[entry.length:], genai_types.GenerateContentConfig(cached_content=entry.name)
+
+    def refresh(self, key: str, history: List[genai_types.Content], system_instruction: Optional[str]) -> None:
+        """
+        Caches `history` as the prefix of the next turn if it is large enough and the current
+        cache does not already cover most of it. Blocking; run it off the event loop.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            if key in self._refreshing:
+                return
+            entry = self._entries.get(key)
+            self._refreshing.add(key)
+        try:
+            instruction_tokens = len((system_instruction or "").encode("utf-8")) // 4
+            tokens = instruction_tokens + estimate_history_tokens(history)
+            if tokens < self.min_tokens:
+                return
+            if (
+                entry is not None
+                and time.time() < entry.expires_at - EXPIRY_MARGIN
+                and entry.length <= len(history)
+                and tokens - entry.tokens < self.refresh_tokens
+                and _fingerprint(system_instruction, history[:entry.length]) == entry.fingerprint
+            ):
+                return
+            try:
+                cached = client.caches.create(
+                    model=self.model,
+                    config=genai_types.CreateCachedContentConfig(
+                        contents=history,
+                        system_instruction=system_instruction,
+                        ttl=f"{self.ttl}s",
+                    ),
+                )
+            except Exception as e:
+                self.failures += 1
+                logger.error(f"Could not create a prompt cache for {key}: {e}")
+                return
+            self.created += 1
+            with self._lock:
+                self._entries[key] = _CachedPrefix(
+                    cached.name, len(history), _fingerprint(system_instruction, history), tokens, time.time() + self.ttl
+                )
+                self._entries.move_to_end(key)
+                evicted = []
+                while len(self._entries) > self.max_entries:
+                    evicted.append(self._entries.popitem(last=False)[1])
+            for old in ([entry] if entry is not None else []) + evicted:
+                self._delete(old.name)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+    def discard(self, key: str) -> None:
+        """Drops (and deletes) the cache of a conversation that ended. Blocking."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._delete(entry.name)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "created": self.created,
+                "failures": self.failures,
+            }
+
+    def _delete(self, name: str) -> None:
+        # Best effort: an undeleted cache still expires after its TTL
+        try:
+            client.caches.delete(name=name)
+        except Exception as e:
+            logger.warning(f"Could not delete prompt cache {name}: {e}")
+
+
+prompt_cache = PromptPrefixCache()
@@ -0,0 +1,115 @@
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from google.genai import types as genai_types
+
+from config import PERSONA_RELOAD_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+PERSONA_DIR = os.path.join(os.path.dirname(__file__), '..', 'personas')
+
+# Languages of the voice call; an unknown language falls back to Indonesian
+LANGUAGE_NAMES = {'id': 'Indonesian', 'en': 'English', 'ja': 'Japanese'}
+DEFAULT_LANGUAGE = 'id'
+
+
+def language_instruction(lang: str) -> str:
+    """A clear, forceful reply-language instruction in the persona's primary language."""
+    lang_name = LANGUAGE_NAMES.get(lang, LANGUAGE_NAMES[DEFAULT_LANGUAGE])
+    return f"\n\nSANGAT PENTING: Pengguna berbicara dalam Bahasa {lang_name}. Balas HANYA dalam Bahasa {lang_name}."
+
+
+class Persona:
+    """One loaded persona file with its per-language prompts and generation configs."""
+
+    def __init__(self, name: str, text: Optional[str], mtime: Optional[float]):
+        self.name = name
+        self.text = text
+        self.mtime = mtime
+        self.checked_at = time.monotonic()
+        # Precomputed once per file version; the configs are shared and must not be modified
+        self.prompts: Dict[str, str] = {lang: (text or "") + language_instruction(lang) for lang in LANGUAGE_NAMES}
+        self.chat_configs: Dict[str, genai_types.GenerateContentConfig] = {
+            lang: genai_types.GenerateContentConfig(system_instruction=prompt) for lang, prompt in self.prompts.items()
+        }
+
+    def prompt(self, lang: Optional[str] = None) -> Optional[str]:
+        if lang is None:
+            return self.text
+        return self.prompts.get(lang, self.prompts[DEFAULT_LANGUAGE])
+
+
+class PromptRegistry:
+    """
+    Persona system prompts and the generation configs built from them, loaded once and shared
+    by every request instead of being read from disk per request or per voice-call turn.
+
+    A persona file is re-checked (by mtime) at most every `reload_interval` seconds, so edits
+    are picked up without a restart.
+
+    Args:
+        persona_dir (str): Directory holding `<name>.txt` persona files.
+        reload_interval (float): Minimum seconds between mtime checks of a persona file.
+    """
+
+    def __init__(self, persona_dir: str = PERSONA_DIR, reload_interval: float = PERSONA_RELOAD_INTERVAL):
+        self.persona_dir = persona_dir
+        self.reload_interval = reload_interval
+        self._personas: Dict[str, Persona] = {}
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def system_prompt(self, name: str = "aria", lang: Optional[str] = None) -> Optional[str]:
+        """The persona prompt, with the reply-language instruction appended if `lang` is given."""
+        return self._persona(name).prompt(lang)
+
+    def chat_config(self, name: str = "aria", lang: str = DEFAULT_LANGUAGE) -> genai_types.GenerateContentConfig:
+        """Plain chat config (system instruction only) for the voice call."""
+        persona = self._persona(name)
+        return persona.chat_configs.get(lang, persona.chat_configs[DEFAULT_LANGUAGE])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"personas": sorted(self._personas), "reloads": self.reloads}
+
+    def _persona(self, name: str) -> Persona:
+        now = time.monotonic()
+        persona = self._personas.get(name)
+        if persona is not None and now - persona.checked_at < self.reload_interval:
+            return persona
+
+        path = os.path.join(self.persona_dir, f'{name}.txt')
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            mtime = None
+        if persona is not None and persona.mtime == mtime:
+            persona.checked_at = now
+            return persona
+
+        with self._lock:
+            current = self._personas.get(name)
+            if current is not persona and current is not None:
+                # Another thread reloaded it meanwhile
+                return current
+            text = None
+            if mtime is not None:
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        text = f.read()
+                except OSError as e:
+                    logger.error(f"Could not read persona '{name}': {e}")
+            elif persona is None:
+                logger.warning(f"Persona file not found: {path}")
+            if persona is not None:
+                self.reloads += 1
+                logger.info(f"Persona '{name}' changed on disk, reloaded")
+            self._personas[name] = Persona(name, text, mtime)
+            return self._personas[name]
+
+
+prompt_registry = PromptRegistry()
@@ -0,0 +1,270 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from google.genai import types as genai_types
+
+from config import SESSION_STORE_MAX_SESSIONS
+from services.context_manager import context_manager, estimate_history_tokens, estimate_tokens
+from services.message_writer import message_writer
+from utils.history_utils import history_from_json, text_content
+
+logger = logging.getLogger(__name__)
+
+
+class CachedChat:
+    """A chat's history as held by a session backend, with what the store tracks about it."""
+
+    def __init__(self, history: List[genai_types.Content], watermark: Optional[datetime], tokens: Optional[int] = None):
+        self.history = history
+        # Newest persisted message the history includes; None if nothing is persisted yet
+        self.watermark = watermark
+        self.tokens = estimate_history_tokens(history) if tokens is None else tokens
+
+
+class SessionBackend:
+    """
+    Where a SessionStore keeps cached chats. The default, InProcessSessionBackend, is an LRU
+    per worker; an implementation backed by shared storage (e.g. Redis) makes every worker
+    see the same copy. Entries are replaced as a whole and never modified in place.
+    """
+
+    def get(self, chat_id: str) -> Optional[CachedChat]:
+        raise NotImplementedError
+
+    def set(self, chat_id: str, chat: CachedChat) -> None:
+        raise NotImplementedError
+
+    def invalidate(self, chat_id: str) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class InProcessSessionBackend(SessionBackend):
+    """
+    Cached chats in an in-process LRU.
+
+    Args:
+        max_sessions (int): Chats kept in memory; the least recently used one is dropped first.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_STORE_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._chats: "OrderedDict[str, CachedChat]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, chat_id: str) -> Optional[CachedChat]:
+        with self._lock:
+            chat = self._chats.get(chat_id)
+            if chat is not None:
+                self._chats.move_to_end(chat_id)
+            return chat
+
+    def set(self, chat_id: str, chat: CachedChat) -> None:
+        with self._lock:
+            self._chats[chat_id] = chat
+            self._chats.move_to_end(chat_id)
+            while len(self._chats) > self.max_sessions:
+                self._chats.popitem(last=False)
+
+    def invalidate(self, chat_id: str) -> None:
+        with self._lock:
+            self._chats.pop(chat_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            tokens = [chat.tokens for chat in self._chats.values()]
+        return {
+            "sessions": len(tokens),
+            "max_sessions": self.max_sessions,
+            "estimated_tokens": sum(tokens),
+            "largest_session_tokens": max(tokens, default=0),
+        }
+
+
+class SessionStore:
+    """
+    Server-side conversation history per chat_id, so a turn only has to carry the new message.
+
+    Histories are kept in a session backend, by default an in-process LRU. A chat that is not
+    cached is rebuilt lazily from its `chat_messages` rows, plus the messages of the chat this
+    worker has queued in `message_writer` but not written yet. Messages are appended as they
+    are persisted (see `api.chat_history.insert_message`), which keeps the store in step with
+    the database.
+
+    With a per-worker backend, each chat also remembers the newest `created_at` it reflects.
+    Before a cached history is used, the newest message of the chat in the database is looked
+    up (one indexed row); if another worker has persisted a message since, the chat is rebuilt
+    from the database. Messages this worker has queued but not yet written carry newer
+    timestamps, so they never make the local copy look stale.
+
+    Every turn's history goes through the context manager, and the compacted history replaces
+    the stored one, so a long-running chat stays bounded in both prompt size and memory.
+    Estimated tokens are tracked per chat for /health.
+
+    Args:
+        max_sessions (int): Chats kept by the default in-process backend.
+        backend (SessionBackend): Where cached chats are kept; an InProcessSessionBackend if None.
+    """
+
+    def __init__(self, max_sessions: int = SESSION_STORE_MAX_SESSIONS, backend: Optional[SessionBackend] = None):
+        self.backend = backend or InProcessSessionBackend(max_sessions)
+        # Serializes read-modify-write of a chat's entry within this worker
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.hydrations = 0
+        self.stale = 0
+
+    def history_for_turn(self, chat_id: Optional[str], client_history: Optional[list] = None, db=None) -> List[genai_types.Content]:
+        """
+        Returns the history a new turn builds on.
+
+        A history sent by the client (older clients) wins and replaces the stored one;
+        otherwise the stored history for `chat_id` is used, hydrating it on first access.
+        Either way it is fitted to the context budget. The returned list is a copy the
+        caller may extend.
+        """
+        if client_history is not None:
+            history = context_manager.fit(history_from_json(client_history))
+            if chat_id:
+                # The client's history includes everything persisted up to now
+                self.set_history(chat_id, list(history), persisted_at=datetime.now(timezone.utc))
+            return history
+        if not chat_id:
+            return []
+        history = self.get(chat_id, db)
+        fitted = context_manager.fit(history)
+        if len(fitted) != len(history) or any(a is not b for a, b in zip(fitted, history)):
+            self._replace(chat_id, len(history), fitted)
+        return list(fitted)
+
+    def get(self, chat_id: str, db=None) -> List[genai_types.Content]:
+        """
+        The history of a chat. With `db`, a cached history is first checked against the
+        newest message in the database and rebuilt if another worker has added to the chat.
+        """
+        chat = self.backend.get(chat_id)
+        if chat is not None and db is not None and self._changed_since(chat_id, chat.watermark, db):
+            with self._lock:
+                self.stale += 1
+            self.backend.invalidate(chat_id)
+            chat = None
+        if chat is not None:
+            with self._lock:
+                self.hits += 1
+            return list(chat.history)
+
+        loaded = self._hydrate(chat_id, db)
+        if loaded is None:
+            # Storage is unreachable; answer without history but retry on the next turn
+            return []
+        history, newest = loaded
+        with self._lock:
+            # Another request may have hydrated the chat meanwhile; keep the first copy
+            chat = self.backend.get(chat_id)
+            if chat is None:
+                chat = CachedChat(history, newest)
+                self.backend.set(chat_id, chat)
+        return list(chat.history)
+
+    def append(self, chat_id: str, *contents: genai_types.Content, persisted_at: Optional[datetime] = None) -> None:
+        """
+        Appends entries to a chat that is cached. A chat that is not cached is left alone: it
+        will be rebuilt from storage, which already holds (or has queued) these messages.
+
+        Args:
+            persisted_at (datetime): `created_at` of the message row written for the entries.
+        """
+        with self._lock:
+            chat = self.backend.get(chat_id)
+            if chat is None:
+                return
+            tokens = chat.tokens + sum(estimate_tokens(content) for content in contents)
+            self.backend.set(chat_id, CachedChat(chat.history + list(contents), _later(chat.watermark, persisted_at), tokens))
+
+    def append_text(self, chat_id: str, role: str, text: str, persisted_at: Optional[datetime] = None) -> None:
+        self.append(chat_id, text_content(role, text), persisted_at=persisted_at)
+
+    def set_history(self, chat_id: str, history: List[genai_types.Content], persisted_at: Optional[datetime] = None) -> None:
+        """Replaces the stored history of a chat, e.g. with a compacted one."""
+        with self._lock:
+            chat = self.backend.get(chat_id)
+            watermark = chat.watermark if chat is not None else None
+            self.backend.set(chat_id, CachedChat(history, _later(watermark, persisted_at)))
+
+    def usage(self, chat_id: str) -> int:
+        """Estimated tokens held for a chat (0 if it is not cached)."""
+        chat = self.backend.get(chat_id)
+        return chat.tokens if chat is not None else 0
+
+    def invalidate(self, chat_id: str) -> None:
+        self.backend.invalidate(chat_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = {"hits": self.hits, "hydrations": self.hydrations, "stale": self.stale}
+        return {**self.backend.stats(), **counters}
+
+    def _replace(self, chat_id: str, expected_length: int, history: List[genai_types.Content]) -> None:
+        """Stores a compacted history unless the chat changed since it was read."""
+        with self._lock:
+            chat = self.backend.get(chat_id)
+            if chat is None or len(chat.history) != expected_length:
+                return
+            self.backend.set(chat_id, CachedChat(list(history), chat.watermark))
+
+    def _changed_since(self, chat_id: str, watermark: Optional[datetime], db) -> bool:
+        """Whether the database holds a message of the chat newer than `watermark`."""
+        try:
+            response = (
+                db.table('chat_messages').select("created_at").eq('session_id', chat_id)
+                .order("created_at", desc=True).limit(1).execute()
+            )
+        except Exception as e:
+            # Keep serving the cached copy; it is checked again on the next turn
+            logger.warning(f"Could not check history of chat {chat_id} for changes: {e}")
+            return False
+        newest = _parse_timestamp(response.data[0]["created_at"]) if response.data else None
+        return newest is not None and (watermark is None or newest > watermark)
+
+    def _hydrate(self, chat_id: str, db) -> Optional[Tuple[List[genai_types.Content], Optional[datetime]]]:
+        with self._lock:
+            self.hydrations += 1
+        if db is None:
+            return [], None
+        try:
+            response = (
+                db.table('chat_messages').select("role, content, created_at").eq('session_id', chat_id)
+                .order("created_at", desc=False).execute()
+            )
+            rows = response.data or []
+        except Exception as e:
+            logger.error(f"Could not load history for chat {chat_id}: {e}")
+            return None
+        newest = _parse_timestamp(rows[-1]["created_at"]) if rows else None
+        # Messages this worker has queued are not in the database yet (or were written while
+        # it was read); add the ones missing, in created_at order
+        written = {_parse_timestamp(row["created_at"]) for row in rows}
+        queued = [row for row in message_writer.pending(chat_id) if _parse_timestamp(row["created_at"]) not in written]
+        if queued:
+            rows = sorted(rows + queued, key=lambda row: _parse_timestamp(row["created_at"]))
+        return [text_content(row["role"], row["content"]) for row in rows], newest
+
+
+def _later(current: Optional[datetime], persisted_at: Optional[datetime]) -> Optional[datetime]:
+    if persisted_at is not None and (current is None or persisted_at > current):
+        return persisted_at
+    return current
+
+
+def _parse_timestamp(value: str) -> datetime:
+    """Parses a `created_at` as PostgREST returns it (ISO 8601, possibly with a trailing Z)."""
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+session_store = SessionStore()
@@ -0,0 +1,254 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from config import TTS_CACHE_MEMORY_MAX_BYTES, TTS_CACHE_DIR, TTS_CACHE_DISK_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+# A WAV header with no frames is 44 bytes; anything at or below that carries no audio
+MIN_CACHEABLE_BYTES = 45
+
+
+def normalize_text(text: str) -> str:
+    """Normalizes text so trivially different spellings of a sentence share a cache entry."""
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class TTSCache:
+    """
+    Two-tier, content-addressed cache for synthesized audio.
+
+    Entries are keyed by engine, voice/speaker, sample rate and normalized text. The
+    first tier is a bounded in-memory LRU; the second is an on-disk store that survives
+    restarts and is shared by every worker on the host. Concurrent requests for the same
+    key are coalesced so the audio is only synthesized once.
+
+    Each worker keeps an index of the disk tier, but the directory is the source of truth:
+    a key missing from the index is still looked up on disk (another worker may have
+    written it), disk hits refresh the file's mtime, and after every `disk_max_bytes / 8`
+    written the index is rebuilt from a directory scan, so the cap holds for the files of
+    all workers together, evicting the least recently used by mtime. Between scans the
+    directory can exceed the cap by up to `disk_max_bytes / 8` per worker.
+
+    The cache is thread-safe: it is used both from the TTS thread pool and from request handlers.
+    """
+
+    def __init__(self, memory_max_bytes: int, disk_dir: Optional[str], disk_max_bytes: int):
+        self.memory_max_bytes = memory_max_bytes
+        self.disk_dir = disk_dir if disk_dir and disk_max_bytes > 0 else None
+        self.disk_max_bytes = disk_max_bytes
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._written_since_scan = 0
+        self._in_flight: dict = {}
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+        if self.disk_dir:
+            self._scan_disk()
+
+    @staticmethod
+    def make_key(engine: str, voice: str, sample_rate: int, text: str) -> str:
+        material = "\x1f".join([engine, str(voice), str(sample_rate), normalize_text(text)])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Returns cached audio for a key, or None on a miss in both tiers."""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return data
+        if self.disk_dir:
+            data = self._read_disk(key)
+            if data is not None:
+                with self._lock:
+                    self._counters["disk_hits"] += 1
+                    self._store_memory(key, data)
+                return data
+        return None
+
+    def put(self, key: str, data: bytes) -> None:
+        if len(data) < MIN_CACHEABLE_BYTES:
+            return
+        with self._lock:
+            self._store_memory(key, data)
+        if self.disk_dir:
+            self._write_disk(key, data)
+
+    def get_or_compute(self, key: str, compute: Callable[[], bytes]) -> bytes:
+        """
+        Returns cached audio for a key, computing and storing it on a miss.
+
+        If another thread is already computing the same key, waits for its result
+        instead of synthesizing a second time.
+        """
+        data = self.get(key)
+        if data is not None:
+            return data
+
+        with self._lock:
+            # An owner that finished after the miss above has stored the audio and left _in_flight
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._counters["memory_hits"] += 1
+                return data
+            pending = self._in_flight.get(key)
+            if pending is None:
+                pending = Future()
+                self._in_flight[key] = pending
+                self._counters["misses"] += 1
+                owner = True
+            else:
+                self._counters["coalesced"] += 1
+                owner = False
+
+        if not owner:
+            return pending.result()
+
+        try:
+            data = compute()
+            self.put(key, data)
+            pending.set_result(data)
+            return data
+        except BaseException as e:
+            pending.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                **self._counters,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "memory_max_bytes": self.memory_max_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "disk_max_bytes": self.disk_max_bytes if self.disk_dir else 0,
+            }
+
+    # --- Memory tier (caller holds the lock) ---
+
+    def _store_memory(self, key: str, data: bytes) -> None:
+        if len(data) > self.memory_max_bytes:
+            return
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_bytes -= len(previous)
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.memory_max_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._counters["memory_evictions"] += 1
+
+    # --- Disk tier ---
+
+    def _path_for(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}.wav")
+
+    def _scan_disk(self) -> None:
+        """Rebuilds the index from the cache files of every worker, least recently used first, and evicts down to the cap."""
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if not name.endswith(".wav"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, name[:-4], st.st_size))
+        with self._lock:
+            self._disk.clear()
+            self._disk_bytes = 0
+            for _, key, size in sorted(entries):
+                self._disk[key] = size
+                self._disk_bytes += size
+            self._written_since_scan = 0
+            self._evict_disk()
+
+    def _read_disk(self, key: str) -> Optional[bytes]:
+        path = self._path_for(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                size = self._disk.pop(key, None)
+                if size is not None:
+                    self._disk_bytes -= size
+            return None
+        try:
+            # Other workers evict by mtime, so mark the entry as recently used for them too
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            previous = self._disk.pop(key, None)
+            if previous is not None:
+                self._disk_bytes -= previous
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+        return data
+
+    def _write_disk(self, key: str, data: bytes) -> None:
+        if len(data) > self.disk_max_bytes:
+            return
+        path = self._path_for(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write to a temp file and rename so readers never see a partial entry
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"Could not write TTS cache entry {key}: {e}")
+            return
+        with self._lock:
+            previous = self._disk.pop(key, None)
+            if previous is not None:
+                self._disk_bytes -= previous
+            self._disk[key] = len(data)
+            self._disk_bytes += len(data)
+            self._written_since_scan += len(data)
+            rescan = self._written_since_scan > self.disk_max_bytes // 8
+            self._evict_disk()
+        if rescan:
+            self._scan_disk()
+
+    def _evict_disk(self) -> None:
+        """Removes the least recently used files until the disk tier fits its cap. Caller holds the lock."""
+        while self._disk_bytes > self.disk_max_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self._counters["disk_evictions"] += 1
+            try:
+                os.remove(self._path_for(key))
+            except OSError:
+                pass
+
+
+tts_cache = TTSCache(TTS_CACHE_MEMORY_MAX_BYTES, TTS_CACHE_DIR, TTS_CACHE_DISK_MAX_BYTES)
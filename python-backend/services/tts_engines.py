@@ -0,0 +1,289 @@
+import io
+import logging
+import os
+import threading
+import time
+import wave
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from config import TTS_ENABLED_ENGINES
+from utils.audio_postprocess import tts_postprocessor
+from utils.audio_utils import pcm_to_wav
+
+logger = logging.getLogger(__name__)
+
+backend_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# --- Model locations ---
+PIPER_MODEL_EN_ONNX = os.path.join(backend_dir, "datasetsANDmodels/piper-en/en_US-lessac-high.onnx")
+PIPER_MODEL_EN_JSON = os.path.join(backend_dir, "datasetsANDmodels/piper-en/en_US-lessac-high.onnx.json")
+MODEL_DIR_ID = os.path.join(backend_dir, "datasetsANDmodels/indonesian-tts")
+COQUI_SPEAKER_ID = "wibowo"
+
+# Engine states reported by /health
+IDLE = "idle"          # enabled, not loaded yet
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"      # load raised; the engine stays unavailable until restart
+DISABLED = "disabled"  # not listed in TTS_ENABLED_ENGINES
+
+# os.chdir affects the whole process, so directory-relative model loads must not overlap
+_chdir_lock = threading.Lock()
+
+
+class CoquiEngine:
+    """The Indonesian voice: a G2P front-end feeding a Coqui synthesizer."""
+
+    def __init__(self, g2p, synthesizer):
+        self.g2p = g2p
+        self.synthesizer = synthesizer
+
+    @property
+    def sample_rate(self) -> int:
+        return self.synthesizer.tts_config.audio['sample_rate']
+
+
+def load_piper_en():
+    """Loads the English Piper voice. The piper package is only imported here."""
+    from piper import PiperVoice
+
+    if not (os.path.exists(PIPER_MODEL_EN_ONNX) and os.path.exists(PIPER_MODEL_EN_JSON)):
+        raise FileNotFoundError(f"Piper model or config missing under {os.path.dirname(PIPER_MODEL_EN_ONNX)}")
+    return PiperVoice.load(PIPER_MODEL_EN_ONNX, config_path=PIPER_MODEL_EN_JSON)
+
+
+def load_coqui_id() -> CoquiEngine:
+    """Loads G2P and the Indonesian Coqui model. TTS and g2p_id are only imported here."""
+    from g2p_id import G2P
+    from TTS.utils.synthesizer import Synthesizer
+
+    if not os.path.exists(MODEL_DIR_ID):
+        raise FileNotFoundError(f"Indonesian model directory not found at {MODEL_DIR_ID}")
+
+    g2p = G2P()
+    # Paths inside the model's config.json are relative to the model directory
+    with _chdir_lock:
+        original_cwd = os.getcwd()
+        try:
+            os.chdir(MODEL_DIR_ID)
+            synthesizer = Synthesizer(
+                tts_checkpoint="checkpoint_1260000-inference.pth",
+                tts_config_path="config.json",
+                use_cuda=False,
+            )
+        finally:
+            os.chdir(original_cwd)
+    return CoquiEngine(g2p, synthesizer)
+
+
+def load_voicevox():
+    """VOICEVOX runs as a separate server; the engine is the shared HTTP client."""
+    from services.voicevox_client import voicevox_client
+
+    return voicevox_client
+
+
+class TTSEngine:
+    """
+    One lazily loaded TTS engine.
+
+    The first `get()` loads the model (other callers wait for it); afterwards the loaded model
+    is returned directly. A failed load is not retried, so a missing model costs one attempt.
+    """
+
+    def __init__(self, name: str, loader: Callable[[], Any], enabled: bool = True):
+        self.name = name
+        self.loader = loader
+        self.enabled = enabled
+        self.state = IDLE if enabled else DISABLED
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self._model = None
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[Any]:
+        """Returns the loaded model, loading it first if needed. None if disabled or failed."""
+        if self.state == READY:
+            return self._model
+        if not self.enabled:
+            return None
+        with self._lock:
+            if self.state == IDLE:
+                self._load()
+            return self._model
+
+    def _load(self) -> None:
+        self.state = LOADING
+        started = time.perf_counter()
+        logger.info(f"Loading TTS engine '{self.name}'...")
+        try:
+            self._model = self.loader()
+            self.state = READY
+            logger.info(f"TTS engine '{self.name}' ready in {time.perf_counter() - started:.2f}s")
+        except Exception as e:
+            self.state = FAILED
+            self.error = str(e)
+            logger.error(f"Failed to load TTS engine '{self.name}': {e}")
+        finally:
+            self.load_seconds = round(time.perf_counter() - started, 3)
+
+    def status(self) -> dict:
+        return {"state": self.state, "load_seconds": self.load_seconds, "error": self.error}
+
+
+class TTSEngineRegistry:
+    """
+    Named TTS engines, each loaded on first use or by a background warm-up.
+
+    Args:
+        enabled (list[str]): Engine names this deployment uses; the others are never loaded.
+    """
+
+    def __init__(self, enabled: List[str]):
+        self.enabled = set(enabled)
+        self._engines: Dict[str, TTSEngine] = {}
+        self._warmup: Optional[threading.Thread] = None
+
+    def register(self, name: str, loader: Callable[[], Any]) -> None:
+        self._engines[name] = TTSEngine(name, loader, enabled=name in self.enabled)
+
+    def get(self, name: str) -> Optional[Any]:
+        """Returns the engine's model, loading it if needed. Blocking; call off the event loop."""
+        engine = self._engines.get(name)
+        return engine.get() if engine else None
+
+    def load_all(self) -> None:
+        """Loads every enabled engine in the calling thread."""
+        for engine in self._engines.values():
+            engine.get()
+
+    def start_warmup(self) -> None:
+        """Loads the enabled engines on a daemon thread so startup does not wait for them."""
+        if self._warmup is None:
+            self._warmup = threading.Thread(target=self.load_all, name="tts-warmup", daemon=True)
+            self._warmup.start()
+
+    def wait_for_warmup(self, timeout: Optional[float] = None) -> None:
+        """Blocks until the background warm-up (if started) has finished."""
+        if self._warmup is not None:
+            self._warmup.join(timeout)
+
+    def status(self) -> dict:
+        return {name: engine.status() for name, engine in self._engines.items()}
+
+
+tts_engines = TTSEngineRegistry(TTS_ENABLED_ENGINES)
+tts_engines.register("piper", load_piper_en)
+tts_engines.register("coqui", load_coqui_id)
+tts_engines.register("voicevox", load_voicevox)
+
+
+# --- Synthesis with the local models ---
+
+# Synthesis runs on a thread pool. The Coqui synthesizer and G2P keep per-call state, so
+# calls into them are serialized; Piper's ONNX session is thread-safe.
+coqui_lock = threading.Lock()
+
+
+def sanitize_text_for_tts(text: str) -> str:
+    text = text.lower()
+    allowed_chars = "abcdefghijklmnopqrstuvwxyz0123456789 .,?!"
+    return ''.join(filter(lambda char: char in allowed_chars, text))
+
+
+def _build_silent_wav() -> bytes:
+    """Builds a valid WAV file with no frames."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(22050)
+    return buffer.getvalue()
+
+
+SILENT_WAV = _build_silent_wav()
+
+
+def text_to_audio_coqui(text: str) -> bytes:
+    """Uses the Coqui TTS model from the engine registry for Indonesian text-to-speech."""
+    coqui = tts_engines.get("coqui")
+    if not coqui:
+        logger.warning("Indonesian synthesizer not available, skipping TTS.")
+        return b""
+
+    sanitized_text = sanitize_text_for_tts(text)
+    if not sanitized_text.strip():
+        return b""
+
+    try:
+        with coqui_lock:
+            phonemes = coqui.g2p(sanitized_text)
+            logger.debug(f"Coqui TTS (ID) - Sanitized: '{sanitized_text}' -> Phonemes: '{phonemes}'")
+            wav = coqui.synthesizer.tts(phonemes, speaker_name=COQUI_SPEAKER_ID, language="id")
+
+        if wav is None:
+            raise RuntimeError("Coqui TTS synthesis failed to produce audio.")
+
+        # The model's float output is trimmed, normalized and converted to 16-bit PCM in one pass
+        pcm_data = tts_postprocessor.process_float(np.asarray(wav, dtype=np.float32), coqui.sample_rate)
+        return pcm_to_wav(pcm_data, tts_postprocessor.output_rate(coqui.sample_rate)) if pcm_data else b""
+    except Exception as e:
+        logger.error(f"Coqui TTS failed for text '{text}': {e}")
+        # Return a silent audio chunk to prevent the frontend from getting stuck
+        return SILENT_WAV
+
+
+def text_to_audio_piper(text: str) -> bytes:
+    """Uses Piper TTS for English text-to-speech, returning WAV bytes."""
+    piper_voice_en = tts_engines.get("piper")
+    if not piper_voice_en:
+        logger.warning("Piper (EN) synthesizer not available, skipping TTS.")
+        return b""
+    try:
+        wav_buffer = io.BytesIO()
+        # synthesize_wav needs a wave file object, so the buffer is wrapped with wave.open()
+        with wave.open(wav_buffer, 'wb') as wav_file:
+            piper_voice_en.synthesize_wav(text, wav_file)
+        audio_data = tts_postprocessor.process_wav(wav_buffer.getvalue())
+        logger.debug(f"Piper TTS (EN) - Synthesized {len(audio_data)} bytes for '{text}'")
+        return audio_data
+    except Exception as e:
+        logger.error(f"Piper TTS failed for text '{text}': {e}", exc_info=True)
+        return b""
+
+
+def stream_audio_piper(text: str) -> Iterator[bytes]:
+    """
+    Yields raw 16-bit PCM from Piper as each internal chunk is synthesized. A failure midway is
+    logged and re-raised, so callers can tell a truncated sentence from a complete one.
+    """
+    piper_voice_en = tts_engines.get("piper")
+    if not piper_voice_en:
+        logger.warning("Piper (EN) synthesizer not available, skipping TTS.")
+        return
+    try:
+        postprocessor = tts_postprocessor.stream(piper_voice_en.config.sample_rate)
+        for chunk in piper_voice_en.synthesize(text):
+            frame = postprocessor.feed(chunk.audio_int16_bytes)
+            if frame:
+                yield frame
+    except Exception as e:
+        logger.error(f"Piper TTS streaming failed for text '{text}': {e}")
+        raise
+
+
+def local_sample_rate(name: str) -> Optional[int]:
+    """Sample rate a local model engine's audio is delivered at, or None if it is unavailable. May load the engine."""
+    model = tts_engines.get(name)
+    if name == "coqui" and model:
+        return tts_postprocessor.output_rate(model.sample_rate)
+    if name == "piper" and model:
+        return tts_postprocessor.output_rate(model.config.sample_rate)
+    return None
+
+
+# Engines whose synthesis functions live in this module (and can run in the TTS server process)
+LOCAL_ENGINE_FUNCTIONS = {"coqui": text_to_audio_coqui, "piper": text_to_audio_piper}
+LOCAL_STREAM_FUNCTIONS = {"piper": stream_audio_piper}
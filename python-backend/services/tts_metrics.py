@@ -0,0 +1,44 @@
+import statistics
+import threading
+from collections import defaultdict, deque
+
+# Number of most recent samples kept per engine
+MAX_SAMPLES = 500
+
+
+class LatencyRecorder:
+    """Thread-safe rolling latency samples, grouped by label (e.g. TTS engine name)."""
+
+    def __init__(self, max_samples: int = MAX_SAMPLES):
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=max_samples))
+        self._counts = defaultdict(int)
+
+    def record(self, label: str, seconds: float) -> None:
+        with self._lock:
+            self._samples[label].append(seconds)
+            self._counts[label] += 1
+
+    def summary(self) -> dict:
+        """Returns count, mean, p50 and p95 in milliseconds for every label."""
+        with self._lock:
+            snapshot = {label: sorted(samples) for label, samples in self._samples.items()}
+            counts = dict(self._counts)
+        result = {}
+        for label, samples in snapshot.items():
+            if not samples:
+                continue
+            result[label] = {
+                "count": counts[label],
+                "mean_ms": round(statistics.fmean(samples) * 1000, 1),
+                "p50_ms": round(samples[len(samples) // 2] * 1000, 1),
+                "p95_ms": round(samples[max(0, int(len(samples) * 0.95) - 1)] * 1000, 1),
+            }
+        return result
+
+
+# Time from the start of a sentence's synthesis to its first audio byte, per engine and mode
+tts_first_audio_latency = LatencyRecorder()
+
+# Time from receiving a streamed text request to its first answer token, per endpoint
+text_first_token_latency = LatencyRecorder()
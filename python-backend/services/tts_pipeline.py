@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Iterator, Optional
+
+from config import TTS_WORKER_THREADS, TTS_MAX_PENDING_SENTENCES
+
+logger = logging.getLogger(__name__)
+
+# A single pool is shared by every connection handled by this worker process, so
+# the number of concurrent synthesis jobs stays bounded no matter how many calls are open.
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_tts_executor() -> ThreadPoolExecutor:
+    """Returns the process-wide TTS thread pool, creating it on first use."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=TTS_WORKER_THREADS, thread_name_prefix="tts")
+    return _executor
+
+
+def shutdown_tts_executor() -> None:
+    """Stops the shared TTS thread pool. Called on application shutdown."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+class TTSPipeline:
+    """
+    Per-connection ordered TTS job queue.
+
+    Sentences are handed to the shared thread pool as soon as they are submitted, so
+    sentence N+1 is synthesized while sentence N is still being sent. A single sender
+    task awaits the jobs in submission order, which guarantees the client receives
+    audio chunks in sentence order even when a later sentence finishes first.
+
+    Args:
+        synthesize (Callable): Blocking function `(lang, text) -> audio`, run in the pool.
+        on_audio (Callable): Coroutine `(audio, text)` called in order for every non-empty result.
+        max_pending (int): Maximum number of sentences queued or in flight for this connection.
+    """
+
+    def __init__(
+        self,
+        synthesize: Callable[[str, str], bytes],
+        on_audio: Callable[[bytes, str], Awaitable[None]],
+        max_pending: int = TTS_MAX_PENDING_SENTENCES,
+    ):
+        self._synthesize = synthesize
+        self._on_audio = on_audio
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(max_pending)
+        self._sender_task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._sender_task is None:
+            self._sender_task = asyncio.create_task(self._send_in_order())
+
+    async def submit(self, lang: str, text: str) -> None:
+        """Schedules synthesis of one sentence. Waits only if too many sentences are pending."""
+        await self._slots.acquire()
+        self._queue.put_nowait((text, self._start_job(lang, text)))
+
+    async def drain(self) -> None:
+        """Waits until every submitted sentence has been synthesized and delivered."""
+        await self._queue.join()
+
+    async def close(self) -> None:
+        """Cancels pending jobs and stops the sender task."""
+        while not self._queue.empty():
+            _, job = self._queue.get_nowait()
+            self._cancel_job(job)
+            self._queue.task_done()
+        if self._sender_task is not None:
+            self._sender_task.cancel()
+            try:
+                await self._sender_task
+            except asyncio.CancelledError:
+                pass
+            self._sender_task = None
+
+    async def _send_in_order(self) -> None:
+        while True:
+            text, job = await self._queue.get()
+            try:
+                await self._deliver(text, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # A failed sentence must not stall the rest of the turn
+                logger.error(f"TTS job failed for text '{text}': {e}", exc_info=True)
+            finally:
+                self._slots.release()
+                self._queue.task_done()
+
+    def _start_job(self, lang: str, text: str):
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(get_tts_executor(), self._synthesize, lang, text)
+
+    def _cancel_job(self, job) -> None:
+        job.cancel()
+
+    async def _deliver(self, text: str, job) -> None:
+        audio = await job
+        if audio:
+            await self._on_audio(audio, text)
+
+
+class _StreamJob:
+    """Frames produced by one sentence, handed from a pool thread to the event loop."""
+
+    _END = object()
+
+    def __init__(self):
+        self.frames: asyncio.Queue = asyncio.Queue()
+        self.cancelled = threading.Event()
+
+
+class StreamingTTSPipeline(TTSPipeline):
+    """
+    Variant of TTSPipeline for engines that emit audio incrementally.
+
+    `synthesize` is a blocking generator `(lang, text) -> Iterator[bytes]` run in the pool;
+    every frame is forwarded to the client as soon as it is produced, while sentences are
+    still delivered strictly in submission order.
+
+    Args:
+        synthesize (Callable): Blocking generator of raw audio frames for one sentence.
+        on_sentence_start (Callable): Coroutine `(text)` called before the first frame of a sentence.
+        on_frame (Callable): Coroutine `(frame)` called for every frame, in order.
+        max_pending (int): Maximum number of sentences queued or in flight for this connection.
+    """
+
+    def __init__(
+        self,
+        synthesize: Callable[[str, str], Iterator[bytes]],
+        on_sentence_start: Callable[[str], Awaitable[None]],
+        on_frame: Callable[[bytes], Awaitable[None]],
+        max_pending: int = TTS_MAX_PENDING_SENTENCES,
+    ):
+        super().__init__(synthesize, None, max_pending)
+        self._on_sentence_start = on_sentence_start
+        self._on_frame = on_frame
+
+    def _start_job(self, lang: str, text: str) -> _StreamJob:
+        loop = asyncio.get_running_loop()
+        job = _StreamJob()
+
+        def produce():
+            try:
+                for frame in self._synthesize(lang, text):
+                    if job.cancelled.is_set():
+                        break
+                    if frame:
+                        loop.call_soon_threadsafe(job.frames.put_nowait, frame)
+            except Exception as e:
+                logger.error(f"Streaming TTS job failed for text '{text}': {e}", exc_info=True)
+            finally:
+                loop.call_soon_threadsafe(job.frames.put_nowait, _StreamJob._END)
+
+        get_tts_executor().submit(produce)
+        return job
+
+    def _cancel_job(self, job: _StreamJob) -> None:
+        job.cancelled.set()
+
+    async def _deliver(self, text: str, job: _StreamJob) -> None:
+        started = False
+        try:
+            while True:
+                frame = await job.frames.get()
+                if frame is _StreamJob._END:
+                    return
+                if not started:
+                    await self._on_sentence_start(text)
+                    started = True
+                await self._on_frame(frame)
+        except BaseException:
+            job.cancelled.set()
+            raise
@@ -0,0 +1,59 @@
+"""
+Wire format shared by the TTS server process and its clients.
+
+Every message is a frame: a 4-byte big-endian header length, a JSON header, and then
+`header["size"]` bytes of payload (0 if absent). A connection carries one request at a time;
+the server answers it with zero or more data frames followed by a single end frame, so
+replies always arrive in request order.
+
+Requests:
+    {"op": "synthesize", "engine": "piper", "text": "...", "priority": 0}  -> one data frame (WAV)
+    {"op": "stream", "engine": "piper", "text": "...", "priority": 0}      -> data frames (16-bit PCM)
+    {"op": "info"}                                                          -> end frame with engine info
+End frame:
+    {"end": true}, optionally with "error" or the "info" payload.
+"""
+import json
+import socket
+import struct
+from typing import Tuple
+
+# Lower numbers are served first
+PRIORITY_LIVE = 0   # sentences of an ongoing voice call
+PRIORITY_BATCH = 1  # REST and background synthesis
+
+_LENGTH = struct.Struct(">I")
+
+
+def parse_address(address: str) -> Tuple[int, object]:
+    """Parses "unix:/path/to.sock" or "host:port" into a socket family and address."""
+    if address.startswith("unix:"):
+        return socket.AF_UNIX, address[len("unix:"):]
+    host, _, port = address.rpartition(":")
+    return socket.AF_INET, (host or "127.0.0.1", int(port))
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        chunk = sock.recv(size - len(buffer))
+        if not chunk:
+            raise ConnectionError("TTS connection closed mid-frame")
+        buffer.extend(chunk)
+    return bytes(buffer)
+
+
+def send_frame(sock: socket.socket, header: dict, payload: bytes = b"") -> None:
+    if payload:
+        header = dict(header, size=len(payload))
+    encoded = json.dumps(header).encode("utf-8")
+    sock.sendall(_LENGTH.pack(len(encoded)) + encoded + payload)
+
+
+def recv_frame(sock: socket.socket) -> Tuple[dict, bytes]:
+    """Reads one frame. Raises ConnectionError if the peer closed the connection."""
+    (length,) = _LENGTH.unpack(_recv_exact(sock, _LENGTH.size))
+    header = json.loads(_recv_exact(sock, length))
+    size = header.get("size", 0)
+    payload = _recv_exact(sock, size) if size else b""
+    return header, payload
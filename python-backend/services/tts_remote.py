@@ -0,0 +1,163 @@
+import itertools
+import logging
+import socket
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import TTS_SERVER_ADDRESSES, TTS_SERVER_TIMEOUT, TTS_SERVER_CONNECTIONS
+from services.tts_protocol import PRIORITY_LIVE, parse_address, recv_frame, send_frame
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteTTSError(RuntimeError):
+    """The TTS server answered a request with an error."""
+
+
+class _ServerConnections:
+    """Idle connections to one TTS server address."""
+
+    def __init__(self, address: str, timeout: float, max_idle: int):
+        self.address = address
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle: List[socket.socket] = []
+        self._lock = threading.Lock()
+
+    def checkout(self) -> Tuple[socket.socket, bool]:
+        """An idle connection if there is one, else a new one; and whether it was reused."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self.connect(), False
+
+    def connect(self) -> socket.socket:
+        family, address = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(address)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def checkin(self, sock: socket.socket) -> None:
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(sock)
+                return
+        sock.close()
+
+
+class RemoteTTSClient:
+    """
+    Blocking client for one or more TTS server processes (`services.tts_server`).
+
+    Meant to be called from the TTS thread pool, like the in-process engines. Each request
+    takes a pooled connection to the next server in round-robin order. A connection is only
+    reused after its reply was read completely; an abandoned stream closes it. If a pooled
+    connection turns out to be closed by the server (e.g. after a restart) before any reply
+    arrives, the request is retried once on a new connection.
+
+    Failures are logged and produce empty audio, matching the in-process engine functions.
+
+    Args:
+        addresses (list[str]): Server addresses, "unix:/path/to.sock" or "host:port".
+        timeout (float): Socket timeout per send/receive in seconds.
+        max_idle (int): Idle connections kept per address.
+    """
+
+    def __init__(self, addresses: List[str], timeout: float = TTS_SERVER_TIMEOUT, max_idle: int = TTS_SERVER_CONNECTIONS):
+        self._servers = [_ServerConnections(address, timeout, max_idle) for address in addresses]
+        self._next = itertools.cycle(self._servers)
+        self._next_lock = threading.Lock()
+        self._sample_rates: Dict[str, int] = {}
+
+    def _pick(self) -> _ServerConnections:
+        with self._next_lock:
+            return next(self._next)
+
+    def _request(self, request: dict, server: Optional[_ServerConnections] = None) -> Iterator[dict]:
+        """Sends one request and yields the reply frames as (header, payload), ending with the end frame."""
+        server = server or self._pick()
+        sock, reused = server.checkout()
+        complete = False
+        try:
+            try:
+                send_frame(sock, request)
+                frame = recv_frame(sock)
+            except ConnectionError:
+                if not reused:
+                    raise
+                # Nothing was received, so the request can safely be sent again
+                logger.info(f"Idle connection to TTS server {server.address} was closed, reconnecting")
+                sock.close()
+                sock = server.connect()
+                send_frame(sock, request)
+                frame = recv_frame(sock)
+            while True:
+                header, payload = frame
+                if header.get("end"):
+                    complete = True
+                    if header.get("error"):
+                        raise RemoteTTSError(header["error"])
+                    yield header, payload
+                    return
+                yield header, payload
+                frame = recv_frame(sock)
+        finally:
+            if complete:
+                server.checkin(sock)
+            else:
+                sock.close()
+
+    def synthesize(self, engine: str, text: str, priority: int = PRIORITY_LIVE) -> bytes:
+        """Synthesizes one sentence to WAV bytes on a TTS server."""
+        try:
+            request = {"op": "synthesize", "engine": engine, "text": text, "priority": priority}
+            return b"".join(payload for _, payload in self._request(request))
+        except (OSError, RemoteTTSError) as e:
+            logger.error(f"Remote TTS ({engine}) failed for text '{text}': {e}")
+            return b""
+
+    def stream(self, engine: str, text: str, priority: int = PRIORITY_LIVE) -> Iterator[bytes]:
+        """
+        Yields raw 16-bit PCM frames for one sentence as the TTS server produces them. Unlike
+        `synthesize`, a failure is re-raised after logging, as frames may already have been sent.
+        """
+        try:
+            request = {"op": "stream", "engine": engine, "text": text, "priority": priority}
+            for _, payload in self._request(request):
+                if payload:
+                    yield payload
+        except (OSError, RemoteTTSError) as e:
+            logger.error(f"Remote TTS stream ({engine}) failed for text '{text}': {e}")
+            raise
+
+    def sample_rate(self, engine: str) -> Optional[int]:
+        """Output sample rate of a server-side engine, or None if no server has it available."""
+        if engine not in self._sample_rates:
+            try:
+                for header, _ in self._request({"op": "info"}):
+                    for name, rate in header["info"]["sample_rates"].items():
+                        if rate:
+                            self._sample_rates[name] = rate
+            except (OSError, RemoteTTSError, KeyError) as e:
+                logger.error(f"Could not query the TTS server: {e}")
+        return self._sample_rates.get(engine)
+
+    def status(self) -> dict:
+        """Per-address engine status, for /health."""
+        result = {}
+        for server in self._servers:
+            try:
+                for header, _ in self._request({"op": "info"}, server):
+                    result[server.address] = header["info"]
+            except (OSError, RemoteTTSError, KeyError) as e:
+                result[server.address] = {"error": str(e)}
+        return result
+
+
+# None when synthesis runs in-process (TTS_SERVER_ADDRESSES unset)
+tts_remote = RemoteTTSClient(TTS_SERVER_ADDRESSES) if TTS_SERVER_ADDRESSES else None
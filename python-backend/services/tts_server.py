@@ -0,0 +1,180 @@
+"""
+Dedicated TTS server process.
+
+Holds the Piper and Coqui models once for the whole machine, so uvicorn workers stay small
+and synthesis capacity is scaled by the number of server processes and TTS_SERVER_WORKERS
+instead of by web workers. Web workers reach it through `services.tts_remote` when
+TTS_SERVER_ADDRESSES is set.
+
+Jobs from all connections share one priority queue: live voice-call sentences
+(PRIORITY_LIVE) are always picked before batch work, and jobs of equal priority run in
+arrival order.
+
+Usage (from python-backend/):
+    python -m services.tts_server --address unix:/tmp/aria-tts.sock --workers 2
+"""
+import argparse
+import itertools
+import logging
+import os
+import queue
+import socket
+import socketserver
+import threading
+from typing import Optional
+
+from config import TTS_SERVER_WORKERS
+from services.tts_engines import tts_engines, local_sample_rate, LOCAL_ENGINE_FUNCTIONS, LOCAL_STREAM_FUNCTIONS
+from services.tts_protocol import PRIORITY_BATCH, parse_address, recv_frame, send_frame
+from utils.audio_utils import wav_to_pcm
+
+logger = logging.getLogger(__name__)
+
+
+class SynthesisJob:
+    """One request; its output frames are handed from a synthesis thread to the connection."""
+
+    END = object()
+
+    def __init__(self, op: str, engine: str, text: str):
+        self.op = op
+        self.engine = engine
+        self.text = text
+        self.frames: queue.Queue = queue.Queue()
+        self.cancelled = threading.Event()
+        self.error: Optional[str] = None
+
+    def run(self) -> None:
+        try:
+            if self.op == "stream" and self.engine in LOCAL_STREAM_FUNCTIONS:
+                for frame in LOCAL_STREAM_FUNCTIONS[self.engine](self.text):
+                    if self.cancelled.is_set():
+                        break
+                    if frame:
+                        self.frames.put(frame)
+            else:
+                audio = LOCAL_ENGINE_FUNCTIONS[self.engine](self.text)
+                if audio and self.op == "stream":
+                    # Engines without native streaming send the whole sentence as one PCM frame
+                    audio = wav_to_pcm(audio)[0]
+                if audio:
+                    self.frames.put(audio)
+        except Exception as e:
+            logger.error(f"TTS server job failed for '{self.text}': {e}", exc_info=True)
+            self.error = str(e)
+        finally:
+            self.frames.put(SynthesisJob.END)
+
+
+class TTSServer:
+    """
+    Runs synthesis jobs for local socket clients on a fixed number of threads.
+
+    Args:
+        address (str): "unix:/path/to.sock" or "host:port".
+        workers (int): Synthesis threads; each runs one sentence at a time.
+    """
+
+    def __init__(self, address: str, workers: int = TTS_SERVER_WORKERS):
+        self.address = address
+        self.workers = workers
+        self._jobs: queue.PriorityQueue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._server: Optional[socketserver.BaseServer] = None
+
+    def submit(self, job: SynthesisJob, priority: int) -> None:
+        self._jobs.put((priority, next(self._order), job))
+
+    def info(self) -> dict:
+        return {
+            "engines": tts_engines.status(),
+            "sample_rates": {name: local_sample_rate(name) for name in LOCAL_ENGINE_FUNCTIONS},
+            "queued": self._jobs.qsize(),
+        }
+
+    def _work(self) -> None:
+        while True:
+            _, _, job = self._jobs.get()
+            if not job.cancelled.is_set():
+                job.run()
+            else:
+                job.frames.put(SynthesisJob.END)
+
+    def serve_forever(self) -> None:
+        family, bind_address = parse_address(self.address)
+        if family == socket.AF_UNIX:
+            if os.path.exists(bind_address):
+                os.unlink(bind_address)
+            self._server = _UnixServer(bind_address, _Handler)
+        else:
+            self._server = _TCPServer(bind_address, _Handler)
+        self._server.tts = self
+
+        for i in range(self.workers):
+            threading.Thread(target=self._work, name=f"tts-server-{i}", daemon=True).start()
+        logger.info(f"TTS server listening on {self.address} with {self.workers} synthesis threads")
+        self._server.serve_forever()
+
+    def shutdown(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """Serves the requests of one client connection, one at a time and in order."""
+
+    def handle(self):
+        tts: TTSServer = self.server.tts
+        while True:
+            try:
+                request, _ = recv_frame(self.request)
+            except (ConnectionError, OSError):
+                return
+
+            op = request.get("op")
+            if op == "info":
+                send_frame(self.request, {"end": True, "info": tts.info()})
+                continue
+            if op not in ("synthesize", "stream") or request.get("engine") not in LOCAL_ENGINE_FUNCTIONS:
+                send_frame(self.request, {"end": True, "error": f"Unsupported request: {op} {request.get('engine')}"})
+                continue
+
+            job = SynthesisJob(op, request["engine"], request.get("text", ""))
+            tts.submit(job, request.get("priority", PRIORITY_BATCH))
+            try:
+                while True:
+                    frame = job.frames.get()
+                    if frame is SynthesisJob.END:
+                        send_frame(self.request, {"end": True, "error": job.error} if job.error else {"end": True})
+                        break
+                    send_frame(self.request, {}, frame)
+            except OSError:
+                # The client went away (e.g. the call ended); stop synthesizing for it
+                job.cancelled.set()
+                return
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--address", default="unix:/tmp/aria-tts.sock")
+    parser.add_argument("--workers", type=int, default=TTS_SERVER_WORKERS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    # This process exists to hold the models, so load them before accepting connections
+    tts_engines.load_all()
+    TTSServer(args.address, args.workers).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
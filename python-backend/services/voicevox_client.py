@@ -0,0 +1,219 @@
+import asyncio
+import io
+import logging
+import threading
+import zipfile
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+from config import (
+    VOICEVOX_BASE_URL,
+    VOICEVOX_TIMEOUT,
+    VOICEVOX_MAX_CONCURRENCY,
+    VOICEVOX_MAX_BATCH,
+)
+
+logger = logging.getLogger(__name__)
+
+# Number of audio queries kept for reuse (greetings and stock phrases repeat a lot)
+AUDIO_QUERY_CACHE_SIZE = 256
+
+
+class VoicevoxClient:
+    """
+    Async client for the VOICEVOX engine HTTP API.
+
+    Uses one pooled keep-alive connection set for the whole worker, caps the number of
+    synthesis requests in flight, and applies timeouts to every call. Sentences that queue
+    up while the concurrency limit is reached are synthesized together through
+    `/multi_synthesis`, so a turn with several pending sentences costs one request instead
+    of one per sentence. The first sentence of a turn is never held back for batching.
+
+    Audio queries (`/audio_query`) take a request slot too, are cached and reused for repeated
+    sentences, and concurrent requests for the same query share one POST.
+
+    Args:
+        base_url (str): VOICEVOX engine URL, e.g. "http://127.0.0.1:50021".
+        timeout (float): Per-request timeout in seconds.
+        max_concurrency (int): Maximum synthesis requests in flight at once.
+        max_batch (int): Maximum sentences per `/multi_synthesis` request.
+    """
+
+    def __init__(
+        self,
+        base_url: str = VOICEVOX_BASE_URL,
+        timeout: float = VOICEVOX_TIMEOUT,
+        max_concurrency: int = VOICEVOX_MAX_CONCURRENCY,
+        max_batch: int = VOICEVOX_MAX_BATCH,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.max_batch = max_batch
+        self._http: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending = defaultdict(list)  # speaker -> [(audio_query, future, sent)]
+        self._dispatchers = {}  # speaker -> dispatcher task
+        self._queries: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._query_futures: Dict[tuple, asyncio.Future] = {}  # (speaker, text) -> query in flight
+        self._multi_supported = True
+
+    async def start(self) -> None:
+        """Creates the pooled HTTP client on the running event loop."""
+        if self._http is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._http = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(self.timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency * 2,
+                max_keepalive_connections=self.max_concurrency * 2,
+            ),
+        )
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def audio_query(self, text: str, speaker: int) -> dict:
+        """Returns the (cached) VOICEVOX audio query for a text and speaker."""
+        await self.start()
+        key = (speaker, text)
+        query = self._queries.get(key)
+        if query is not None:
+            self._queries.move_to_end(key)
+            return query
+        in_flight = self._query_futures.get(key)
+        if in_flight is not None:
+            # Shielded, so one waiter giving up does not cancel the query for the others
+            return await asyncio.shield(in_flight)
+
+        in_flight = self._loop.create_future()
+        self._query_futures[key] = in_flight
+        try:
+            async with self._slots:
+                response = await self._http.post("/audio_query", params={"text": text, "speaker": speaker})
+            response.raise_for_status()
+            query = response.json()
+        except asyncio.CancelledError:
+            in_flight.cancel()
+            raise
+        except Exception as e:
+            in_flight.set_exception(e)
+            in_flight.exception()  # Raised to this caller; not an unretrieved error if nobody else waits
+            raise
+        finally:
+            self._query_futures.pop(key, None)
+        self._queries[key] = query
+        if len(self._queries) > AUDIO_QUERY_CACHE_SIZE:
+            self._queries.popitem(last=False)
+        in_flight.set_result(query)
+        return query
+
+    async def synthesize(self, text: str, speaker: int, sent: Optional[threading.Event] = None) -> bytes:
+        """
+        Synthesizes one sentence to WAV bytes, batching with other queued sentences when busy.
+        `sent` is set once the sentence leaves the queue and its synthesis request is made.
+        """
+        query = await self.audio_query(text, speaker)
+        future = self._loop.create_future()
+        entry = (query, future, sent)
+        self._pending[speaker].append(entry)
+        if speaker not in self._dispatchers:
+            self._dispatchers[speaker] = asyncio.create_task(self._dispatch(speaker))
+        try:
+            return await future
+        except asyncio.CancelledError:
+            # Not synthesized if it is still queued
+            future.cancel()
+            if entry in self._pending[speaker]:
+                self._pending[speaker].remove(entry)
+            raise
+
+    def synthesize_from_thread(self, text: str, speaker: int) -> bytes:
+        """
+        Blocking wrapper for code running on the TTS thread pool.
+
+        Waiting for the audio query and for a free request slot may take up to twice the
+        request timeout; after that the sentence gets `timeout` for its synthesis request.
+        Raises TimeoutError (and cancels the request) when either limit is exceeded.
+        """
+        if self._loop is None:
+            raise RuntimeError("VoicevoxClient has not been started on an event loop.")
+        sent = threading.Event()
+        future = asyncio.run_coroutine_threadsafe(self.synthesize(text, speaker, sent), self._loop)
+        # Also wakes the wait below when the call fails before its sentence is sent
+        future.add_done_callback(lambda _: sent.set())
+        try:
+            if not sent.wait(2 * self.timeout):
+                return future.result(timeout=0)
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise TimeoutError(f"VOICEVOX synthesis timed out for text '{text}'")
+
+    async def _dispatch(self, speaker: int) -> None:
+        """Sends queued sentences for a speaker as request slots become free."""
+        try:
+            while self._pending[speaker]:
+                await self._slots.acquire()
+                # Sentences whose caller gave up are dropped
+                self._pending[speaker] = [entry for entry in self._pending[speaker] if not entry[1].done()]
+                batch = self._pending[speaker][:self.max_batch]
+                del self._pending[speaker][:self.max_batch]
+                if not batch:
+                    self._slots.release()
+                    break
+                for _, _, sent in batch:
+                    if sent is not None:
+                        sent.set()
+                asyncio.create_task(self._run_batch(batch, speaker))
+        finally:
+            self._dispatchers.pop(speaker, None)
+
+    async def _run_batch(self, batch: list, speaker: int) -> None:
+        try:
+            queries = [query for query, _, _ in batch]
+            if len(batch) > 1 and self._multi_supported:
+                wavs = await self._multi_synthesis(queries, speaker)
+            else:
+                wavs = await asyncio.gather(*(self._synthesis(query, speaker) for query in queries))
+            for (_, future, _), wav in zip(batch, wavs):
+                if not future.done():
+                    future.set_result(wav)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    async def _synthesis(self, query: dict, speaker: int) -> bytes:
+        response = await self._http.post("/synthesis", params={"speaker": speaker}, json=query)
+        response.raise_for_status()
+        return response.content
+
+    async def _multi_synthesis(self, queries: List[dict], speaker: int) -> List[bytes]:
+        response = await self._http.post("/multi_synthesis", params={"speaker": speaker}, json=queries)
+        if response.status_code in (404, 405):
+            # Older engines have no multi_synthesis; fall back to one request per sentence
+            logger.warning("VOICEVOX engine does not support /multi_synthesis, disabling batching.")
+            self._multi_supported = False
+            return list(await asyncio.gather(*(self._synthesis(query, speaker) for query in queries)))
+        response.raise_for_status()
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archive:
+            names = sorted(name for name in archive.namelist() if name.endswith(".wav"))
+            wavs = [archive.read(name) for name in names]
+        if len(wavs) != len(queries):
+            raise RuntimeError(f"VOICEVOX multi_synthesis returned {len(wavs)} files for {len(queries)} queries")
+        return wavs
+
+
+voicevox_client = VoicevoxClient()
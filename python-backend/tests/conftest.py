@@ -0,0 +1,12 @@
+import os
+import sys
+
+# config.py refuses to load without these; the tests never reach the real services
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("OPENWEATHERMAP_API_KEY", "test")
+os.environ.setdefault("NEWSAPI_API_KEY", "test")
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "test")
+
+# Modules are imported the way main.py imports them, from python-backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
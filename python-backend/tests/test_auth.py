@@ -0,0 +1,176 @@
+import json
+import time
+from types import SimpleNamespace
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import HTTPException
+
+from services import auth
+from services.auth import AuthUser, InvalidTokenError, TokenVerifier
+
+SUPABASE_URL = "https://project.supabase.co"
+ISSUER = f"{SUPABASE_URL}/auth/v1"
+SECRET = "test-jwt-secret-of-at-least-32-bytes"
+USER_ID = "6f1c3f2e-8a6b-4c1e-9a51-3f4a2b9d7c10"
+
+
+class FakeAuth:
+    """Stands in for `db.auth`: resolves every token to one user, or to none."""
+
+    def __init__(self, user_id=USER_ID):
+        self.user_id = user_id
+        self.calls = 0
+
+    def get_user(self, token):
+        self.calls += 1
+        if self.user_id is None:
+            raise Exception("invalid JWT")
+        return SimpleNamespace(user=SimpleNamespace(id=self.user_id, email="remote@example.com", role="authenticated"))
+
+
+@pytest.fixture
+def db():
+    return SimpleNamespace(auth=FakeAuth())
+
+
+@pytest.fixture(scope="module")
+def rsa_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def claims(**overrides):
+    now = int(time.time())
+    return {
+        "sub": USER_ID,
+        "email": "user@example.com",
+        "role": "authenticated",
+        "aud": "authenticated",
+        "iss": ISSUER,
+        "iat": now,
+        "exp": now + 3600,
+        **overrides,
+    }
+
+
+def hs256_token(secret=SECRET, **overrides):
+    return jwt.encode(claims(**overrides), secret, algorithm="HS256")
+
+
+def rs256_token(key, kid="key-1", **overrides):
+    return jwt.encode(claims(**overrides), key, algorithm="RS256", headers={"kid": kid})
+
+
+def make_verifier(rsa_key=None, **kwargs):
+    verifier = TokenVerifier(jwt_secret=SECRET, supabase_url=SUPABASE_URL, audience="authenticated", local=True, **kwargs)
+    # Serve the JWKS from memory instead of the project's endpoint
+    keys = []
+    if rsa_key is not None:
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(rsa_key.public_key()))
+        keys.append({**jwk, "kid": "key-1", "use": "sig", "alg": "RS256"})
+    verifier._jwks.fetch_data = lambda: {"keys": keys}
+    return verifier
+
+
+def test_valid_hs256_token_is_verified_locally(db):
+    verifier = make_verifier()
+    user = verifier.verify(hs256_token(), db)
+    assert user == AuthUser(id=USER_ID, email="user@example.com", role="authenticated")
+    assert verifier.local_verifications == 1
+    assert db.auth.calls == 0
+
+
+def test_valid_rs256_token_is_verified_with_jwks(db, rsa_key):
+    verifier = make_verifier(rsa_key)
+    user = verifier.verify(rs256_token(rsa_key), db)
+    assert user.id == USER_ID
+    assert verifier.local_verifications == 1
+    assert db.auth.calls == 0
+
+
+def test_expired_token_is_rejected(db):
+    verifier = make_verifier()
+    now = int(time.time())
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(hs256_token(iat=now - 7200, exp=now - 3600), db)
+    assert db.auth.calls == 0
+
+
+@pytest.mark.parametrize("overrides", [{"aud": "anon"}, {"iss": "https://other.supabase.co/auth/v1"}])
+def test_token_for_another_audience_or_issuer_is_rejected(db, overrides):
+    verifier = make_verifier()
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(hs256_token(**overrides), db)
+
+
+def test_bad_hs256_signature_is_rejected(db):
+    verifier = make_verifier()
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(hs256_token(secret="some-other-secret-of-at-least-32-bytes"), db)
+    assert db.auth.calls == 0
+
+
+def test_bad_rs256_signature_is_rejected(db, rsa_key):
+    verifier = make_verifier(rsa_key)
+    forged = rs256_token(rsa.generate_private_key(public_exponent=65537, key_size=2048))
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(forged, db)
+    assert db.auth.calls == 0
+
+
+def test_unknown_kid_falls_back_to_auth_server(db, rsa_key):
+    verifier = make_verifier(rsa_key)
+    user = verifier.verify(rs256_token(rsa_key, kid="rotated-key"), db)
+    assert user.email == "remote@example.com"
+    assert verifier.remote_verifications == 1
+    assert db.auth.calls == 1
+
+
+def test_hs256_without_secret_falls_back_to_auth_server(db):
+    verifier = make_verifier()
+    verifier.jwt_secret = None
+    assert verifier.verify(hs256_token(), db).id == USER_ID
+    assert db.auth.calls == 1
+
+
+def test_token_rejected_by_auth_server():
+    verifier = make_verifier()
+    verifier.jwt_secret = None
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(hs256_token(), SimpleNamespace(auth=FakeAuth(user_id=None)))
+
+
+def test_resolved_user_is_cached(db, rsa_key):
+    verifier = make_verifier(rsa_key)
+    token = rs256_token(rsa_key, kid="rotated-key")
+    first = verifier.verify(token, db)
+    second = verifier.verify(token, db)
+    assert first == second
+    assert db.auth.calls == 1
+    assert verifier.users.stats()["hits"] == 1
+
+
+def test_cache_entry_does_not_outlive_token(db):
+    verifier = make_verifier(user_ttl=60)
+    token = hs256_token(exp=int(time.time()) + 1)
+    verifier.verify(token, db)
+    time.sleep(1.1)
+    with pytest.raises(InvalidTokenError):
+        verifier.verify(token, db)
+
+
+def test_get_current_user_requires_bearer_token(db):
+    with pytest.raises(HTTPException) as error:
+        auth.get_current_user(None, db)
+    assert error.value.status_code == 401
+    with pytest.raises(HTTPException):
+        auth.get_current_user(f"Token {hs256_token()}", db)
+
+
+def test_get_current_user(db, monkeypatch):
+    monkeypatch.setattr(auth, "token_verifier", make_verifier())
+    assert auth.get_current_user(f"Bearer {hs256_token()}", db).id == USER_ID
+    with pytest.raises(HTTPException) as error:
+        auth.get_current_user(f"Bearer {hs256_token(aud='anon')}", db)
+    assert error.value.status_code == 401
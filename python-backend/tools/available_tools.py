@@ -1,7 +1,28 @@
 import requests
+from requests.adapters import HTTPAdapter
 import datetime
 import json
 from config import OPENWEATHERMAP_API_KEY, NEWSAPI_API_KEY
+from config import TOOL_CACHE_MAX_ENTRIES, WEATHER_CACHE_TTL, NEWS_CACHE_TTL, TOOL_HTTP_POOL_SIZE
+from tools.tool_cache import TTLCache, cached_tool
+
+# Timeout (seconds) for the HTTP requests made by the tools
+REQUEST_TIMEOUT = 8
+
+# Maximum length of a news article description passed back to the model
+NEWS_DESCRIPTION_MAX_CHARS = 200
+
+# One pooled session for all tool calls, so connections to the weather and news APIs are reused
+http_session = requests.Session()
+http_session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=TOOL_HTTP_POOL_SIZE))
+http_session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=TOOL_HTTP_POOL_SIZE))
+
+# Results shared by every user asking for the same city or topic within the TTL
+tool_cache = TTLCache(max_entries=TOOL_CACHE_MAX_ENTRIES)
+
+def is_cacheable_result(result: str) -> bool:
+    """Errors are never cached, so a transient failure is retried on the next call."""
+    return not result.startswith("Error")
 
 def get_current_date_and_time() -> str:
     """
@@ -10,6 +31,7 @@ def get_current_date_and_time() -> str:
     now = datetime.datetime.now()
     return now.strftime("%Y-%m-%d %H:%M:%S")
 
+@cached_tool(tool_cache, ttl=WEATHER_CACHE_TTL, should_cache=is_cacheable_result)
 def get_weather(location: str) -> str:
     """
     Gets the current weather for a given location using the OpenWeatherMap API.
@@ -27,7 +49,7 @@ def get_weather(location: str) -> str:
         "units": "metric"  # Use Celsius
     }
     try:
-        response = requests.get(base_url, params=params)
+        response = http_session.get(base_url, params=params, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()  # Raise an exception for bad status codes
         data = response.json()
         
@@ -50,6 +72,7 @@ def get_weather(location: str) -> str:
     except KeyError:
         return f"Error: Could not parse weather data for {location}. The location might be invalid."
 
+@cached_tool(tool_cache, ttl=NEWS_CACHE_TTL, should_cache=is_cacheable_result)
 def get_news(topic: str) -> str:
     """
     Gets the top 5 recent news headlines for a given topic from the NewsAPI.
@@ -69,7 +92,7 @@ def get_news(topic: str) -> str:
         "sortBy": "relevancy" # Sort by relevancy for better results
     }
     try:
-        response = requests.get(base_url, params=params)
+        response = http_session.get(base_url, params=params, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
         data = response.json()
         
@@ -77,16 +100,36 @@ def get_news(topic: str) -> str:
         if not articles:
             return f"No recent news found for the topic: {topic}"
             
-        # Return a JSON string of the articles
-        return json.dumps(articles)
+        # Return only the fields the model needs; full articles multiply the tokens of the follow-up call
+        return json.dumps([trim_article(article) for article in articles], ensure_ascii=False)
         
     except requests.exceptions.RequestException as e:
         return f"Error fetching news data: {e}"
 
+def trim_article(article: dict) -> dict:
+    """Reduces a NewsAPI article to its title, source, publication date and a short description."""
+    description = (article.get("description") or "").strip()
+    if len(description) > NEWS_DESCRIPTION_MAX_CHARS:
+        description = description[:NEWS_DESCRIPTION_MAX_CHARS].rsplit(" ", 1)[0] + "..."
+    return {
+        "title": article.get("title"),
+        "source": (article.get("source") or {}).get("name"),
+        "published_at": article.get("publishedAt"),
+        "description": description,
+    }
+
 # This dictionary maps function names to their actual implementation.
 # It will be used by the tool calling logic to execute the correct function.
 available_tools = {
     "get_current_date_and_time": get_current_date_and_time,
     "get_weather": get_weather,
     "get_news": get_news,
-}
\ No newline at end of file
+}
+
+# Maximum time (seconds) the model turn waits for each tool before reporting a timeout.
+# Tools not listed here use TOOL_DEFAULT_TIMEOUT from config.
+tool_timeouts = {
+    "get_current_date_and_time": 2,
+    "get_weather": REQUEST_TIMEOUT + 2,
+    "get_news": REQUEST_TIMEOUT + 2,
+}
@@ -0,0 +1,99 @@
+import functools
+import inspect
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+
+def normalize_arg(value) -> str:
+    """Case- and whitespace-insensitive form of a tool argument, e.g. ' New  York' -> 'new york'."""
+    return re.sub(r"\s+", " ", str(value)).strip().casefold()
+
+
+class TTLCache:
+    """
+    Thread-safe cache with a per-entry time-to-live and a bounded number of entries.
+
+    When full, expired entries are dropped first, then the least recently used one.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (expires_at, value)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: tuple):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: tuple, value, ttl: float) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._entries[key] = (now + ttl, value)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.max_entries:
+                for stale_key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+                    del self._entries[stale_key]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: tuple) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+def cached_tool(cache: TTLCache, ttl: float, should_cache: Optional[Callable] = None):
+    """
+    Decorator caching a tool's result by its name and normalized arguments for `ttl` seconds.
+
+    Args:
+        cache (TTLCache): Cache shared by the tools.
+        ttl (float): Time-to-live for this tool's results; 0 disables caching.
+        should_cache (Callable): Optional predicate; results it rejects (e.g. errors) are not stored.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if ttl <= 0:
+                return func(*args, **kwargs)
+            # Bind to parameter names so positional and keyword calls share an entry
+            bound = signature.bind(*args, **kwargs)
+            key = (func.__name__,) + tuple(
+                (name, normalize_arg(value)) for name, value in bound.arguments.items()
+            )
+            result = cache.get(key)
+            if result is not None:
+                return result
+            result = func(*args, **kwargs)
+            if should_cache is None or should_cache(result):
+                cache.set(key, result, ttl)
+            return result
+        return wrapper
+    return decorator
@@ -0,0 +1,219 @@
+import io
+import shutil
+import subprocess
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+import numpy as np
+import soundfile as sf
+
+from config import AUDIO_OUTPUT_FORMAT, AUDIO_OPUS_COMPRESSION_LEVEL, AUDIO_MP3_COMPRESSION_LEVEL
+from utils.audio_utils import pcm_to_wav, streaming_wav_header, wav_to_pcm
+
+# Samples handed to libsndfile per write; its Vorbis/Opus encoders misbehave on very large writes
+ENCODE_BLOCK_FRAMES = 24000
+
+
+@dataclass(frozen=True)
+class AudioFormat:
+    """An output encoding for synthesized 16-bit mono speech."""
+    name: str
+    mime_type: str
+    sf_format: Optional[str] = None  # libsndfile container/subtype; None for wav/pcm/ffmpeg formats
+    sf_subtype: Optional[str] = None
+    sample_rates: Optional[Tuple[int, ...]] = None  # Rates the encoder accepts; None accepts any
+    compression_level: Optional[float] = None
+    # Constant bitrate keeps a streamed MP3 seekable with the right duration, as its header
+    # (which would describe a variable bitrate) is only completed after the stream was sent
+    bitrate_mode: Optional[str] = None
+    streaming: bool = True  # Whether bytes can be sent before the whole clip is encoded
+
+
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+AUDIO_FORMATS = {
+    "wav": AudioFormat("wav", "audio/wav"),
+    "pcm": AudioFormat("pcm", "application/octet-stream"),
+    "ogg": AudioFormat(
+        "ogg", "audio/ogg; codecs=opus", "OGG", "OPUS",
+        sample_rates=OPUS_SAMPLE_RATES, compression_level=AUDIO_OPUS_COMPRESSION_LEVEL,
+    ),
+    "mp3": AudioFormat(
+        "mp3", "audio/mpeg", "MP3", "MPEG_LAYER_III",
+        compression_level=AUDIO_MP3_COMPRESSION_LEVEL, bitrate_mode="CONSTANT",
+    ),
+    "webm": AudioFormat("webm", "audio/webm; codecs=opus", sample_rates=OPUS_SAMPLE_RATES, streaming=False),
+}
+
+
+def format_available(fmt: AudioFormat) -> bool:
+    """Whether this installation can encode a format (libsndfile build, or ffmpeg for WebM)."""
+    if fmt.name == "webm":
+        return shutil.which("ffmpeg") is not None
+    if fmt.sf_format is None:
+        return True
+    return fmt.sf_subtype in sf.available_subtypes(fmt.sf_format)
+
+
+def available_formats() -> List[str]:
+    return [name for name, fmt in AUDIO_FORMATS.items() if format_available(fmt)]
+
+
+def negotiate_audio_format(requested: Optional[str] = None, accept: Optional[str] = None) -> AudioFormat:
+    """
+    Picks the output format for a client.
+
+    Args:
+        requested (str): Format names in order of preference, comma-separated (e.g. "ogg,mp3").
+        accept (str): An HTTP Accept header, used when nothing is requested by name.
+
+    Returns:
+        AudioFormat: The first acceptable format this installation can encode, else
+        AUDIO_OUTPUT_FORMAT (or WAV if that cannot be encoded either).
+    """
+    candidates = [name.strip().lower() for name in (requested or "").split(",") if name.strip()]
+    if not candidates and accept:
+        for media_range in accept.split(","):
+            mime = media_range.split(";")[0].strip().lower()
+            candidates.extend(name for name, fmt in AUDIO_FORMATS.items() if fmt.mime_type.split(";")[0] == mime)
+    candidates.append(AUDIO_OUTPUT_FORMAT)
+    for name in candidates:
+        fmt = AUDIO_FORMATS.get(name)
+        if fmt is not None and format_available(fmt):
+            return fmt
+    return AUDIO_FORMATS["wav"]
+
+
+def _encoder_rate(fmt: AudioFormat, sample_rate: int) -> int:
+    """The rate to encode at: the source rate if the encoder accepts it, else the next higher accepted rate."""
+    if fmt.sample_rates is None or sample_rate in fmt.sample_rates:
+        return sample_rate
+    return next((rate for rate in fmt.sample_rates if rate > sample_rate), fmt.sample_rates[-1])
+
+
+class _LinearResampler:
+    """Resamples consecutive blocks of one signal by linear interpolation, continuous across blocks."""
+
+    def __init__(self, source_rate: int, target_rate: int):
+        self.step = source_rate / target_rate
+        self._next = 0.0  # Position of the next output sample, relative to the first sample of the next input
+        self._tail = np.zeros(0, dtype=np.float32)
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        signal = np.concatenate([self._tail, samples])
+        if len(signal) < 2:
+            self._tail = signal
+            return np.zeros(0, dtype=np.float32)
+        positions = np.arange(self._next, len(signal) - 1, self.step)
+        resampled = np.interp(positions, np.arange(len(signal)), signal).astype(np.float32)
+        following = positions[-1] + self.step if len(positions) else self._next
+        # The last sample is kept, so the next block interpolates across the boundary
+        self._next = following - (len(signal) - 1)
+        self._tail = signal[-1:]
+        return resampled
+
+
+class AudioEncoder:
+    """
+    Incremental encoder from 16-bit little-endian mono PCM to an AudioFormat.
+
+    `feed` returns the encoded bytes that are final so far (possibly none, e.g. while an Ogg
+    page fills up) and `close` returns the rest, so a stream can be sent as it is produced.
+    Formats that cannot stream (WebM) return everything from `close`. Sample rates Opus does
+    not support (e.g. Piper's 22050 Hz) are resampled to the next supported rate.
+
+    For WAV and PCM the output is the input; WAV gets an open-ended streaming header.
+    """
+
+    def __init__(self, fmt: AudioFormat, sample_rate: int):
+        self.format = fmt
+        self.sample_rate = sample_rate
+        self.output_rate = _encoder_rate(fmt, sample_rate)
+        self._resampler = _LinearResampler(sample_rate, self.output_rate) if self.output_rate != sample_rate else None
+        self._buffer = io.BytesIO()
+        self._sent = 0
+        self._pending: List[bytes] = []
+        self._file: Optional[sf.SoundFile] = None
+        self._started = False
+        self._closed = False
+        if fmt.sf_format is not None:
+            self._file = sf.SoundFile(
+                self._buffer, "w", self.output_rate, 1,
+                format=fmt.sf_format, subtype=fmt.sf_subtype, compression_level=fmt.compression_level, bitrate_mode=fmt.bitrate_mode,
+            )
+
+    def feed(self, pcm_data: bytes) -> bytes:
+        header = b""
+        if not self._started:
+            self._started = True
+            if self.format.name == "wav":
+                header = streaming_wav_header(self.sample_rate)
+        if self.format.name in ("wav", "pcm"):
+            return header + pcm_data
+        if self._file is None:
+            self._pending.append(pcm_data)
+            return b""
+        samples = np.frombuffer(pcm_data, dtype="<i2").astype(np.float32) / 32768.0
+        if self._resampler is not None:
+            samples = self._resampler.process(samples)
+        for start in range(0, len(samples), ENCODE_BLOCK_FRAMES):
+            self._file.write(samples[start:start + ENCODE_BLOCK_FRAMES])
+        return self._drain()
+
+    def close(self) -> bytes:
+        self._closed = True
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            return self._drain()
+        if self.format.name == "webm":
+            self._buffer.write(_ffmpeg_encode(b"".join(self._pending), self.sample_rate, self.format))
+            return self._drain()
+        return b""
+
+    def encoded(self) -> bytes:
+        """
+        The complete encoded file, available once `close` has been called.
+
+        libsndfile rewrites headers when the file is closed (e.g. the MP3 info frame), so for a
+        whole clip this is the correct result rather than the streamed chunks joined together.
+        WAV and PCM pass straight through `feed` and are not kept.
+        """
+        if not self._closed:
+            raise RuntimeError("encoded() is only available after close()")
+        return self._buffer.getvalue()
+
+    def _drain(self) -> bytes:
+        data = self._buffer.getbuffer()[self._sent:].tobytes()
+        self._sent += len(data)
+        return data
+
+
+def encode_pcm(pcm_data: bytes, sample_rate: int, fmt: AudioFormat) -> bytes:
+    """Encodes a complete clip of 16-bit mono PCM."""
+    if fmt.name == "wav":
+        return pcm_to_wav(pcm_data, sample_rate)
+    if fmt.name == "pcm":
+        return pcm_data
+    encoder = AudioEncoder(fmt, sample_rate)
+    encoder.feed(pcm_data)
+    encoder.close()
+    return encoder.encoded()
+
+
+def encode_wav(wav_data: bytes, fmt: AudioFormat) -> bytes:
+    """Re-encodes a complete 16-bit mono WAV; empty input stays empty."""
+    if not wav_data or fmt.name == "wav":
+        return wav_data
+    pcm_data, sample_rate = wav_to_pcm(wav_data)
+    return encode_pcm(pcm_data, sample_rate, fmt)
+
+
+def _ffmpeg_encode(pcm_data: bytes, sample_rate: int, fmt: AudioFormat) -> bytes:
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error",
+         "-f", "s16le", "-ac", "1", "-ar", str(sample_rate), "-i", "pipe:0",
+         "-ar", str(_encoder_rate(fmt, sample_rate)), "-c:a", "libopus", "-f", fmt.name, "pipe:1"],
+        input=pcm_data, capture_output=True, check=True,
+    )
+    return result.stdout
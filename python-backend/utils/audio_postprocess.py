@@ -0,0 +1,202 @@
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+from config import (
+    TTS_POSTPROCESS_ENABLED,
+    TTS_TRIM_THRESHOLD_DBFS,
+    TTS_TRIM_KEEP_MS,
+    TTS_TARGET_LEVEL_DBFS,
+    TTS_PEAK_CEILING_DBFS,
+    TTS_MAX_GAIN_DB,
+    TTS_OUTPUT_SAMPLE_RATE,
+)
+from utils.audio_utils import pcm_to_wav, resample, wav_to_pcm
+
+# Length of the frames silence is detected in
+FRAME_MS = 10
+INT16_SCALE = np.float32(1 / 32768)
+
+# Per-thread scratch buffers, grown as needed and reused by every call on that thread (TTS
+# synthesis runs on a thread pool, so buffers are never shared between concurrent calls)
+_scratch = threading.local()
+
+
+def _buffer(name: str, size: int, dtype) -> np.ndarray:
+    buffer = getattr(_scratch, name, None)
+    if buffer is None or len(buffer) < size:
+        buffer = np.empty(max(size, 2 * len(buffer) if buffer is not None else size), dtype=dtype)
+        setattr(_scratch, name, buffer)
+    return buffer[:size]
+
+
+def _db_to_amplitude(db: float) -> float:
+    return 10 ** (db / 20)
+
+
+class SpeechPostProcessor:
+    """
+    Post-processing applied to every sentence a local TTS engine synthesizes.
+
+    1. Trims leading and trailing silence (10 ms frames below `trim_threshold_dbfs`), keeping
+       `keep_ms` next to the speech, so consecutive sentences play without long gaps.
+    2. Normalizes loudness: the RMS of the non-silent frames is brought to `target_level_dbfs`,
+       so Coqui, Piper and VOICEVOX sound equally loud. The gain is capped by `max_gain_db` and
+       by the peak ceiling, so speech is never clipped.
+    3. Resamples to `output_rate` if one is set, so every engine delivers one common rate.
+
+    Samples are processed as views of per-thread scratch buffers; the only allocations per
+    sentence are the returned bytes (and the resampled signal, if resampling).
+
+    Args:
+        enabled (bool): When False, audio is only converted (and resampled, if configured).
+        output_rate (int): Common output sample rate; 0 keeps the engine's rate.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = TTS_POSTPROCESS_ENABLED,
+        trim_threshold_dbfs: float = TTS_TRIM_THRESHOLD_DBFS,
+        keep_ms: int = TTS_TRIM_KEEP_MS,
+        target_level_dbfs: float = TTS_TARGET_LEVEL_DBFS,
+        peak_ceiling_dbfs: float = TTS_PEAK_CEILING_DBFS,
+        max_gain_db: float = TTS_MAX_GAIN_DB,
+        output_rate: int = TTS_OUTPUT_SAMPLE_RATE,
+    ):
+        self.enabled = enabled
+        self.trim_threshold_dbfs = trim_threshold_dbfs
+        self.keep_ms = keep_ms
+        self.target_level_dbfs = target_level_dbfs
+        self.peak_ceiling_dbfs = peak_ceiling_dbfs
+        self.max_gain_db = max_gain_db
+        self._output_rate = output_rate
+        self._threshold_power = _db_to_amplitude(trim_threshold_dbfs) ** 2
+        self._target = _db_to_amplitude(target_level_dbfs)
+        self._ceiling = _db_to_amplitude(peak_ceiling_dbfs)
+        self._max_gain = _db_to_amplitude(max_gain_db)
+
+    @property
+    def signature(self) -> str:
+        """Identifies the settings, so cached audio processed differently is not reused."""
+        if not self.enabled:
+            return ""
+        return f"pp:{self.trim_threshold_dbfs:g}:{self.keep_ms}:{self.target_level_dbfs:g}:{self.peak_ceiling_dbfs:g}:{self.max_gain_db:g}"
+
+    def output_rate(self, sample_rate: int) -> int:
+        """The sample rate audio from an engine running at `sample_rate` is delivered at."""
+        return self._output_rate or sample_rate
+
+    def process_float(self, samples: np.ndarray, sample_rate: int) -> bytes:
+        """
+        Processes float32 samples in [-1, 1] to 16-bit PCM at `output_rate(sample_rate)`.
+        `samples` is modified in place. Returns empty bytes if the audio is all silence.
+        """
+        if not self.enabled:
+            return self._finish(samples, sample_rate, 1.0)
+        bounds = self._speech_bounds(samples, sample_rate)
+        if bounds is None:
+            return b""
+        start, end, level = bounds
+        speech = samples[start:end]
+        return self._finish(speech, sample_rate, self._gain(speech, level))
+
+    def process_pcm(self, pcm_data: bytes, sample_rate: int) -> bytes:
+        return self.process_float(self._to_float(pcm_data), sample_rate)
+
+    def process_wav(self, wav_data: bytes) -> bytes:
+        """Processes a 16-bit mono WAV. Empty input, or audio that is all silence, gives empty bytes."""
+        if not wav_data:
+            return wav_data
+        pcm_data, sample_rate = wav_to_pcm(wav_data)
+        pcm_data = self.process_pcm(pcm_data, sample_rate)
+        return pcm_to_wav(pcm_data, self.output_rate(sample_rate)) if pcm_data else b""
+
+    def stream(self, sample_rate: int) -> "StreamPostProcessor":
+        return StreamPostProcessor(self, sample_rate)
+
+    def _to_float(self, pcm_data: bytes) -> np.ndarray:
+        pcm = np.frombuffer(pcm_data, dtype="<i2")
+        samples = _buffer("float", len(pcm), np.float32)
+        np.multiply(pcm, INT16_SCALE, out=samples)
+        return samples
+
+    def _speech_bounds(self, samples: np.ndarray, sample_rate: int) -> Optional[Tuple[int, int, float]]:
+        """Start and end of the speech (padded by keep_ms) and its RMS level, or None for silence."""
+        frame = max(1, sample_rate * FRAME_MS // 1000)
+        frames = len(samples) // frame
+        if frames == 0:
+            return None
+        blocks = samples[:frames * frame].reshape(frames, frame)
+        # Mean square per frame without materializing the squared signal
+        power = np.einsum("ij,ij->i", blocks, blocks) / frame
+        voiced = np.flatnonzero(power > self._threshold_power)
+        if len(voiced) == 0:
+            return None
+        keep = sample_rate * self.keep_ms // 1000
+        start = max(0, voiced[0] * frame - keep)
+        end = len(samples) if voiced[-1] == frames - 1 else min(len(samples), (voiced[-1] + 1) * frame + keep)
+        return start, end, float(np.sqrt(power[voiced].mean()))
+
+    def _gain(self, samples: np.ndarray, level: float) -> float:
+        return self._limit(samples, min(self._target / level, self._max_gain))
+
+    def _limit(self, samples: np.ndarray, gain: float) -> float:
+        """`gain`, lowered if needed so the peak of `samples` stays below the ceiling."""
+        peak = max(float(samples.max()), -float(samples.min()))
+        return min(gain, self._ceiling / peak) if peak > 0 else gain
+
+    def _finish(self, samples: np.ndarray, sample_rate: int, gain: float) -> bytes:
+        if gain != 1.0:
+            np.multiply(samples, np.float32(gain), out=samples)
+        target_rate = self.output_rate(sample_rate)
+        if target_rate != sample_rate:
+            samples = resample(samples, sample_rate, target_rate)
+        np.clip(samples, -1.0, 1.0, out=samples)
+        pcm = _buffer("pcm", len(samples), "<i2")
+        np.multiply(samples, np.float32(32767), out=pcm, casting="unsafe")
+        return pcm.tobytes()
+
+
+class StreamPostProcessor:
+    """
+    SpeechPostProcessor for one sentence arriving as consecutive PCM frames (e.g. Piper's
+    per-sentence chunks). Leading silence is trimmed from the first frame; trailing silence of
+    each frame is held back and only sent if more speech follows, so the silence after the last
+    frame is never sent.
+
+    The gain is set once, from the first frame with speech, so loudness does not jump between
+    frames; a later frame only lowers it when its peak would otherwise clip.
+    """
+
+    def __init__(self, processor: SpeechPostProcessor, sample_rate: int):
+        self.processor = processor
+        self.sample_rate = sample_rate
+        self._held = b""
+        self._gain: Optional[float] = None
+        self._started = False
+
+    def feed(self, pcm_data: bytes) -> bytes:
+        processor = self.processor
+        samples = processor._to_float(pcm_data)
+        if not processor.enabled:
+            return processor._finish(samples, self.sample_rate, 1.0)
+        bounds = processor._speech_bounds(samples, self.sample_rate)
+        if bounds is None:
+            if self._started:
+                self._held += processor._finish(samples, self.sample_rate, self._gain)
+            return b""
+        start, end, level = bounds
+        speech = samples[start if not self._started else 0:end]
+        if self._gain is None:
+            self._gain = processor._gain(speech, level)
+        else:
+            self._gain = processor._limit(speech, self._gain)
+        output = self._held + processor._finish(speech, self.sample_rate, self._gain)
+        trailing = samples[end:]
+        self._held = processor._finish(trailing, self.sample_rate, self._gain) if len(trailing) else b""
+        self._started = True
+        return output
+
+
+tts_postprocessor = SpeechPostProcessor()
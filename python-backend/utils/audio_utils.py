@@ -1,41 +1,105 @@
-import tempfile
-import os
-from pydub import AudioSegment
+import io
+import struct
+import subprocess
+import wave
+from typing import Tuple
+import numpy as np
+import soundfile as sf
 
-def convert_to_wav(input_path: str, output_path: str) -> None:
+# Sample rate speech is sent to the model at
+SPEECH_SAMPLE_RATE = 16000
+
+def pcm_to_wav(pcm_data: bytes, sample_rate: int, channels: int = 1, sample_width: int = 2) -> bytes:
     """
-    Convert an audio file to WAV format with 16kHz sample rate, mono channel, and 32-bit float format.
+    Wrap raw PCM samples (16-bit little-endian by default) in a WAV container.
     
     Args:
-        input_path (str): Path to the input audio file
-        output_path (str): Path where the output WAV file will be saved
+        pcm_data (bytes): Raw PCM samples
+        sample_rate (int): Sample rate of the PCM data in Hz
     """
-    # Load the audio file
-    audio = AudioSegment.from_file(input_path)
-    
-    # Convert to mono and set frame rate to 16kHz
-    audio = audio.set_channels(1)
-    audio = audio.set_frame_rate(16000)
-    
-    # Set sample width to 32-bit float (4 bytes)
-    audio = audio.set_sample_width(4)
-    
-    # Export as WAV with floating point format (PCM 32-bit)
-    audio.export(output_path, format="wav", parameters=["-f", "32"])
+    wav_buffer = io.BytesIO()
+    with wave.open(wav_buffer, 'wb') as wf:
+        wf.setnchannels(channels)
+        wf.setsampwidth(sample_width)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm_data)
+    return wav_buffer.getvalue()
 
-def save_base64_audio(base64_data: str, output_path: str) -> None:
+def streaming_wav_header(sample_rate: int, channels: int = 1, sample_width: int = 2) -> bytes:
     """
-    Save base64 encoded audio data to a file.
-    
+    WAV header for audio whose length is not known yet, to be followed by raw PCM frames.
+    The RIFF and data sizes are set to the maximum, which players read as "until the end of the stream".
+
     Args:
-        base64_data (str): Base64 encoded audio data
-        output_path (str): Path where the audio file will be saved
+        sample_rate (int): Sample rate of the PCM data in Hz
     """
-    import base64
-    
-    # Decode base64 data
-    audio_bytes = base64.b64decode(base64_data)
+    block_align = channels * sample_width
+    return (
+        b"RIFF" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+        + b"fmt " + struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, sample_rate * block_align, block_align, sample_width * 8)
+        + b"data" + struct.pack("<I", 0xFFFFFFFF)
+    )
+
+def wav_to_pcm(wav_data: bytes) -> Tuple[bytes, int]:
+    """
+    Extract the raw PCM frames and the sample rate from WAV bytes.
     
-    # Write to file
-    with open(output_path, "wb") as f:
-        f.write(audio_bytes)
+    Args:
+        wav_data (bytes): A complete WAV file
+    """
+    with wave.open(io.BytesIO(wav_data), 'rb') as wf:
+        return wf.readframes(wf.getnframes()), wf.getframerate()
+
+def decode_audio(data: bytes) -> Tuple[np.ndarray, int]:
+    """
+    Decode an encoded audio file held in memory to mono float32 samples.
+
+    WAV, FLAC, OGG and MP3 are decoded in-process by libsndfile. Anything else (e.g. the
+    WebM/Opus that browsers record) is piped through ffmpeg via stdin/stdout, without
+    temporary files, and comes back at SPEECH_SAMPLE_RATE.
+
+    Args:
+        data (bytes): The complete encoded file
+
+    Returns:
+        tuple[np.ndarray, int]: Samples in [-1, 1] and their sample rate
+    """
+    try:
+        samples, sample_rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+        return samples.mean(axis=1), sample_rate
+    except sf.LibsndfileError:
+        pass
+    result = subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-i", "pipe:0",
+         "-f", "s16le", "-ac", "1", "-ar", str(SPEECH_SAMPLE_RATE), "pipe:1"],
+        input=data, capture_output=True, check=True,
+    )
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0, SPEECH_SAMPLE_RATE
+
+def resample(samples: np.ndarray, sample_rate: int, target_rate: int) -> np.ndarray:
+    """
+    Resample mono float samples. When downsampling, a windowed-sinc low-pass filter is applied
+    first so frequencies above the new Nyquist rate do not alias into the speech band.
+    """
+    if sample_rate == target_rate or len(samples) == 0:
+        return samples
+    ratio = target_rate / sample_rate
+    if ratio < 1:
+        cutoff = 0.45 * ratio  # in cycles per input sample, just below the new Nyquist rate
+        taps = np.arange(-32, 33)
+        kernel = np.sinc(2 * cutoff * taps) * np.hamming(len(taps))
+        samples = np.convolve(samples, (kernel / kernel.sum()).astype(np.float32), mode="same")
+    positions = np.arange(int(len(samples) * ratio)) / ratio
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+def float_to_pcm16(samples: np.ndarray) -> bytes:
+    """Convert float samples in [-1, 1] to 16-bit little-endian PCM, clipping out-of-range values."""
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+def speech_wav(data: bytes, sample_rate: int = SPEECH_SAMPLE_RATE) -> bytes:
+    """
+    Convert an uploaded recording in memory to a mono 16-bit PCM WAV at `sample_rate`, the
+    format sent to the model for transcription (half the size of 32-bit float).
+    """
+    samples, source_rate = decode_audio(data)
+    return pcm_to_wav(float_to_pcm16(resample(samples, source_rate, sample_rate)), sample_rate)
@@ -0,0 +1,52 @@
+from typing import Any, Dict, List
+
+from google.genai import types as genai_types
+
+
+def history_from_json(messages: List[Dict[str, Any]]) -> List[genai_types.Content]:
+    """
+    Reconstructs Gemini conversation history from the rich JSON format used by the frontend:
+    [{"role": "user" | "model" | "assistant", "parts": [{"text": ...} | {"function_call": ...} | {"function_response": ...}]}]
+    """
+    history = []
+    for message in messages:
+        # CRITICAL FIX: Map 'assistant' role to 'model' for the API
+        role = message.get("role")
+        if role == "assistant":
+            role = "model"
+
+        parts = []
+        for part_data in message.get("parts", []):
+            if 'text' in part_data:
+                parts.append(genai_types.Part(text=part_data['text']))
+            elif 'function_call' in part_data:
+                fc = part_data['function_call']
+                parts.append(genai_types.Part.from_function_call(name=fc['name'], args=fc['args']))
+            elif 'function_response' in part_data:
+                fr = part_data['function_response']
+                parts.append(genai_types.Part.from_function_response(name=fr['name'], response=fr['response']))
+        if parts:
+            history.append(genai_types.Content(role=role, parts=parts))
+    return history
+
+
+def history_to_json(history: List[genai_types.Content]) -> List[Dict[str, Any]]:
+    """Inverse of `history_from_json`; parts other than text and function calls/responses are dropped."""
+    messages = []
+    for content in history:
+        parts = []
+        for part in content.parts or []:
+            if part.text is not None:
+                parts.append({"text": part.text})
+            elif part.function_call:
+                parts.append({"function_call": {"name": part.function_call.name, "args": dict(part.function_call.args or {})}})
+            elif part.function_response:
+                parts.append({"function_response": {"name": part.function_response.name, "response": part.function_response.response}})
+        if parts:
+            messages.append({"role": content.role, "parts": parts})
+    return messages
+
+
+def text_content(role: str, text: str) -> genai_types.Content:
+    """A single-text-part history entry, with the database's 'assistant' role mapped to 'model'."""
+    return genai_types.Content(role="model" if role == "assistant" else role, parts=[genai_types.Part(text=text)])
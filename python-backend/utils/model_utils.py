@@ -1,13 +1,24 @@
 import os
 import json
+import time
+import asyncio
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from google import genai
 from google.genai import types
-from tools.available_tools import available_tools, get_weather, get_news, get_current_date_and_time
-from typing import Tuple, Optional
+from tools.available_tools import available_tools, tool_timeouts, get_weather, get_news, get_current_date_and_time
+from typing import Any, AsyncIterator, Dict, Callable, List, Tuple, Optional
+from config import GEMINI_STREAM_FIRST_CHUNK_TIMEOUT, GEMINI_STREAM_CHUNK_TIMEOUT, GEMINI_STREAM_TURN_TIMEOUT
+from config import TOOL_WORKER_THREADS, TOOL_DEFAULT_TIMEOUT, CONTEXT_SUMMARY_MODEL
+from utils.stream_utils import iterate_in_thread, iterate_with_timeouts
+
+# Model used for chat turns (and for the explicit prompt caches built for them)
+CHAT_MODEL = "gemini-2.5-flash"
 
 # --- Persona Loading ---
 def load_system_prompt(persona_name: str = "aria") -> Optional[str]:
-    """Loads the system prompt from a text file."""
+    """Loads the system prompt from a text file. Uncached; request handlers use `services.prompt_registry`."""
     persona_path = os.path.join(os.path.dirname(__file__), '..', 'personas', f'{persona_name}.txt')
     if os.path.exists(persona_path):
         with open(persona_path, 'r', encoding='utf-8') as f:
@@ -17,6 +28,53 @@ def load_system_prompt(persona_name: str = "aria") -> Optional[str]:
 # Initialize the Generative AI client
 client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
 
+# Client for streamed turns. Its socket read timeout ends a stalled stream's reader thread
+# (see `iterate_in_thread`) shortly after `iterate_with_timeouts` has given up on it.
+STREAM_READ_TIMEOUT = max(GEMINI_STREAM_FIRST_CHUNK_TIMEOUT, GEMINI_STREAM_CHUNK_TIMEOUT) + 5
+stream_client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"), http_options={"timeout": (10, STREAM_READ_TIMEOUT)})
+
+async def stream_content_async(
+    contents: list,
+    config: Optional[types.GenerateContentConfig] = None,
+    model: str = CHAT_MODEL,
+    first_chunk_timeout: Optional[float] = GEMINI_STREAM_FIRST_CHUNK_TIMEOUT,
+    chunk_timeout: Optional[float] = GEMINI_STREAM_CHUNK_TIMEOUT,
+    total_timeout: Optional[float] = GEMINI_STREAM_TURN_TIMEOUT,
+) -> AsyncIterator:
+    """
+    Streams a Gemini response without blocking the event loop: the SDK's blocking stream is
+    read on a worker thread, so a slow stream never stalls other connections.
+
+    Raises:
+        StreamTimeoutError: If the stream stalls past one of the configured limits.
+    """
+    stream = iterate_in_thread(
+        lambda: stream_client.models.generate_content_stream(model=model, contents=contents, config=config)
+    )
+    async for chunk in iterate_with_timeouts(stream, first_chunk_timeout, chunk_timeout, total_timeout):
+        yield chunk
+
+def summarize_conversation(previous_summary: str, contents: list) -> str:
+    """
+    Condenses older conversation turns (and the summary that already covered the turns before
+    them) into a short summary that replaces them in the model's context.
+    """
+    transcript = []
+    for content in contents:
+        text = " ".join(part.text for part in content.parts or [] if part.text)
+        if text:
+            transcript.append(f"{content.role}: {text}")
+    prompt = (
+        "Summarize this conversation so it can replace the original messages as context for a "
+        "voice assistant. Keep names, facts, user preferences, decisions and open questions. "
+        "Write at most 150 words, in the language of the conversation.\n\n"
+    )
+    if previous_summary:
+        prompt += f"Summary of what came before:\n{previous_summary}\n\n"
+    prompt += "Messages:\n" + "\n".join(transcript)
+    response = client.models.generate_content(model=CONTEXT_SUMMARY_MODEL, contents=prompt)
+    return (response.text or "").strip()
+
 # Manually define the tool declarations using uppercase string literals as required by the validator.
 tool_declarations = [
     {
@@ -62,6 +120,96 @@ tool_config = types.ToolConfig(
     )
 )
 
+@lru_cache(maxsize=32)
+def tools_generation_config(system_prompt: Optional[str] = None) -> types.GenerateContentConfig:
+    """
+    The generation config for the tool-calling loop, built once per system prompt and shared
+    by every request using it. Callers must not modify the returned object.
+    """
+    return types.GenerateContentConfig(
+        tools=[gemini_tools],
+        tool_config=tool_config,
+        system_instruction=system_prompt
+    )
+
+# Shared pool for tool execution, so parallel tool calls from concurrent requests stay bounded
+tool_executor = ThreadPoolExecutor(max_workers=TOOL_WORKER_THREADS, thread_name_prefix="tool")
+
+class _ToolRun:
+    """
+    One tool call submitted to `tool_executor`. Its timeout counts from when a worker starts
+    running it, so time spent queued behind other requests' tools is not charged to the tool.
+    The wait for a worker is bounded by the same timeout, after which the call is cancelled.
+    """
+
+    def __init__(self, tool: Callable, args: dict, timeout: float):
+        self.timeout = timeout
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self._started = threading.Event()
+        self.future = tool_executor.submit(self._run, tool, args)
+
+    def _run(self, tool: Callable, args: dict) -> Any:
+        self.started_at = time.monotonic()
+        self._started.set()
+        return tool(**args)
+
+    def result(self) -> Any:
+        """The tool's result. Raises FutureTimeoutError if it did not start or finish in time."""
+        queued = max(0.0, self.submitted_at + self.timeout - time.monotonic())
+        if not self._started.wait(queued) and self.future.cancel():
+            raise FutureTimeoutError()
+        # Not cancellable, so a worker has picked it up
+        self._started.wait()
+        return self.future.result(timeout=max(0.0, self.started_at + self.timeout - time.monotonic()))
+
+def execute_tool_calls(
+    function_calls: list,
+    tools: Dict[str, Callable] = available_tools,
+    timeouts: Dict[str, float] = tool_timeouts,
+) -> List[types.Part]:
+    """
+    Executes the function calls of one model turn concurrently.
+
+    Every call gets its own timeout (from `timeouts`, falling back to TOOL_DEFAULT_TIMEOUT),
+    counted from when it starts running on the shared pool, and failures are isolated: an unknown tool, an exception or a timeout becomes an error result for
+    that call only. Results are returned in the same order as the calls.
+
+    Args:
+        function_calls (list): The `FunctionCall` objects requested by the model.
+
+    Returns:
+        list[types.Part]: One function response part per call, in call order.
+    """
+    pending = []
+    for function_call in function_calls:
+        tool_name = function_call.name
+        tool_args = dict(function_call.args or {})
+        if tool_name not in tools:
+            pending.append((tool_name, None, f"Error: Tool '{tool_name}' not found."))
+            continue
+        print(f"Executing tool: {tool_name} with args: {tool_args}")
+        run = _ToolRun(tools[tool_name], tool_args, timeouts.get(tool_name, TOOL_DEFAULT_TIMEOUT))
+        pending.append((tool_name, run, None))
+
+    tool_results = []
+    for tool_name, run, error in pending:
+        if run is not None:
+            try:
+                tool_response_data = run.result()
+            except FutureTimeoutError:
+                # The worker thread cannot be interrupted; its late result is simply discarded
+                tool_response_data = f"Error: Tool '{tool_name}' timed out."
+            except Exception as e:
+                tool_response_data = f"Error: Tool '{tool_name}' failed: {e}"
+        else:
+            tool_response_data = error
+        tool_results.append(types.Part.from_function_response(
+            name=tool_name,
+            response={"result": tool_response_data},
+        ))
+    return tool_results
+
 def process_content_with_tools(contents: list, system_prompt: Optional[str] = None) -> Tuple[str, list]:
     """
     Processes a list of content parts using the Gemini model, with a tool-calling loop.
@@ -69,7 +217,7 @@ def process_content_with_tools(contents: list, system_prompt: Optional[str] = No
     This function handles the interaction with the model, including:
     1. Sending the complete conversation history and prompt with available tools.
     2. Checking if the model wants to call a function.
-    3. Executing the function if requested.
+    3. Executing the requested functions concurrently, each with its own timeout.
     4. Sending the function's result back to the model.
     5. Returning the final, user-facing text response and the updated history.
 
@@ -83,16 +231,12 @@ def process_content_with_tools(contents: list, system_prompt: Optional[str] = No
     # Create a mutable copy of the history to avoid modifying the original list
     history = list(contents)
 
-    # Define the generation config, including the system prompt
-    generation_config = genai.types.GenerateContentConfig(
-        tools=[gemini_tools],
-        tool_config=tool_config,
-        system_instruction=system_prompt
-    )
+    # The generation config, including the system prompt, is built once per prompt
+    generation_config = tools_generation_config(system_prompt)
 
     # First call to the model
     response = client.models.generate_content(
-        model="gemini-2.5-flash",
+        model=CHAT_MODEL,
         contents=history,
         config=generation_config,
     )
@@ -106,25 +250,10 @@ def process_content_with_tools(contents: list, system_prompt: Optional[str] = No
         final_text = "".join(part.text for part in model_response_content.parts if part.text)
         return final_text, history
 
-    # Process all function calls found in the first response
-    tool_results = []
-    for part in model_response_content.parts:
-        if part.function_call:
-            function_call = part.function_call
-            tool_name = function_call.name
-            tool_args = dict(function_call.args)
-
-            if tool_name not in available_tools:
-                raise ValueError(f"Tool '{tool_name}' not found.")
-
-            print(f"Executing tool: {tool_name} with args: {tool_args}")
-            function_to_call = available_tools[tool_name]
-            tool_response_data = function_to_call(**tool_args)
-            
-            tool_results.append(types.Part.from_function_response(
-                name=tool_name,
-                response={"result": tool_response_data},
-            ))
+    # Execute all function calls found in the first response concurrently
+    tool_results = execute_tool_calls(
+        [part.function_call for part in model_response_content.parts if part.function_call]
+    )
 
     # If tools were called, send their results back to the model for a final answer
     if tool_results:
@@ -144,7 +273,7 @@ def process_content_with_tools(contents: list, system_prompt: Optional[str] = No
         
         # Second and final call to the model
         final_response = client.models.generate_content(
-            model="gemini-2.5-flash",
+            model=CHAT_MODEL,
             contents=history,
             config=generation_config,
         )
@@ -153,4 +282,90 @@ def process_content_with_tools(contents: list, system_prompt: Optional[str] = No
         return final_text, history
 
     # Fallback in case something unexpected happens
-    return "I'm sorry, I couldn't process that request after attempting to use tools.", history
\ No newline at end of file
+    return "I'm sorry, I couldn't process that request after attempting to use tools.", history
+
+async def _stream_model_turn(history: list, config: types.GenerateContentConfig) -> AsyncIterator[Tuple[str, Any]]:
+    """
+    Streams one model call, yielding ("token", text) for every text delta and finally
+    ("content", types.Content) with the merged text and function call parts of the turn.
+    """
+    text_parts = []
+    function_calls = []
+    async for chunk in stream_content_async(history, config=config):
+        if not chunk.candidates or not chunk.candidates[0].content or not chunk.candidates[0].content.parts:
+            continue
+        for part in chunk.candidates[0].content.parts:
+            if part.function_call:
+                function_calls.append(part)
+            elif part.text:
+                text_parts.append(part.text)
+                yield "token", part.text
+    parts = [types.Part(text="".join(text_parts))] if text_parts else []
+    yield "content", types.Content(role="model", parts=parts + function_calls)
+
+async def stream_content_with_tools(contents: list, system_prompt: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming counterpart of `process_content_with_tools`.
+
+    Runs the same tool-calling loop, but streams both model calls and yields events as they happen:
+        {"type": "token", "text": ...}                  text delta of the answer
+        {"type": "tool_call", "name": ..., "args": ...} a tool the model asked for, before it runs
+        {"type": "tool_result", "name": ..., "ok": ...} a tool finished (ok is False on error/timeout)
+        {"type": "final", "text": ..., "history": ...}  the answer and updated history, last
+
+    Text the model streams before asking for tools is sent as tokens, but the final text is only
+    the answer of the last model call, like the text `process_content_with_tools` returns, so
+    that preamble is not stored or spoken twice.
+
+    Args:
+        contents (list): The complete list of conversation history and the current prompt.
+        system_prompt (str): Optional system instruction.
+    """
+    history = list(contents)
+    generation_config = tools_generation_config(system_prompt)
+
+    answer = []
+    model_response_content = None
+    async for kind, value in _stream_model_turn(history, generation_config):
+        if kind == "token":
+            answer.append(value)
+            yield {"type": "token", "text": value}
+        else:
+            model_response_content = value
+    history.append(model_response_content)
+
+    function_calls = [part.function_call for part in model_response_content.parts if part.function_call]
+    if function_calls:
+        for function_call in function_calls:
+            yield {"type": "tool_call", "name": function_call.name, "args": dict(function_call.args or {})}
+
+        # execute_tool_calls blocks on the tool futures, so wait for it off the event loop
+        loop = asyncio.get_running_loop()
+        tool_results = await loop.run_in_executor(None, execute_tool_calls, function_calls)
+        for part in tool_results:
+            result = part.function_response.response.get("result")
+            yield {
+                "type": "tool_result",
+                "name": part.function_response.name,
+                "ok": not (isinstance(result, str) and result.startswith("Error")),
+            }
+
+        history.append(types.Content(role="tool", parts=tool_results))
+        history.append(types.Content(
+            role="user",
+            parts=[types.Part.from_text(
+                "You have been provided with a series of tool outputs. "
+                "Synthesize these results into a single, coherent, and user-friendly text response. "
+                "Directly answer the user's original query based on the information gathered. Do not ask for the same tools again."
+            )]
+        ))
+
+        answer = []
+        async for kind, value in _stream_model_turn(history, generation_config):
+            if kind == "token":
+                answer.append(value)
+                yield {"type": "token", "text": value}
+            else:
+                history.append(value)
+
+    yield {"type": "final", "text": "".join(answer), "history": history}
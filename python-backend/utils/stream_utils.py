@@ -0,0 +1,116 @@
+import asyncio
+import json
+import threading
+import time
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+
+class StreamTimeoutError(asyncio.TimeoutError):
+    """Raised when a model stream does not produce its next chunk in time."""
+
+
+_END = object()
+
+
+async def iterate_in_thread(open_stream: Callable[[], Iterator], thread_name: str = "model-stream") -> AsyncIterator:
+    """
+    Consumes a blocking iterator (e.g. `client.models.generate_content_stream`) on its own
+    thread and yields its items on the event loop.
+
+    google-genai 0.4's asyncio client only offloads opening the request: it then reads the
+    response with blocking `requests` calls on the event loop, so a slow stream stalls every
+    other connection and `asyncio.wait_for` cannot interrupt a stalled read. Here every read
+    happens on the thread and the loop only awaits a queue, so the timeouts of
+    `iterate_with_timeouts` hold. When the consumer stops early, the thread stops after the
+    read in progress returns (bounded by the client's read timeout).
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stopped = threading.Event()
+
+    def put(item, error=None) -> None:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            stopped.set()  # The event loop is gone
+
+    def pump() -> None:
+        try:
+            iterator = open_stream()
+            try:
+                for item in iterator:
+                    if stopped.is_set():
+                        break
+                    put(item)
+            finally:
+                close = getattr(iterator, "close", None)
+                if close is not None:
+                    close()
+        except BaseException as e:
+            if not stopped.is_set():
+                put(_END, e)
+            return
+        put(_END)
+
+    threading.Thread(target=pump, name=thread_name, daemon=True).start()
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _END:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
+
+
+async def iterate_with_timeouts(
+    stream: AsyncIterator,
+    first_chunk_timeout: Optional[float] = None,
+    chunk_timeout: Optional[float] = None,
+    total_timeout: Optional[float] = None,
+) -> AsyncIterator:
+    """
+    Yields the chunks of an async stream, enforcing per-turn time limits.
+
+    Args:
+        stream (AsyncIterator): The stream to consume.
+        first_chunk_timeout (float): Max seconds to wait for the first chunk.
+        chunk_timeout (float): Max seconds to wait between subsequent chunks.
+        total_timeout (float): Max seconds for the whole stream.
+
+    Raises:
+        StreamTimeoutError: If any of the limits is exceeded.
+    """
+    deadline = time.monotonic() + total_timeout if total_timeout else None
+    timeout = first_chunk_timeout
+    try:
+        while True:
+            wait_for = timeout
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise StreamTimeoutError(f"Model stream exceeded the turn limit of {total_timeout}s")
+                wait_for = remaining if wait_for is None else min(wait_for, remaining)
+            try:
+                chunk = await asyncio.wait_for(stream.__anext__(), timeout=wait_for)
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                raise StreamTimeoutError(f"Model stream produced no chunk within {wait_for:.1f}s")
+            yield chunk
+            timeout = chunk_timeout
+    finally:
+        # Release the underlying HTTP stream when the caller stops early or a limit is hit
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            try:
+                await aclose()
+            except Exception:
+                pass
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Formats one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
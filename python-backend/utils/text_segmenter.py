@@ -0,0 +1,160 @@
+import re
+from dataclasses import dataclass
+from typing import FrozenSet, List, Optional
+
+from config import TTS_SEGMENT_MIN_CHARS, TTS_SEGMENT_SOFT_MIN_CHARS, TTS_SEGMENT_MAX_CHARS
+
+# Characters that belong to the sentence they close, e.g. `He said "yes."` or `「はい。」`
+CLOSING_CHARS = "\"'”’)]}」』）】"
+
+
+@dataclass(frozen=True)
+class LanguageRules:
+    """Punctuation rules used to find segment boundaries for one language."""
+    strong: str  # Sentence terminators
+    soft: str  # Clause separators, only used to split long sentences
+    needs_space_after: bool  # Whether a terminator must be followed by whitespace (rules out "3.5", "example.com")
+    abbreviations: FrozenSet[str] = frozenset()  # Lowercase tokens ending in "." that do not end a sentence
+    length_scale: float = 1.0  # Japanese packs far more speech into each character
+
+
+LANGUAGE_RULES = {
+    "en": LanguageRules(
+        strong=".?!",
+        soft=",;:",
+        needs_space_after=True,
+        abbreviations=frozenset({"mr.", "mrs.", "ms.", "dr.", "prof.", "st.", "vs.", "etc.", "e.g.", "i.e.", "approx.", "no."}),
+    ),
+    "id": LanguageRules(
+        strong=".?!",
+        soft=",;:",
+        needs_space_after=True,
+        abbreviations=frozenset({"dr.", "prof.", "bpk.", "ibu.", "sdr.", "jl.", "no.", "dll.", "dsb.", "dst.", "tsb.", "yth.", "hlm."}),
+    ),
+    "ja": LanguageRules(
+        strong="。？！?!",
+        soft="、，,",
+        needs_space_after=False,
+        length_scale=0.5,
+    ),
+}
+
+
+class SentenceSegmenter:
+    """
+    Incremental, language-aware splitter that turns a streamed model response into TTS-sized segments.
+
+    Only characters that arrived since the previous call are scanned. Segments end at sentence
+    terminators once they reach `min_chars`, at clause separators once they reach
+    `soft_min_chars`, and are force-split (preferably at a clause separator or a space) when they
+    would exceed `max_chars`. Shorter pieces are merged with what follows, so a response yields a
+    few natural chunks instead of one synthesis call per comma.
+
+    Args:
+        lang (str): Language code ('id', 'en' or 'ja'); unknown codes use the Indonesian rules.
+        min_chars (int): Minimum length of a segment ending at a sentence terminator.
+        soft_min_chars (int): Minimum length of a segment ending at a clause separator.
+        max_chars (int): Maximum length of any segment.
+    """
+
+    def __init__(
+        self,
+        lang: str = "id",
+        min_chars: Optional[int] = None,
+        soft_min_chars: Optional[int] = None,
+        max_chars: Optional[int] = None,
+    ):
+        self.rules = LANGUAGE_RULES.get(lang, LANGUAGE_RULES["id"])
+        scale = self.rules.length_scale
+        self.min_chars = min_chars if min_chars is not None else max(1, int(TTS_SEGMENT_MIN_CHARS * scale))
+        self.soft_min_chars = soft_min_chars if soft_min_chars is not None else max(1, int(TTS_SEGMENT_SOFT_MIN_CHARS * scale))
+        self.max_chars = max_chars if max_chars is not None else max(self.soft_min_chars, int(TTS_SEGMENT_MAX_CHARS * scale))
+        self._buffer = ""
+        self._pos = 0  # Everything before this index has already been scanned
+        self._last_soft_cut = 0  # Fallback split point for over-long segments
+        self._marks = re.compile("[" + re.escape(self.rules.strong + self.rules.soft) + "\n]")
+
+    def feed(self, text: str) -> List[str]:
+        """Adds newly streamed text and returns the segments that are now complete."""
+        self._buffer += text
+        return self._scan(final=False)
+
+    def flush(self) -> List[str]:
+        """Returns every remaining segment at the end of the stream, including a short tail."""
+        segments = self._scan(final=True)
+        tail = self._buffer.strip()
+        if tail:
+            segments.append(tail)
+        self._buffer = ""
+        self._pos = 0
+        self._last_soft_cut = 0
+        return segments
+
+    def _scan(self, final: bool) -> List[str]:
+        rules = self.rules
+        segments = []
+        buf = self._buffer
+        i = self._pos
+        while i < len(buf) or len(buf) > self.max_chars:
+            # Jump straight to the next punctuation mark instead of stepping through every character
+            mark = self._marks.search(buf, i)
+            if mark is None or mark.start() > self.max_chars:
+                if len(buf) <= self.max_chars:
+                    i = len(buf)
+                    break
+                # No usable boundary within the allowed length: split anyway
+                cut = self._force_cut(buf)
+                segment = buf[:cut].strip()
+                if segment:
+                    segments.append(segment)
+                buf = buf[cut:]
+                i = 0
+                self._last_soft_cut = 0
+                continue
+
+            i = mark.start()
+            ch = buf[i]
+            end = i + 1
+            # Absorb runs like "?!" or "..." and closing quotes/brackets
+            while end < len(buf) and (buf[end] in rules.strong or buf[end] in CLOSING_CHARS):
+                end += 1
+            if end == len(buf) and not final:
+                # The next character decides whether this is a boundary; wait for it
+                break
+            if self._is_boundary(buf, i, end):
+                length = len(buf[:end].strip())
+                threshold = self.soft_min_chars if ch in rules.soft else self.min_chars
+                if length >= threshold:
+                    segments.append(buf[:end].strip())
+                    buf = buf[end:]
+                    i = 0
+                    self._last_soft_cut = 0
+                    continue
+                self._last_soft_cut = end
+            i = end
+
+        self._buffer = buf
+        self._pos = i
+        return segments
+
+    def _is_boundary(self, buf: str, i: int, end: int) -> bool:
+        rules = self.rules
+        if buf[i] == "\n":
+            # Line breaks (paragraphs, list items) always end a sentence
+            return True
+        if rules.needs_space_after and end < len(buf) and not buf[end].isspace():
+            return False
+        if buf[i] == "." and rules.abbreviations:
+            word_start = max(buf.rfind(" ", 0, i), buf.rfind("\n", 0, i)) + 1
+            if buf[word_start:i + 1].lower() in rules.abbreviations:
+                return False
+        return True
+
+    def _force_cut(self, buf: str) -> int:
+        """Picks where to split a segment that reached max_chars."""
+        if self._last_soft_cut > 0:
+            return self._last_soft_cut
+        space = buf.rfind(" ", 0, self.max_chars)
+        if space > 0:
+            return space + 1
+        return self.max_chars